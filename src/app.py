@@ -1,41 +1,177 @@
-from fastapi import FastAPI
-from routes import base,data,nlp
+from fastapi import FastAPI,Request,status
+from fastapi.responses import ORJSONResponse
+from routes import base,data,nlp,metrics
 from motor.motor_asyncio import AsyncIOMotorClient
 from helpers.config import Settings,get_settings
 from stores.llm.LLMProvierFactory import LLMProviderFactory
 from stores.VectorDB.VectorDBProviderFactory import VectorDBProviderFactory
+from stores.VectorDB.IndexMaintenanceScheduler import IndexMaintenanceScheduler
 from stores.ChatHistoryManager import ChatHistoryManager
-app=FastAPI()
+from stores.DocumentStore import DocumentStore
+from stores.CollectionRegistry import CollectionRegistry
+from stores.VectorDB.VectorDBEnum import TextStorageEnum
+from stores.VectorDB.VectorDBInterface import CollectionUnavailable
+from stores.llm.ConnectionPool import close_http_clients,get_pool_stats
+from stores.llm.EmbeddingWorkerPool import shutdown_embedding_pools,get_embedding_pool_stats
+from controllers import NLPController,DataController,ProjectController
+from helpers.lifecycle import AppLifecycle,RequestTrackingMiddleware
+from helpers.upload_limits import UploadSizeLimitMiddleware
+from helpers.metrics import IN_FLIGHT_REQUESTS,QUEUE_DEPTH
+from helpers.tracing import setup_tracing,shutdown_tracing
+from helpers.admission import AdmissionRejected,get_admission_controllers
+from helpers.fair_scheduler import get_fair_schedulers
+from models.enums import ResponseSignal
+app=FastAPI(default_response_class=ORJSONResponse)
+app.lifecycle=AppLifecycle()
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(RequestTrackingMiddleware,lifecycle=app.lifecycle)
+
+def collect_queue_depths():
+    pool_stats=get_pool_stats()
+    depths={
+        ("http_pool_connections",):pool_stats["connections"],
+        ("http_pool_queued",):pool_stats["queued"],
+        ("chat_summary",):app.chat_history_manager.get_pending_summaries(),
+        ("embedding_workers",):get_embedding_pool_stats()["pending"],
+    }
+    for flight in (app.nlp_controller.embedding_flight,
+                   app.nlp_controller.retrieval_flight,
+                   app.nlp_controller.generation_flight):
+        depths[(f"single_flight_{flight.name}",)]=len(flight.in_flight)
+    for name,admission in get_admission_controllers().items():
+        depths[(f"admission_{name}",)]=admission.waiting
+    for name,scheduler in get_fair_schedulers().items():
+        depths[(f"fair_scheduler_{name}",)]=scheduler.waiting
+    return depths
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return ORJSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After":exc.retry_after_header()},
+        content={
+            "signal":ResponseSignal.GENERATION_OVERLOADED.value,
+            "reason":exc.reason
+        }
+    )
+
+@app.exception_handler(CollectionUnavailable)
+async def collection_unavailable_handler(request: Request, exc: CollectionUnavailable):
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After":exc.retry_after_header()},
+        content={
+            "signal":ResponseSignal.VECTORDB_COLLECTION_UNAVAILABLE.value,
+            "reason":exc.reason
+        }
+    )
 
 async def startup_span():
     settings=get_settings()
+    setup_tracing(exporter=settings.TRACING_EXPORTER,file_path=settings.TRACING_FILE_PATH,
+                  service_name=settings.APP_NAME)
   #  app.mongo_conn=AsyncIOMotorClient(settings.MONGODB_URL)
   #  app.db_client=app.mongo_conn[settings.MONGODB_DATABASE]
 
     llm_provier_factory=LLMProviderFactory(settings)
     vectordb_provider_factory=VectorDBProviderFactory(settings)
-    app.generation_client=llm_provier_factory.create(provider=settings.GENERATION_BACKEND)
-    app.generation_client.set_generation_model(model_id=settings.GENERATION_MODEL_ID)
+    app.generation_client=llm_provier_factory.create_generation_client()
 
-    app.embedding_client=llm_provier_factory.create(provider=settings.EMBEDDING_BACKEND)
-    app.embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
-                                             embedding_size=settings.EMBEDDING_MODEL_SIZE)
+    app.embedding_client=llm_provier_factory.create_embedding_client(
+        provider=settings.EMBEDDING_BACKEND,
+        model_id=settings.EMBEDDING_MODEL_ID,
+        embedding_size=settings.EMBEDDING_MODEL_SIZE,
+    )
     app.vectordb_client=vectordb_provider_factory.create(
         provider=settings.VECTOR_DB_BACKEND
     )
-    app.chat_history_manager=ChatHistoryManager()
+    app.document_store=None
+    if settings.VECTOR_DB_TEXT_STORAGE==TextStorageEnum.LOCAL.value:
+        app.document_store=DocumentStore(db_path=settings.DOCUMENT_STORE_PATH)
+    app.collection_registry=CollectionRegistry(path=settings.VECTOR_DB_COLLECTION_REGISTRY_PATH)
+    app.index_maintenance=None
+    if settings.VECTOR_DB_MAINTENANCE_ENABLED:
+        app.index_maintenance=IndexMaintenanceScheduler(
+            vectordb_client=app.vectordb_client,
+            state_path=settings.VECTOR_DB_MAINTENANCE_STATE_PATH,
+            interval=settings.VECTOR_DB_MAINTENANCE_INTERVAL,
+            window=settings.VECTOR_DB_MAINTENANCE_WINDOW,
+            min_rows=settings.VECTOR_DB_MAINTENANCE_MIN_ROWS,
+            tombstone_ratio=settings.VECTOR_DB_COMPACTION_TOMBSTONE_RATIO,
+            max_segments=settings.VECTOR_DB_COMPACTION_MAX_SEGMENTS,
+            growth_ratio=settings.VECTOR_DB_INDEX_REBUILD_GROWTH_RATIO,
+            compaction_timeout=settings.VECTOR_DB_COMPACTION_TIMEOUT,
+            max_failures=settings.VECTOR_DB_MAINTENANCE_MAX_FAILURES,
+            max_backoff=settings.VECTOR_DB_MAINTENANCE_MAX_BACKOFF,
+        )
+    # App-scoped services, injected into the routes through helpers.dependencies
+    app.nlp_controller=NLPController(
+        vectordb_client=app.vectordb_client,
+        generation_client=app.generation_client,
+        embedding_client=app.embedding_client,
+        document_store=app.document_store,
+        collection_registry=app.collection_registry,
+        embedding_client_factory=llm_provier_factory.create_embedding_client,
+        index_maintenance=app.index_maintenance,
+    )
+    app.project_controller=ProjectController()
+    app.data_controller=DataController(project_controller=app.project_controller)
+    app.chat_history_manager=ChatHistoryManager(
+        storage_path=settings.CHAT_HISTORY_PATH,
+        max_turns=settings.CHAT_HISTORY_MAX_TURNS,
+        token_budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+        summarizer=app.nlp_controller.summarize_conversation,
+    )
     app.vectordb_client.connect()
 
+    IN_FLIGHT_REQUESTS.set_function(lambda: {():app.lifecycle.in_flight})
+    QUEUE_DEPTH.set_function(collect_queue_depths)
+
+    if settings.WARMUP_ENABLED:
+        await app.lifecycle.warmup_until_ready(
+            app,
+            base_delay=settings.WARMUP_RETRY_BASE_DELAY,
+            max_delay=settings.WARMUP_RETRY_MAX_DELAY,
+        )
+    else:
+        app.lifecycle.ready=True
+
+    if app.index_maintenance is not None:
+        app.index_maintenance.start()
+
+    if not await app.nlp_controller.resume_embedding_migration():
+        pending=app.nlp_controller.get_pending_model_change()
+        if pending and settings.EMBEDDING_MIGRATION_AUTO_START:
+            await app.nlp_controller.start_embedding_migration(
+                model_id=pending["model_id"],
+                embedding_size=pending["embedding_size"],
+                backend=pending["backend"],
+            )
+
 async def shutdown_span():
+    settings=get_settings()
+    await app.lifecycle.drain(timeout=settings.SHUTDOWN_DRAIN_TIMEOUT)
+
+    await app.nlp_controller.close()
+    if app.index_maintenance is not None:
+        await app.index_maintenance.close()
+    # Flush queued history summaries before the clients they use go away
+    app.chat_history_manager.close(wait=True)
+    await close_http_clients()
+    shutdown_embedding_pools()
    # app.mongo_conn.close()
     app.vectordb_client.disconnect()
+    if app.document_store is not None:
+        app.document_store.close()
+    shutdown_tracing()
 
 
 app.on_event("startup")(startup_span)
-app.on_event("shutdown")(startup_span)
+app.on_event("shutdown")(shutdown_span)
 
 app.include_router(base.base_router)
 app.include_router(data.data_router)
 app.include_router(nlp.nlp_router)
+app.include_router(metrics.metrics_router)
 
 
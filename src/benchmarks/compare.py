@@ -0,0 +1,63 @@
+"""Compare two benchmark suite results and flag regressions.
+
+Run from src/:
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+import sys
+
+# Lower is better for latencies, higher is better for throughput
+LOWER_IS_BETTER = ("_ms",)
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def flatten(node, prefix=""):
+    """Yield (path, value) for every numeric leaf, keying list items by their first field"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(node, list):
+        for i, item in enumerate(node):
+            label = i
+            if isinstance(item, dict) and item:
+                first_key = next(iter(item))
+                label = f"{first_key}={item[first_key]}"
+            yield from flatten(item, f"{prefix}[{label}]")
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, node
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    old = dict(flatten(baseline["results"]))
+    new = dict(flatten(candidate["results"]))
+
+    regressions = 0
+    print(f"{baseline['meta'].get('commit')} -> {candidate['meta'].get('commit')}")
+    for path in sorted(old.keys() & new.keys()):
+        if not path.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER) or old[path] == 0:
+            continue
+        change = (new[path] - old[path]) / old[path] * 100
+        worse = change > 0 if path.endswith(LOWER_IS_BETTER) else change < 0
+        flag = ""
+        if worse and abs(change) > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{path:70s} {old[path]:12.2f} {new[path]:12.2f} {change:+8.1f}%{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Recall@k of reduced-dimension embeddings against the full model output.
+
+Chunks the given documents the same way the upload routes do, embeds them
+with the configured embedding backend and, for every method and target
+dimension, reports how many of the exact full-dimension top-k neighbours are
+still found, along with bytes per stored vector and brute-force search time.
+Queries are the first sentence of randomly sampled chunks.
+
+Run from src/ (uses .env for the embedding backend):
+    python -m benchmarks.embedding_recall assets/files/<project_id> --dims 384 256 128 64
+    python -m benchmarks.embedding_recall docs/ --backend fake   # plumbing check only
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+
+from .env import apply_placeholder_env
+
+LOADABLE_EXTENSIONS = (".txt", ".pdf")
+
+
+def collect_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(LOADABLE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif path.endswith(LOADABLE_EXTENSIONS):
+            yield path
+
+
+def load_chunks(paths, chunk_size, overlap):
+    from langchain_community.document_loaders import PyMuPDFLoader, TextLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, length_function=len)
+    chunks = []
+    for path in collect_files(paths):
+        loader = PyMuPDFLoader(path) if path.endswith(".pdf") else TextLoader(path, encoding="utf-8")
+        documents = loader.load()
+        chunks.extend(
+            chunk.page_content
+            for chunk in splitter.create_documents([d.page_content for d in documents])
+            if chunk.page_content.strip()
+        )
+    return chunks
+
+
+def make_queries(chunks, count, seed):
+    rng = random.Random(seed)
+    sample = rng.sample(chunks, min(count, len(chunks)))
+    return [chunk.split(". ")[0][:300] for chunk in sample]
+
+
+def create_embedding_client(backend, dim):
+    if backend == "fake":
+        from .fakes import FakeLLMProvider
+        return FakeLLMProvider(embedding_size=dim)
+
+    from helpers.config import get_settings
+    from stores.llm.LLMProvierFactory import LLMProviderFactory
+    settings = get_settings()
+    client = LLMProviderFactory(settings).create(provider=settings.EMBEDDING_BACKEND)
+    client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID, embedding_size=settings.EMBEDDING_MODEL_SIZE)
+    return client
+
+
+def embed(client, texts, document_type, batch_size):
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        batch = client.embed_text(text=texts[i:i + batch_size], document_type=document_type)
+        if batch is None:
+            raise RuntimeError("embedding backend returned no vectors")
+        vectors.append(np.asarray(batch, dtype=np.float32))
+    return np.vstack(vectors)
+
+
+def top_k(corpus, queries, k):
+    # Squared L2 without the per-query constant, as used by the vector DB
+    distances = (corpus ** 2).sum(axis=1)[None, :] - 2 * queries @ corpus.T
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def evaluate(corpus, queries, truth, k):
+    start = time.perf_counter()
+    found = top_k(corpus, queries, k)
+    elapsed = time.perf_counter() - start
+    recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+    return float(recall), elapsed / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="files or directories of .txt/.pdf documents")
+    parser.add_argument("--backend", choices=["configured", "fake"], default="configured")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 128, 64, 32])
+    parser.add_argument("--methods", nargs="+", choices=["truncate", "pca"], default=["truncate", "pca"])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--fake-dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        apply_placeholder_env()
+
+    from stores.llm.DimensionReducer import DimensionReducer
+    from stores.llm.LLMEnum import DocumentTypeEnum
+
+    chunks = load_chunks(args.paths, args.chunk_size, args.overlap)
+    if len(chunks) <= max(args.k):
+        raise SystemExit(f"Need more than {max(args.k)} chunks, found {len(chunks)}")
+    queries = make_queries(chunks, args.queries, args.seed)
+
+    client = create_embedding_client(args.backend, args.fake_dim)
+    start = time.perf_counter()
+    corpus = embed(client, chunks, DocumentTypeEnum.DOCUMENT.value, args.batch_size)
+    embed_seconds = time.perf_counter() - start
+    query_vectors = embed(client, queries, DocumentTypeEnum.QUERY.value, args.batch_size)
+    full_dim = corpus.shape[1]
+
+    truth = {k: top_k(corpus, query_vectors, k) for k in args.k}
+    results = {
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "full_dim": full_dim,
+        "embed_chunks_per_s": len(chunks) / embed_seconds,
+        "baseline": {
+            "bytes_per_vector": full_dim * 4,
+            "search_ms_per_query": evaluate(corpus, query_vectors, truth[args.k[0]], args.k[0])[1],
+        },
+        "reduced": [],
+    }
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        for method in args.methods:
+            for dim in sorted(d for d in args.dims if d < full_dim):
+                reducer = DimensionReducer(method=method, source_size=full_dim, target_size=dim,
+                                           storage_dir=storage_dir, collection_name=f"{method}_{dim}")
+                reduced_corpus = reducer.fit_transform(corpus)
+                reduced_queries = reducer.transform(query_vectors)
+                row = {"method": method, "dim": dim, "bytes_per_vector": dim * 4}
+                for k in args.k:
+                    recall, search_ms = evaluate(reduced_corpus, reduced_queries, truth[k], k)
+                    row[f"recall@{k}"] = recall
+                    row["search_ms_per_query"] = search_ms
+                results["reduced"].append(row)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Sentences/second of the local encoder backends on CPU.
+
+Loads each backend the way GIMINIProvider does (stores.llm.LocalEncoder),
+encodes the same chunks at every thread count and batch size, and reports
+throughput plus cosine agreement with the fp32 torch reference.
+
+Run from src/ (needs sentence-transformers, and optimum[onnxruntime] for onnx):
+    python -m benchmarks.encoder_throughput --model sentence-transformers/all-MiniLM-L6-v2
+    python -m benchmarks.encoder_throughput assets/files/<project_id> --backends torch int8 --threads 1 4
+"""
+import argparse
+import json
+import time
+
+from .embedding_recall import load_chunks
+from .suite import synthetic_text
+
+
+def synthetic_chunks(count, chunk_size, seed=0):
+    text = synthetic_text(count * chunk_size, seed=seed)
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)][:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="documents to chunk, synthetic text when omitted")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "int8"])
+    parser.add_argument("--onnx-file", default=None)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    from stores.llm.GenerationScheme import EncoderConfig
+    from stores.llm.LocalEncoder import (load_local_encoder, load_reference_encoder, encode,
+                                         compare_embeddings, set_torch_threads)
+
+    if args.paths:
+        texts = load_chunks(args.paths, args.chunk_size, overlap=50)[:args.chunks]
+    else:
+        texts = synthetic_chunks(args.chunks, args.chunk_size)
+
+    reference = load_reference_encoder(args.model)
+    reference_vectors = encode(reference, texts)
+
+    results = {"model": args.model, "texts": len(texts), "runs": []}
+    for backend in args.backends:
+        for threads in args.threads:
+            config = EncoderConfig(backend=backend, threads=threads, onnx_file=args.onnx_file,
+                                   consistency_check=False)
+            start = time.perf_counter()
+            model = load_local_encoder(args.model, config)
+            load_seconds = time.perf_counter() - start
+            set_torch_threads(threads)
+
+            agreement = compare_embeddings(encode(model, texts), reference_vectors)
+            for batch_size in args.batch_sizes:
+                encode(model, texts[:batch_size], batch_size)  # warm up
+                best = None
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    encode(model, texts, batch_size)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results["runs"].append({
+                    "backend": backend,
+                    "threads": threads,
+                    "batch_size": batch_size,
+                    "load_s": load_seconds,
+                    "sentences_per_s": len(texts) / best,
+                    **agreement,
+                })
+                print(json.dumps(results["runs"][-1]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
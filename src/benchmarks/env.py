@@ -0,0 +1,39 @@
+import os
+
+# Placeholders so Settings() validates without a .env file
+PLACEHOLDER_ENV = {
+    "APP_NAME": "bench",
+    "APP_VERSION": "0.0.0",
+    "OPEN_API_KEY": "-",
+    "FILE_ALLOWED_TYPES": '["text/plain","application/pdf","text/markdown","text/html","text/csv",'
+                          '"application/vnd.openxmlformats-officedocument.wordprocessingml.document"]',
+    "FILE_MAX_SIZE": "100",
+    "FILE_DEFAULT_CHUNK_SIZE": "512000",
+    "MONGODB_URL": "mongodb://localhost:27017",
+    "MONGODB_DATABASE": "bench",
+    "GENERATION_BACKEND": "GIMINI",
+    "EMBEDDING_BACKEND": "GIMINI",
+    "VECTOR_DB_BACKEND": "MILVUS",
+    "VECTOR_DB_PATH": "./bench_milvus.db",
+    "VECTOR_DB_TOKEN": "",
+    "VECTOR_DB_DISTANCE_METRIC": "L2",
+    "VECTOR_DB_COLLECTION_NAME": "bench",
+    "OPENAI_API_KEY": "-",
+    "OPENAI_API_URL": "-",
+    "COHERE_API_KEY": "-",
+    "GOOGLE_API_KEY": "-",
+    "GENERATION_MODEL_ID": "fake-generation",
+    "EMBEDDING_MODEL_ID": "fake-embedding",
+    "EMBEDDING_MODEL_SIZE": "384",
+    "INPUT_DEFAULT_MAX_CHARACTERS": "1000",
+    "GENERATION_DEFAULT_MAX_TOKENS": "1000",
+    "GENERATION_DEFAULT_TEMPERATURE": "0.1",
+}
+
+
+def apply_placeholder_env(overrides: dict = None):
+    """Fill in missing settings; explicit overrides always win"""
+    for key, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(key, value)
+    for key, value in (overrides or {}).items():
+        os.environ[key] = str(value)
@@ -0,0 +1,226 @@
+"""Deterministic local stand-ins for the LLM and vector DB backends."""
+from stores.llm.LLMInterface import LLMInterface
+from stores.VectorDB.VectorDBInterface import VectorDBInterface
+from threading import Lock
+from typing import List
+import asyncio
+import hashlib
+import time
+import numpy as np
+
+
+class FakeLLMProvider(LLMInterface):
+    """Hash-seeded embeddings and canned answers with configurable latency"""
+
+    def __init__(self, embedding_size: int = 384,
+                       generation_latency_ms: float = 0.0,
+                       embedding_latency_ms: float = 0.0,
+                       embedding_latency_per_text_ms: float = 0.0):
+        self.generation_model_id = None
+        self.embedding_model_id = None
+        self.embedding_size = embedding_size
+
+        self.generation_latency = generation_latency_ms / 1e3
+        self.embedding_latency = embedding_latency_ms / 1e3
+        self.embedding_latency_per_text = embedding_latency_per_text_ms / 1e3
+
+    def set_generation_model(self, model_id: str):
+        self.generation_model_id = model_id
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        self.embedding_model_id = model_id
+        self.embedding_size = embedding_size
+
+    def _answer(self, prompt: str):
+        digest = hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest()
+        return f"Answer {digest} for: {prompt[-80:]}"
+
+    def generate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                            temperature: float = None):
+        time.sleep(self.generation_latency)
+        return self._answer(prompt)
+
+    async def agenerate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                                   temperature: float = None):
+        await asyncio.sleep(self.generation_latency)
+        return self._answer(prompt)
+
+    def _vector(self, text: str):
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.embedding_size).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _embedding_delay(self, count: int):
+        return self.embedding_latency + self.embedding_latency_per_text * count
+
+    def embed_text(self, text, document_type: str = None):
+        if isinstance(text, str):
+            time.sleep(self._embedding_delay(1))
+            return self._vector(text)
+        time.sleep(self._embedding_delay(len(text)))
+        return np.stack([self._vector(t) for t in text])
+
+    async def aembed_text(self, text, document_type: str = None):
+        # Mirrors the local encoder, which runs in a worker thread
+        return await asyncio.to_thread(self.embed_text, text=text, document_type=document_type)
+
+    def construct_prompt(self, prompt: str, role: str):
+        return {"role": role, "content": prompt}
+
+
+class InMemoryVectorDBProvider(VectorDBInterface):
+    """Brute-force L2 search over NumPy arrays, returning Milvus-shaped hits"""
+
+    def __init__(self, search_latency_ms: float = 0.0, store_text: bool = True):
+        self.collections = {}
+        self.store_text = store_text
+        self.distance_method = "L2"
+        self.search_latency = search_latency_ms / 1e3
+        self.lock = Lock()
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def is_collection_existed(self, collection_name: str) -> bool:
+        return collection_name in self.collections
+
+    def list_all_collections(self) -> List:
+        return list(self.collections)
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return {}
+        return {
+            "collection_name": collection_name,
+            "dim": collection["dim"],
+            "num_entities": len(collection["doc_ids"]),
+        }
+
+    def delete_collection(self, collection_name: str):
+        return self.collections.pop(collection_name, None) is not None
+
+    def load_collection(self, collection_name: str) -> bool:
+        return self.is_collection_existed(collection_name)
+
+    def create_collection(self, collection_name: str,
+                                embedding_size: int,
+                                do_reset: bool = False):
+        if do_reset:
+            self.delete_collection(collection_name)
+        if self.is_collection_existed(collection_name):
+            return False
+        self.collections[collection_name] = {
+            "dim": embedding_size,
+            "vectors": np.empty((0, embedding_size), dtype=np.float32),
+            "texts": [],
+            "metadata": [],
+            "doc_ids": [],
+            "record_ids": [],
+            "next_id": 0,
+            # Deleted rows and insert batches since the last compaction, as Milvus would report them
+            "tombstones": 0,
+            "segments": 0,
+        }
+        return True
+
+    def insert_one(self, collection_name: str, text: str, vector: list,
+                         metadata: dict = None,
+                         doc_id: str = None):
+        return self.insert_many(collection_name, [text], [vector], [metadata], [doc_id])
+
+    def insert_many(self, collection_name: str, texts: list,
+                    vectors: list, metadata: list = None,
+                    doc_ids: list = None, record_ids: list = None,
+                    batch_size: int = 50):
+        collection = self.collections.get(collection_name)
+        if collection is None or doc_ids is None:
+            return None
+        if not self.store_text and record_ids is None:
+            return None
+        with self.lock:
+            if record_ids is None:
+                start = collection["next_id"]
+                record_ids = list(range(start, start + len(doc_ids)))
+                collection["next_id"] += len(doc_ids)
+            collection["vectors"] = np.vstack([
+                collection["vectors"], np.asarray(vectors, dtype=np.float32)
+            ])
+            if self.store_text:
+                collection["texts"].extend(texts)
+                collection["metadata"].extend(metadata or [None] * len(texts))
+            else:
+                collection["texts"].extend([None] * len(doc_ids))
+                collection["metadata"].extend([None] * len(doc_ids))
+            collection["doc_ids"].extend(doc_ids)
+            collection["record_ids"].extend(record_ids)
+            collection["segments"] += 1
+        return list(record_ids)
+
+    def delete_document_by_id(self, collection_name: str, doc_id: str):
+        return self._delete_where(collection_name, "doc_ids", lambda d: d == doc_id)
+
+    def delete_by_record_ids(self, collection_name: str, record_ids: list) -> int:
+        record_ids = set(record_ids)
+        return self._delete_where(collection_name, "record_ids", lambda r: r in record_ids)
+
+    def _delete_where(self, collection_name: str, field: str, matches) -> int:
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return 0
+        with self.lock:
+            keep = [i for i, value in enumerate(collection[field]) if not matches(value)]
+            deleted = len(collection["doc_ids"]) - len(keep)
+            collection["vectors"] = collection["vectors"][keep]
+            for name in ("texts", "metadata", "doc_ids", "record_ids"):
+                collection[name] = [collection[name][i] for i in keep]
+            collection["tombstones"] += deleted
+        return deleted
+
+    def get_segment_stats(self, collection_name: str) -> dict:
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return None
+        return {
+            "row_count": len(collection["doc_ids"]) + collection["tombstones"],
+            "segments": collection["segments"],
+        }
+
+    def compact(self, collection_name: str, timeout: float = None) -> bool:
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return False
+        with self.lock:
+            collection["tombstones"] = 0
+            collection["segments"] = min(collection["segments"], 1)
+        return True
+
+    def rebuild_index(self, collection_name: str) -> bool:
+        return self.is_collection_existed(collection_name)
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5,
+                               doc_id: str = None, timeout: float = None):
+        time.sleep(self.search_latency)
+        collection = self.collections.get(collection_name)
+        if collection is None or len(collection["doc_ids"]) == 0:
+            return [[]]
+        distances = np.sum((collection["vectors"] - np.asarray(vector, dtype=np.float32)) ** 2, axis=1)
+        if doc_id is not None:
+            distances[[d != doc_id for d in collection["doc_ids"]]] = np.inf
+            limit = min(limit, int(np.isfinite(distances).sum()))
+            if limit == 0:
+                return [[]]
+        limit = min(limit, len(distances))
+        top = np.argpartition(distances, limit - 1)[:limit]
+        top = top[np.argsort(distances[top])]
+        return [[
+            {
+                "id": int(collection["record_ids"][i]),
+                "distance": float(distances[i]),
+                "entity": {"text": collection["texts"][i]} if self.store_text else {},
+            }
+            for i in top
+        ]]
@@ -0,0 +1,183 @@
+"""Throughput and peak memory of each streaming document loader.
+
+Builds a synthetic document per format, stores it through AssetStore the way
+the upload routes do (zstd for text formats, raw for PDF/DOCX), then drains
+the loader from stores.DocumentLoader and reports MB/s, records produced and
+the peak Python allocation while loading, which should stay near the loader
+block size rather than grow with the file.
+
+Run from src/:
+    python -m benchmarks.loader_throughput --size-kb 4096
+    python -m benchmarks.loader_throughput --formats .csv .docx --block-size 16384
+"""
+from starlette.datastructures import Headers, UploadFile
+from xml.sax.saxutils import escape
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from .env import apply_placeholder_env
+from .suite import synthetic_text, synthetic_pdf
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+
+def paragraphs(size_bytes, seed):
+    return [p.strip() for p in synthetic_text(size_bytes, seed=seed).split("\n\n") if p.strip()]
+
+
+def synthetic_markdown(size_bytes, seed=0):
+    parts = []
+    for i, paragraph in enumerate(paragraphs(size_bytes, seed)):
+        if i % 5 == 0:
+            parts.append(f"## Section {i // 5}\n")
+        if i % 17 == 0:
+            parts.append("```python\n# not a heading\nprint('code')\n```\n")
+        parts.append(paragraph + "\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def synthetic_html(size_bytes, seed=0):
+    parts = ["<html><head><title>bench</title><style>p { margin: 0 }</style></head><body>"]
+    for i, paragraph in enumerate(paragraphs(size_bytes, seed)):
+        if i % 5 == 0:
+            parts.append(f"<h2>Section {i // 5}</h2>")
+        parts.append(f"<p>{escape(paragraph)}</p>")
+    parts.append("<script>var ignored = 1;</script></body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def synthetic_csv(size_bytes, seed=0):
+    rng = random.Random(seed)
+    lines = ["id,category,score,text"]
+    text = synthetic_text(size_bytes, seed=seed).replace("\n", " ")
+    for i, start in enumerate(range(0, len(text), 120)):
+        lines.append(f'{i},cat{rng.randint(0, 9)},{rng.random():.4f},"{text[start:start + 120]}"')
+    return "\n".join(lines).encode("utf-8")
+
+
+def synthetic_docx(size_bytes, seed=0):
+    body = []
+    for i, paragraph in enumerate(paragraphs(size_bytes, seed)):
+        if i % 5 == 0:
+            body.append('<w:p><w:pPr><w:pStyle w:val="Heading2"/></w:pPr>'
+                        f'<w:r><w:t>Section {i // 5}</w:t></w:r></w:p>')
+        body.append(f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>")
+    document = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+FORMATS = {
+    ".txt": ("text/plain", lambda size: synthetic_text(size).encode("utf-8")),
+    ".md": ("text/markdown", synthetic_markdown),
+    ".html": ("text/html", synthetic_html),
+    ".csv": ("text/csv", synthetic_csv),
+    ".docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", synthetic_docx),
+    ".pdf": ("application/pdf", lambda size: synthetic_pdf(max(1, size // 2500))),
+}
+
+
+async def store(asset_store, project_path, file_id, content_type, data):
+    upload = UploadFile(file=io.BytesIO(data), filename=file_id,
+                        headers=Headers({"content-type": content_type}))
+    await asset_store.save_upload(upload, os.path.join(project_path, file_id), chunk_size=512 * 1024)
+
+
+def bench_format(extension, args, asset_store, registry):
+    from stores.DocumentLoader import DocumentSource
+
+    content_type, build = FORMATS[extension]
+    data = build(args.size_kb * 1024)
+    if data is None:
+        return {"format": extension, "skipped": "generator unavailable"}
+
+    file_id = f"bench{extension}"
+    project_path = asset_store.get_project_path("bench")
+    asyncio.run(store(asset_store, project_path, file_id, content_type, data))
+    loader = registry.create(file_id, content_type=content_type)
+    source = DocumentSource(asset_store, "bench", file_id, source_path=os.path.join(project_path, file_id))
+
+    best = None
+    for _ in range(args.repeats):
+        records = characters = 0
+        start = time.perf_counter()
+        for record in loader.lazy_load(source):
+            records += 1
+            characters += len(record.page_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Separate pass: tracemalloc slows allocation-heavy parsers down too much to time them
+    tracemalloc.start()
+    for record in loader.lazy_load(source):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stored_path, _ = asset_store.get_stored_path("bench", file_id)
+    return {
+        "format": extension,
+        "file_bytes": len(data),
+        "stored_compressed": stored_path.endswith(".zst"),
+        "records": records,
+        "characters": characters,
+        "mb_per_s": len(data) / best / 1e6,
+        "peak_alloc_kb": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS))
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--block-size", type=int, default=65536)
+    parser.add_argument("--batch-rows", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    apply_placeholder_env({"FILE_LOADER_BLOCK_SIZE": args.block_size,
+                           "FILE_LOADER_CSV_BATCH_ROWS": args.batch_rows})
+    from helpers.config import get_settings
+    from stores.AssetStore import AssetStore
+    from stores.DocumentLoader import DocumentLoaderRegistry
+
+    results = {"size_kb": args.size_kb, "block_size": args.block_size, "formats": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        asset_store = AssetStore(files_dir=workdir)
+        registry = DocumentLoaderRegistry(get_settings())
+        os.makedirs(asset_store.get_project_path("bench"), exist_ok=True)
+        for extension in args.formats:
+            row = bench_format(extension, args, asset_store, registry)
+            results["formats"].append(row)
+            print(json.dumps(row))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
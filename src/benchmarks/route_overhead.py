@@ -0,0 +1,64 @@
+"""Per-request overhead of a trivial route, with cached vs. uncached settings.
+
+Run from src/:
+    python -m benchmarks.route_overhead --requests 2000
+"""
+from fastapi import FastAPI
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from .env import apply_placeholder_env
+apply_placeholder_env()
+
+import httpx
+from helpers.config import Settings, get_settings
+from routes import base
+
+
+async def measure(app: FastAPI, requests: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up routing and dependency resolution
+        for _ in range(50):
+            await client.get("/api/v1/")
+
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get("/api/v1/")
+            latencies.append((time.perf_counter() - start) * 1e6)
+            response.raise_for_status()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "mean_us": statistics.fmean(latencies),
+        "p50_us": latencies[len(latencies) // 2],
+        "p95_us": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(base.base_router)
+
+    results = {}
+    # Old behaviour: a fresh Settings() (and .env read) per request
+    app.dependency_overrides[get_settings] = lambda: Settings()
+    results["uncached_settings"] = asyncio.run(measure(app, args.requests))
+
+    app.dependency_overrides.clear()
+    results["cached_settings"] = asyncio.run(measure(app, args.requests))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Import-time breakdown of application startup (python -X importtime).
+
+Run from src/:
+    python -m benchmarks.startup_report --module app --top 25
+"""
+from collections import defaultdict
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+def collect_import_times(module: str):
+    """Import `module` in a fresh interpreter and parse the importtime log"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1e3
+
+    records = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+
+    return proc.returncode, proc.stderr, wall_ms, records
+
+
+def summarize(records, top: int):
+    """Self time grouped by top-level package, plus the slowest single imports"""
+    by_package = defaultdict(int)
+    for record in records:
+        by_package[record["module"].split(".")[0]] += record["self_us"]
+
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    slowest = sorted(records, key=lambda record: record["cumulative_us"], reverse=True)[:top]
+    return {
+        "total_self_ms": sum(by_package.values()) / 1e3,
+        "packages": [
+            {"package": name, "self_ms": us / 1e3}
+            for name, us in packages
+        ],
+        "slowest_imports": [
+            {"module": r["module"], "cumulative_ms": r["cumulative_us"] / 1e3}
+            for r in slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    returncode, stderr, wall_ms, records = collect_import_times(args.module)
+    if returncode != 0:
+        print(stderr.splitlines()[-1] if stderr else "import failed", file=sys.stderr)
+        sys.exit(returncode)
+
+    report = {"module": args.module, "wall_ms": wall_ms, **summarize(records, args.top)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import {args.module}: {wall_ms:.1f} ms wall, {report['total_self_ms']:.1f} ms in imports")
+    print("\nSelf time by package:")
+    for row in report["packages"]:
+        print(f"  {row['self_ms']:10.1f} ms  {row['package']}")
+    print("\nSlowest imports (cumulative):")
+    for row in report["slowest_imports"]:
+        print(f"  {row['cumulative_ms']:10.1f} ms  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
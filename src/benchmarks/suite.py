@@ -0,0 +1,338 @@
+"""End-to-end benchmark of the ingestion and query paths through the real app.
+
+Drives src/app.py over ASGI with deterministic fake LLM/embedding providers and
+either an in-memory vector store or Milvus Lite. Results are written as JSON so
+runs on different commits can be compared with benchmarks.compare.
+
+Run from src/:
+    python -m benchmarks.suite --output benchmarks/results/latest.json
+    python -m benchmarks.suite --vectordb milvus-lite --generation-latency-ms 300
+"""
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .env import apply_placeholder_env
+
+WORDS = (
+    "protein enzyme catalyst membrane neuron synapse quantum entanglement photon lattice "
+    "genome sequence mutation receptor pathway climate carbon aerosol isotope spectrum "
+    "model dataset regression inference gradient tensor matrix theorem proof hypothesis "
+    "experiment sample cohort trial placebo variance signal noise resonance field"
+).split()
+
+
+def synthetic_text(size_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + ". "
+        if rng.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:size_bytes]
+
+
+def synthetic_pdf(pages: int, seed: int = 0):
+    """Build a PDF with PyMuPDF, or None when it is not installed"""
+    try:
+        import fitz
+    except ImportError:
+        return None
+    document = fitz.open()
+    for page_no in range(pages):
+        page = document.new_page()
+        text = synthetic_text(2500, seed=seed + page_no)
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    response = await coro
+    return (time.perf_counter() - start) * 1e3, response
+
+
+async def bench_upload_and_chunk(client, sizes_kb, pdf_pages, repeats):
+    results = []
+    documents = [
+        (f"{size}kb.txt", "text/plain", synthetic_text(size * 1024, seed=size).encode(), size * 1024)
+        for size in sizes_kb
+    ]
+    for pages in pdf_pages:
+        data = synthetic_pdf(pages, seed=pages)
+        if data is None:
+            results.append({"document": f"{pages}p.pdf", "skipped": "PyMuPDF not installed"})
+            continue
+        documents.append((f"{pages}p.pdf", "application/pdf", data, len(data)))
+
+    for name, content_type, data, size in documents:
+        latencies = []
+        chunks = 0
+        for _ in range(repeats):
+            latency, response = await timed(client.post(
+                "/api/v1/data/upload_and_process/benchingest",
+                files={"file": (name, data, content_type)},
+            ))
+            response.raise_for_status()
+            latencies.append(latency)
+            chunks = response.json()["total_chunks"]
+        stats = percentiles(latencies)
+        results.append({
+            "document": name,
+            "bytes": size,
+            "chunks": chunks,
+            "mb_per_s": size / 1e6 / (stats["p50_ms"] / 1e3),
+            **stats,
+        })
+    return results
+
+
+async def bench_upload_process_index(client, size_kb, uploads, concurrency):
+    data = synthetic_text(size_kb * 1024, seed=42).encode()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    chunks = []
+
+    async def upload(i):
+        async with semaphore:
+            latency, response = await timed(client.post(
+                f"/api/v1/data/upload_process_index/benchindex{i % 4}",
+                files={"file": (f"doc{i}.txt", data, "text/plain")},
+            ))
+            response.raise_for_status()
+            latencies.append(latency)
+            chunks.append(response.json()["total_chunks"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(i) for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+    return {
+        "document_kb": size_kb,
+        "uploads": uploads,
+        "concurrency": concurrency,
+        "uploads_per_s": uploads / elapsed,
+        "chunks_per_s": sum(chunks) / elapsed,
+        **percentiles(latencies),
+    }
+
+
+async def bench_search(client, concurrency_levels, requests, limit):
+    rng = random.Random(7)
+    results = []
+    for concurrency in concurrency_levels:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def search(i):
+            nonlocal errors
+            question = " ".join(rng.choice(WORDS) for _ in range(8)) + "?"
+            async with semaphore:
+                latency, response = await timed(client.post(
+                    f"/api/v1/nlp/index/search/benchuser{concurrency}_{i}",
+                    json={"question": question, "limit": limit},
+                ))
+            if response.status_code != 200:
+                errors += 1
+                return
+            latencies.append(latency)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(search(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        results.append({
+            "concurrency": concurrency,
+            "requests": requests,
+            "errors": errors,
+            "requests_per_s": requests / elapsed,
+            **percentiles(latencies),
+        })
+    return results
+
+
+async def bench_chat_history_growth(client, turns, checkpoints, history_path):
+    rng = random.Random(11)
+    results = []
+    latencies = []
+    for turn in range(1, turns + 1):
+        question = " ".join(rng.choice(WORDS) for _ in range(10)) + "?"
+        latency, response = await timed(client.post(
+            "/api/v1/nlp/index/search/benchhistory",
+            json={"question": question, "limit": 5},
+        ))
+        response.raise_for_status()
+        latencies.append(latency)
+        if turn in checkpoints:
+            results.append({
+                "turns": turn,
+                "history_file_bytes": os.path.getsize(history_path),
+                **percentiles(latencies),
+            })
+            latencies = []
+    return results
+
+
+def install_fake_backends(args):
+    """Route the app factories to the local stand-ins"""
+    from stores.llm.LLMProvierFactory import LLMProviderFactory
+    from stores.VectorDB.VectorDBProviderFactory import VectorDBProviderFactory
+    from .fakes import FakeLLMProvider, InMemoryVectorDBProvider
+
+    def create_llm(factory, provider):
+        return FakeLLMProvider(
+            embedding_size=args.dim,
+            generation_latency_ms=args.generation_latency_ms,
+            embedding_latency_ms=args.embedding_latency_ms,
+            embedding_latency_per_text_ms=args.embedding_latency_per_text_ms,
+        )
+    LLMProviderFactory.create = create_llm
+
+    if args.vectordb == "memory":
+        def create_vectordb(factory, provider):
+            return InMemoryVectorDBProvider(
+                search_latency_ms=args.search_latency_ms,
+                store_text=factory.config.VECTOR_DB_TEXT_STORAGE != "local",
+            )
+        VectorDBProviderFactory.create = create_vectordb
+
+
+async def run(args, workdir):
+    apply_placeholder_env({
+        "EMBEDDING_MODEL_SIZE": args.dim,
+        "CHAT_HISTORY_PATH": os.path.join(workdir, "chat_history.json"),
+        "VECTOR_DB_PATH": os.path.join(workdir, "milvus_lite.db"),
+        "VECTOR_DB_COLLECTION_NAME": "bench_collection",
+        # Everything the app persists goes to the workdir, never to the real src/assets
+        "VECTOR_DB_COLLECTION_REGISTRY_PATH": os.path.join(workdir, "collections.json"),
+        "VECTOR_DB_MAINTENANCE_STATE_PATH": os.path.join(workdir, "maintenance.json"),
+        "DOCUMENT_STORE_PATH": os.path.join(workdir, "document_store.db"),
+        "EMBEDDING_PROJECTION_DIR": os.path.join(workdir, "projections"),
+    })
+    from helpers.config import reload_settings
+    settings = reload_settings()
+
+    install_fake_backends(args)
+    import app as app_module
+    import httpx
+
+    await app_module.startup_span()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            results["upload_and_chunk"] = await bench_upload_and_chunk(
+                client, args.txt_sizes_kb, args.pdf_pages, args.repeats
+            )
+            results["upload_process_index"] = await bench_upload_process_index(
+                client, args.index_doc_kb, args.index_uploads, args.index_concurrency
+            )
+            results["search"] = await bench_search(
+                client, args.search_concurrency, args.search_requests, args.search_limit
+            )
+            results["chat_history_growth"] = await bench_chat_history_growth(
+                client, args.history_turns, set(args.history_checkpoints), settings.CHAT_HISTORY_PATH
+            )
+    finally:
+        await app_module.shutdown_span()
+        files_dir = app_module.app.data_controller.files_dir
+        for project_id in ["benchingest"] + [f"benchindex{i}" for i in range(4)]:
+            shutil.rmtree(os.path.join(files_dir, project_id), ignore_errors=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=None, help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--vectordb", choices=["memory", "milvus-lite"], default="memory")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--generation-latency-ms", type=float, default=50.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=2.0)
+    parser.add_argument("--embedding-latency-per-text-ms", type=float, default=0.5)
+    parser.add_argument("--search-latency-ms", type=float, default=0.0)
+    parser.add_argument("--txt-sizes-kb", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--index-doc-kb", type=int, default=100)
+    parser.add_argument("--index-uploads", type=int, default=20)
+    parser.add_argument("--index-concurrency", type=int, default=4)
+    parser.add_argument("--search-concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--search-requests", type=int, default=200)
+    parser.add_argument("--search-limit", type=int, default=5)
+    parser.add_argument("--history-turns", type=int, default=50)
+    parser.add_argument("--history-checkpoints", type=int, nargs="+", default=[1, 10, 25, 50])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="collabry-bench-")
+    try:
+        started = time.perf_counter()
+        results = asyncio.run(run(args, workdir))
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "duration_s": elapsed,
+            "params": vars(args),
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,13 @@ import string
 
 class BaseController:
     def __init__(self):
-        self.app_settings=get_settings()
         self.base_dir=os.path.dirname(os.path.dirname(__file__))
         self.files_dir=os.path.join(self.base_dir,"assets/files")
 
+    @property
+    def app_settings(self) -> Settings:
+        # Read on every access so app-scoped controllers see reload_settings()
+        return get_settings()
+
     def generate_random_string(self,length:int=12):
         return ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
\ No newline at end of file
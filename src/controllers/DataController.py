@@ -2,33 +2,76 @@ from .BaseController import BaseController
 from fastapi import FastAPI, UploadFile
 from models.enums import ResponseSignal
 from .ProjectController import ProjectController
+from models.enums import ProcessingEnum
+from stores.DocumentLoader import DocumentLoaderRegistry
+import codecs
 import re
 import os
 
+# Leading bytes of the binary formats; every other supported format is UTF-8 text
+FILE_SIGNATURES = {
+    ProcessingEnum.PDF.value: b"%PDF-",
+    ProcessingEnum.DOCX.value: b"PK\x03\x04",
+}
+
 class DataController(BaseController):
-    def __init__(self):
+    def __init__(self,project_controller:ProjectController=None):
         super().__init__()
         self.size_scale=1024*1024
+        self.project_controller=project_controller or ProjectController()
+        self.asset_store=self.project_controller.asset_store
+        self.loader_registry=DocumentLoaderRegistry(self.app_settings)
+
+    def get_max_upload_bytes(self):
+        return self.app_settings.FILE_MAX_SIZE*self.size_scale
 
     def validate_uploaded_file(self,file:UploadFile):
         if file.content_type not in  self.app_settings.FILE_ALLOWED_TYPES:
             return False,ResponseSignal.FILE_TYPE_NOT_SUPPORTED.value
         
-        if file.size >self.app_settings.FILE_MAX_SIZE*self.size_scale:
+        # The declared size is only a first filter; save_upload counts the real bytes
+        if file.size is not None and file.size >self.get_max_upload_bytes():
             return False,ResponseSignal.FILE_SIZE_EXCEEDED.value
         
         return True,ResponseSignal.FILE_VALIDATED_SUCCESS.value
     
+    def check_file_signature(self,file_name:str,content_type:str,head:bytes):
+        """Rejection signal when the first block does not match the declared format, else None"""
+        extension=self.loader_registry.resolve_extension(file_name,content_type)
+        if extension is None:
+            return ResponseSignal.FILE_TYPE_NOT_SUPPORTED.value
+
+        if extension==ProcessingEnum.PDF.value:
+            # The PDF header may follow a little leading junk
+            return None if FILE_SIGNATURES[extension] in head[:1024] else ResponseSignal.FILE_SIGNATURE_MISMATCH.value
+        if extension in FILE_SIGNATURES:
+            return None if head.startswith(FILE_SIGNATURES[extension]) else ResponseSignal.FILE_SIGNATURE_MISMATCH.value
+
+        # Text formats: no NUL bytes and valid UTF-8, allowing a character cut at the block end
+        if b"\x00" in head:
+            return ResponseSignal.FILE_SIGNATURE_MISMATCH.value
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head,final=False)
+        except UnicodeDecodeError:
+            return ResponseSignal.FILE_SIGNATURE_MISMATCH.value
+        return None
+
     def generate_unique_filepath(self,original_file_name:str,project_id:str):
         random_key=self.generate_random_string()
-        project_path=ProjectController().get_project_path(project_id=project_id)
+        project_path=self.project_controller.get_project_path(project_id=project_id)
         cleaned_file_name=self.get_clean_file_name(original_file_name)
         new_file_path=os.path.join(project_path,f"{random_key}_{cleaned_file_name}")
-        while os.path.exists(new_file_path):
+        while self.is_file_id_taken(project_id,f"{random_key}_{cleaned_file_name}"):
             random_key=self.generate_random_string()
             new_file_path=os.path.join(project_path,f"{random_key}_{cleaned_file_name}")
         return new_file_path,f"{random_key}_{cleaned_file_name}"
 
+    def is_file_id_taken(self,project_id:str,file_id:str):
+        # The store may keep the original compressed, or only its extracted text
+        stored_path,_=self.asset_store.get_stored_path(project_id=project_id,file_id=file_id)
+        return (stored_path is not None
+                or self.asset_store.get_extracted_text_path(project_id=project_id,file_id=file_id) is not None)
+
 
     def get_clean_file_name(self,orig_file_name:str):
         cleaned_file_name=re.sub(r"[^\w.]","",orig_file_name.strip())
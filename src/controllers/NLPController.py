@@ -1,99 +1,982 @@
 from .BaseController import BaseController
 from models.db_schemes import Project, DataChunk
 from stores.llm.LLMEnum import DocumentTypeEnum
+from stores.llm.providers.Prompt import summary_prompt
+from stores.llm.DimensionReducer import DimensionReducer
+from helpers.single_flight import SingleFlight
+from helpers.fair_scheduler import get_fair_scheduler, INTERACTIVE, INGESTION
+from stores.VectorDB.VectorDBEnum import DistanceMethodEnums
+from stores.CollectionRegistry.CollectionRegistry import BUILDING, READY, CANCELLED, FAILED
+from helpers.metrics import (STAGE_LATENCY, LLM_TOKENS, CHUNKS, ERRORS, EMBEDDING_MIGRATION_OVERLAP,
+                             estimate_tokens)
+from helpers.tracing import tracer
 from typing import List
-import json
+from enum import Enum
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+import numpy as np
+
+INGESTION_USER = "ingestion"
+
+
+def to_jsonable(value):
+    """Plain JSON types for a vector DB description, walking objects through their __dict__"""
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "__dict__"):
+        return to_jsonable(vars(value))
+    return str(value)
+
+
+class EmbeddingVersion:
+    """An embedding model together with the physical collection holding its vectors"""
+
+    def __init__(self, collection_name: str, backend: str, client, reducer: DimensionReducer):
+        self.collection_name = collection_name
+        self.backend = backend
+        self.client = client
+        self.reducer = reducer
+
+    def describe(self) -> dict:
+        return {
+            "collection_name": self.collection_name,
+            "backend": self.backend,
+            "model_id": self.client.embedding_model_id,
+            "embedding_size": self.client.embedding_size,
+            "vector_size": self.reducer.output_size,
+        }
+
+
+class EmbeddingMigration:
+    """Progress of re-embedding the stored chunks into a shadow collection
+
+    Records up to copy_upto are copied from the document store in id order;
+    chunks indexed after the migration started get higher ids and are written
+    to the shadow collection directly.
+    """
+
+    def __init__(self, version: EmbeddingVersion, copy_upto: int, total: int,
+                       rate: float, auto_switch: bool, copied_upto: int = 0, copied: int = 0):
+        self.version = version
+        self.copy_upto = copy_upto
+        self.total = total
+        self.rate = rate
+        self.auto_switch = auto_switch
+        self.copied_upto = copied_upto
+        self.copied = copied
+        self.state = BUILDING
+        self.error = None
+        self.task = None
+        # Set on shutdown: the copy stops after the batch in flight, so the recorded
+        # progress matches what the shadow collection holds
+        self.stopping = False
+        self.started_at = time.time()
+        self.overlap_sum = 0.0
+        self.dual_reads = 0
+
+    def in_shadow(self, record_id: int) -> bool:
+        return record_id <= self.copied_upto or record_id > self.copy_upto
+
+    def describe(self) -> dict:
+        return {
+            "target": self.version.describe(),
+            "state": self.state,
+            "error": self.error,
+            "copied": self.copied,
+            "total": self.total,
+            "progress": min(1.0, self.copied / self.total) if self.total else 1.0,
+            "rate": self.rate,
+            "auto_switch": self.auto_switch,
+            "dual_reads": self.dual_reads,
+            "mean_overlap": self.overlap_sum / self.dual_reads if self.dual_reads else None,
+        }
+
 
 class NLPController(BaseController):
 
     def __init__(self, vectordb_client, generation_client, 
-                 embedding_client):
+                 embedding_client, document_store=None,
+                 collection_registry=None, embedding_client_factory=None,
+                 index_maintenance=None):
         super().__init__()
-        self.collection_name=self.app_settings.VECTOR_DB_COLLECTION_NAME
+        # Logical collection name; the vector DB collection behind it depends on the
+        # embedding version, the document store always uses this name
+        self.collection_alias=self.app_settings.VECTOR_DB_COLLECTION_NAME
         self.vectordb_client = vectordb_client
+        # Set when the vector DB keeps only ids and vectors (VECTOR_DB_TEXT_STORAGE=local)
+        self.document_store = document_store
         self.generation_client = generation_client
-        self.embedding_client = embedding_client
+        self.collection_registry = collection_registry
+        # (backend, model_id, embedding_size) -> embedding client, for other model versions
+        self.embedding_client_factory = embedding_client_factory
+        # Counts inserted and deleted rows per collection for compaction and index rebuilds
+        self.index_maintenance = index_maintenance
+        self.logger = logging.getLogger(__name__)
+        self.active_version = self.resolve_active_version(embedding_client)
+        self.migration = None
+        self.background_tasks = set()
+
+        # The controller is app-scoped, so identical concurrent requests coalesce here
+        self.embedding_flight = SingleFlight("embedding")
+        self.retrieval_flight = SingleFlight("retrieval")
+        self.generation_flight = SingleFlight("generation")
+        # Per-user queues and priority lanes in front of the backends;
+        # a coalesced call is charged to its first caller
+        self.embedding_scheduler = get_fair_scheduler("embedding")
+        self.generation_scheduler = get_fair_scheduler("generation")
+        self.vectordb_scheduler = get_fair_scheduler("vectordb")
+
+        self.embedding_latency = STAGE_LATENCY.labels(component="nlp", stage="embedding")
+        self.retrieval_latency = STAGE_LATENCY.labels(component="nlp", stage="retrieval")
+        self.indexing_latency = STAGE_LATENCY.labels(component="nlp", stage="indexing")
+        self.generation_latency = STAGE_LATENCY.labels(component="nlp", stage="generation")
+        self.shard_latency = STAGE_LATENCY.labels(component="nlp", stage="shard_search")
+        self.shard_timeouts = ERRORS.labels(provider="vectordb", operation="shard_timeout")
+        self.shard_slots = asyncio.Semaphore(max(1, self.app_settings.SEARCH_MAX_INFLIGHT_SHARDS))
+        self.ingestion_batch_size = max(1, self.app_settings.INGESTION_BATCH_SIZE)
+        generation_provider = self.app_settings.GENERATION_BACKEND
+        self.prompt_tokens = LLM_TOKENS.labels(provider=generation_provider, direction="prompt")
+        self.completion_tokens = LLM_TOKENS.labels(provider=generation_provider, direction="completion")
+        self.indexed_chunks = CHUNKS.labels(stage="indexed")
+        self.retrieved_chunks = CHUNKS.labels(stage="retrieved")
+        self.re_embedded_chunks = CHUNKS.labels(stage="re_embedded")
+        self.migration_errors = ERRORS.labels(provider="embedding_migration", operation="copy")
+
+    # The active version is swapped with a single assignment when a migration
+    # completes; request paths read it once and keep using that version
+
+    @property
+    def collection_name(self):
+        return self.active_version.collection_name
+
+    @property
+    def embedding_client(self):
+        return self.active_version.client
+
+    @property
+    def embedding_reducer(self):
+        return self.active_version.reducer
+
+    def create_embedding_version(self, collection_name: str, backend: str, client) -> EmbeddingVersion:
+        reducer = DimensionReducer(
+            method=self.app_settings.EMBEDDING_REDUCTION,
+            source_size=client.embedding_size,
+            target_size=self.app_settings.EMBEDDING_REDUCED_SIZE,
+            storage_dir=os.path.join(self.base_dir, self.app_settings.EMBEDDING_PROJECTION_DIR),
+            collection_name=collection_name,
+            model_id=client.embedding_model_id,
+            min_fit_samples=self.app_settings.EMBEDDING_PCA_FIT_SAMPLES,
+        )
+        return EmbeddingVersion(collection_name, backend, client, reducer)
+
+    def resolve_active_version(self, embedding_client) -> EmbeddingVersion:
+        """The collection version to serve, embedded with the model that built it"""
+        backend = self.app_settings.EMBEDDING_BACKEND
+        configured = self.create_embedding_version(self.collection_alias, backend, embedding_client)
+        if self.collection_registry is None:
+            return configured
+
+        registered = self.collection_registry.ensure(
+            self.collection_alias, backend,
+            model_id=embedding_client.embedding_model_id,
+            embedding_size=embedding_client.embedding_size,
+            vector_size=configured.reducer.output_size,
+        )
+        if (registered["backend"], registered["model_id"], registered["embedding_size"]) == \
+                (backend, embedding_client.embedding_model_id, embedding_client.embedding_size):
+            return self.create_embedding_version(registered["collection_name"], backend, embedding_client)
+
+        # Querying with another model than the one that built the collection gives a
+        # dimension error at best and meaningless neighbours at worst
+        self.logger.warning(
+            f"Collection {self.collection_alias} was embedded with {registered['model_id']} "
+            f"({registered['embedding_size']} dims) but EMBEDDING_MODEL_ID is "
+            f"{embedding_client.embedding_model_id}; serving with {registered['model_id']} "
+            f"until a migration switches the collection"
+        )
+        client = None
+        if self.embedding_client_factory is not None:
+            client = self.embedding_client_factory(
+                registered["backend"], registered["model_id"], registered["embedding_size"]
+            )
+        if client is None:
+            self.logger.error(f"Cannot create an embedding client for {registered['model_id']}")
+            return self.create_embedding_version(registered["collection_name"], backend, embedding_client)
+        return self.create_embedding_version(registered["collection_name"], registered["backend"], client)
+
+    def get_pending_model_change(self):
+        """Embedding backend, model and size from the settings when they differ from the active version"""
+        configured = {
+            "backend": self.app_settings.EMBEDDING_BACKEND,
+            "model_id": self.app_settings.EMBEDDING_MODEL_ID,
+            "embedding_size": self.app_settings.EMBEDDING_MODEL_SIZE,
+        }
+        active = self.active_version
+        if (configured["backend"], configured["model_id"], configured["embedding_size"]) == \
+                (active.backend, active.client.embedding_model_id, active.client.embedding_size):
+            return None
+        return configured
 
     def create_collection_name(self, project_id: str):
         return f"collection_{project_id}".strip()
     
     def reset_vector_db_collection(self):
+        self.embedding_reducer.reset()
+        if self.document_store is not None:
+            self.document_store.delete_collection(self.collection_alias)
+        if self.index_maintenance is not None:
+            self.index_maintenance.forget(self.collection_name)
         return self.vectordb_client.delete_collection(collection_name=self.collection_name)
     
     def get_vector_db_collection_info(self):
         collection_info = self.vectordb_client.get_collection_info(collection_name=self.collection_name)
 
-        return json.loads(
-            json.dumps(collection_info, default=lambda x: x.__dict__)
-        )
+        return to_jsonable(collection_info)
     
-    def index_into_vector_db(self, chunks: List[DataChunk],
+    async def index_into_vector_db(self, chunks: List[DataChunk],
                                    chunks_ids: List[int], 
-                                   do_reset: bool = False):
-        
+                                   do_reset: bool = False,
+                                   pending: list = None,
+                                   indexed: list = None):
+        """Embed and index a batch of chunks
+
+        While the collection has no PCA projection yet, batches are embedded and
+        held in `pending` (one list per upload) instead, until enough embeddings
+        are buffered to fit one; flush_pending_index indexes what is left.
+        The rows that went in are appended to `indexed`, for delete_indexed.
+        """
 
         # step2: manage items
         texts = [ c["chunk_text"] for c in chunks ]
         metadata = [ c["chunk_metadata"] for c in  chunks]
-        vectors = self.embedding_client.embed_text(text=texts, 
-                                            document_type=DocumentTypeEnum.DOCUMENT.value)
-        
-        # step3: create collection if not exists
-        _ = self.vectordb_client.create_collection(
-            collection_name=self.collection_name,
-            embedding_size=self.embedding_client.embedding_size,
-            do_reset=do_reset,
+        version = self.active_version
+        with self.embedding_latency.time(), tracer.start_as_current_span("embed_text") as span:
+            span.set_attribute("collabry.chunk_count", len(texts))
+            span.set_attribute("collabry.embedding_model", str(version.client.embedding_model_id))
+            vectors = await self.embed_documents(texts, version.client)
+        if vectors is None:
+            return False
+
+        if do_reset:
+            # The shadow collection would be rebuilt from chunks that are about to go away
+            await self.cancel_embedding_migration()
+            version.reducer.reset()
+
+        if pending is not None and not await asyncio.to_thread(version.reducer.is_fitted):
+            pending.append((version, texts, metadata, vectors, chunks_ids, do_reset))
+            if sum(len(batch[1]) for batch in pending) < version.reducer.min_fit_samples:
+                return True
+            return await self.flush_pending_index(pending, indexed=indexed)
+
+        vectors = await asyncio.to_thread(version.reducer.fit_transform, vectors)
+        if vectors is None:
+            return False
+        return await self.insert_batch(version, texts, metadata, vectors, chunks_ids, do_reset, indexed=indexed)
+
+    async def flush_pending_index(self, pending: list, indexed: list = None) -> bool:
+        """Fit the projection on the buffered embeddings if still needed, then index them"""
+        if not pending:
+            return True
+        batches = list(pending)
+        pending.clear()
+        version = batches[0][0]
+        if version is not self.active_version:
+            self.logger.error(f"The collection switched away from {version.collection_name} "
+                              f"while chunks waited for its projection")
+            return False
+        # A concurrent upload may have fitted it meanwhile; fewer samples than dimensions are refused
+        samples = np.vstack([np.asarray(batch[3], dtype=np.float32) for batch in batches])
+        if not await asyncio.to_thread(version.reducer.ensure_fitted, samples):
+            return False
+        for version, texts, metadata, vectors, chunks_ids, do_reset in batches:
+            vectors = await asyncio.to_thread(version.reducer.transform, vectors)
+            if vectors is None:
+                return False
+            if not await self.insert_batch(version, texts, metadata, vectors, chunks_ids, do_reset,
+                                           indexed=indexed):
+                return False
+        return True
+
+    async def insert_batch(self, version: EmbeddingVersion, texts: list, metadata: list,
+                           vectors, chunks_ids: list, do_reset: bool = False,
+                           indexed: list = None) -> bool:
+        with self.indexing_latency.time(), tracer.start_as_current_span("insert_many") as span:
+            span.set_attribute("collabry.chunk_count", len(texts))
+            span.set_attribute("collabry.collection", version.collection_name)
+            # step3: create collection if not exists
+            _ = await asyncio.to_thread(
+                self.vectordb_client.create_collection,
+                collection_name=version.collection_name,
+                embedding_size=version.reducer.output_size,
+                do_reset=do_reset,
+            )
+            if do_reset and self.index_maintenance is not None:
+                self.index_maintenance.forget(version.collection_name)
+
+            # step4: with a local document store, the text goes there and the
+            # vector DB only gets the record ids it assigned
+            record_ids = None
+            if self.document_store is not None:
+                if do_reset:
+                    await asyncio.to_thread(self.document_store.delete_collection, self.collection_alias)
+                record_ids = await asyncio.to_thread(
+                    self.document_store.insert_many,
+                    collection_name=self.collection_alias,
+                    texts=texts,
+                    metadata=metadata,
+                    doc_ids=chunks_ids,
+                )
+
+            # step5: insert into vector db
+            inserted = []
+            is_inserted = await self.insert_vectors(version, texts, metadata, vectors, chunks_ids, record_ids,
+                                                    inserted=inserted)
+            if is_inserted and record_ids is not None:
+                await self.index_into_other_versions(version, texts, metadata, chunks_ids, record_ids,
+                                                     inserted=inserted)
+        if not is_inserted:
+            # Sub-batches inserted before the failing one would be left without their siblings
+            await self.delete_vectors(inserted)
+            if record_ids:
+                await asyncio.to_thread(self.document_store.delete_records, record_ids)
+            return False
+        if indexed is not None:
+            indexed.extend(inserted)
+        self.indexed_chunks.inc(len(texts))
+
+        return True
+
+    async def insert_vectors(self, version: EmbeddingVersion, texts: list, metadata: list,
+                             vectors, doc_ids: list, record_ids: list = None,
+                             inserted: list = None) -> bool:
+        """Insert into the version's collection, one ingestion slot per batch
+
+        The rows of every batch that went in are appended to `inserted` as
+        (collection_name, record_ids), for delete_vectors to undo.
+        """
+        for start in range(0, len(texts), self.ingestion_batch_size):
+            end = start + self.ingestion_batch_size
+            async with self.vectordb_scheduler.slot(INGESTION_USER, lane=INGESTION):
+                inserted_ids = await asyncio.to_thread(
+                    self.vectordb_client.insert_many,
+                    collection_name=version.collection_name,
+                    texts=texts[start:end] if record_ids is None else None,
+                    metadata=metadata[start:end] if record_ids is None else None,
+                    vectors=vectors[start:end],
+                    doc_ids=doc_ids[start:end],
+                    record_ids=record_ids[start:end] if record_ids is not None else None,
+                )
+            if not inserted_ids:
+                return False
+            if inserted is not None:
+                inserted.append((version.collection_name, inserted_ids))
+            if self.index_maintenance is not None:
+                self.index_maintenance.record_inserts(version.collection_name, len(vectors[start:end]))
+        return True
+
+    async def delete_vectors(self, inserted: list):
+        """Delete the rows insert_vectors recorded in `inserted`"""
+        for collection_name, record_ids in inserted:
+            try:
+                deleted = await asyncio.to_thread(self.vectordb_client.delete_by_record_ids,
+                                                  collection_name, record_ids)
+            except Exception as e:
+                self.logger.error(f"Could not delete {len(record_ids)} rows from {collection_name}: {e}")
+                continue
+            if self.index_maintenance is not None:
+                self.index_maintenance.record_deletes(collection_name, deleted)
+
+    async def delete_indexed(self, indexed: list):
+        """Undo an upload: delete the rows insert_batch recorded in `indexed`, text included"""
+        await self.delete_vectors(indexed)
+        if self.document_store is not None:
+            # With a local document store the vector DB rows carry its record ids
+            record_ids = sorted({record_id for _, record_ids in indexed for record_id in record_ids})
+            await asyncio.to_thread(self.document_store.delete_records, record_ids)
+        indexed.clear()
+
+    async def index_version(self, version: EmbeddingVersion, texts: list, metadata: list,
+                            doc_ids: list, record_ids: list, inserted: list = None) -> bool:
+        """Embed with the version's model and insert into its collection"""
+        vectors = await self.embed_documents(texts, version.client)
+        if vectors is None:
+            return False
+        vectors = await asyncio.to_thread(version.reducer.fit_transform, vectors)
+        if vectors is None:
+            return False
+        return await self.insert_vectors(version, texts, metadata, vectors, doc_ids, record_ids,
+                                         inserted=inserted)
+
+    async def index_into_other_versions(self, version: EmbeddingVersion, texts: list, metadata: list,
+                                        doc_ids: list, record_ids: list, inserted: list = None):
+        """Write chunks that went to `version` into the versions that would otherwise miss them"""
+        current = self.active_version
+        if current is not version:
+            # The alias switched while this batch was being indexed
+            if not await self.index_version(current, texts, metadata, doc_ids, record_ids, inserted=inserted):
+                self.logger.error(f"Indexing into {current.collection_name} after the switch failed")
+
+        migration = self.migration
+        if migration is None or migration.version in (version, current):
+            return
+        # Chunks up to copy_upto are picked up by the copy, newer ones are dual-written
+        keep = [i for i, record_id in enumerate(record_ids) if record_id > migration.copy_upto]
+        if not keep:
+            return
+        is_inserted = await self.index_version(
+            migration.version,
+            [texts[i] for i in keep], [metadata[i] for i in keep],
+            [doc_ids[i] for i in keep], [record_ids[i] for i in keep],
+            inserted=inserted,
         )
+        if not is_inserted:
+            await self.fail_embedding_migration(migration, "dual write into the shadow collection failed")
+
+    async def embed_documents(self, texts: List[str], client=None):
+        """Embed an ingestion batch in the ingestion lane, one scheduler slot per sub-batch
+
+        Interactive query embeddings waiting for the encoder are served between
+        sub-batches instead of after the whole upload. Texts are split by length
+        order, so each sub-batch pads to similar lengths, and the vectors are
+        returned in the order of `texts`.
+        """
+        client = client or self.embedding_client
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = []
+        for start in range(0, len(texts), self.ingestion_batch_size):
+            async with self.embedding_scheduler.slot(INGESTION_USER, lane=INGESTION):
+                vectors = await client.aembed_text(
+                    text=[texts[i] for i in order[start:start + self.ingestion_batch_size]],
+                    document_type=DocumentTypeEnum.DOCUMENT.value
+                )
+            if vectors is None:
+                return None
+            batches.append(np.asarray(vectors, dtype=np.float32))
+        if not batches:
+            return None
+        vectors = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(batches)
+        return vectors
+
+    async def embed_query(self, text: str, user_id: str = None, version: EmbeddingVersion = None,
+                          lane: str = INTERACTIVE):
+        version = version or self.active_version
+        with self.embedding_latency.time(), tracer.start_as_current_span("embed_text") as span:
+            span.set_attribute("collabry.chunk_count", 1)
+            span.set_attribute("collabry.embedding_model", str(version.client.embedding_model_id))
+            vector = await self.embedding_flight.do(
+                (version.client.embedding_model_id, version.client.embedding_size, text),
+                self._embed_query,
+                text=text,
+                client=version.client,
+                user_id=user_id,
+                lane=lane
+            )
+        if vector is None:
+            return None
+        # Queries go through the same projection as the indexed chunks
+        return version.reducer.transform(vector)
+
+    async def _embed_query(self, text: str, client, user_id: str = None, lane: str = INTERACTIVE):
+        async with self.embedding_scheduler.slot(user_id, lane=lane):
+            return await client.aembed_text(
+                text=text, document_type=DocumentTypeEnum.QUERY.value
+            )
 
-        # step4: insert into vector db
-        _ = self.vectordb_client.insert_many(
-            collection_name=self.collection_name,
-            texts=texts,
-            metadata=metadata,
-            vectors=vectors,
-            doc_ids=chunks_ids,
+    async def search_vector_db_collection(self, text: str, limit: int = 10, user_id: str = None):
+        return await self.retrieval_flight.do(
+            (self.collection_name, limit, text),
+            self._search_vector_db_collection,
+            text=text,
+            limit=limit,
+            user_id=user_id
         )
 
-        return True
-    def search_vector_db_collection(self, text: str, limit: int = 10):
+    async def _search_vector_db_collection(self, text: str, limit: int = 10, user_id: str = None):
 
 
         vector=[]
+        version = self.active_version
         # step2: get text embedding vector
-        vector = self.embedding_client.embed_text(text=text, 
-                                                 document_type=DocumentTypeEnum.QUERY.value)
+        vector = await self.embed_query(text=text, user_id=user_id, version=version)
 
-        if len(vector) == 0:
+        if vector is None or len(vector) == 0:
             return False
 
         # step3: do semantic search
-        results = self.vectordb_client.search_by_vector(
-            collection_name=self.collection_name,
-            vector=vector,
-            limit=limit
-        )
+        with self.retrieval_latency.time(), tracer.start_as_current_span("search_by_vector") as span:
+            span.set_attribute("collabry.collection", version.collection_name)
+            span.set_attribute("collabry.limit", limit)
+            async with self.vectordb_scheduler.slot(user_id, lane=INTERACTIVE):
+                results = await asyncio.to_thread(
+                    self.vectordb_client.search_by_vector,
+                    collection_name=version.collection_name,
+                    vector=vector,
+                    limit=limit
+                )
+            span.set_attribute("collabry.chunk_count", len(results[0]) if results else 0)
 
         if not results:
             return False
+        self.schedule_dual_read(text, results[0], limit)
         
-        context=[]
-        for hits in results[0]:
-   
-            context.append(hits["entity"]['text'])
+        context=[text for text in await self.get_hit_texts(results[0]) if text is not None]
+        self.retrieved_chunks.inc(len(context))
 
         return context
+
+    async def get_hit_texts(self, hits: list):
+        """Text of each hit in rank order, None where the document store has no record"""
+        if self.document_store is None:
+            return [hit["entity"]["text"] for hit in hits]
+        # One batched lookup for the top-k hits
+        record_ids=[hit["id"] for hit in hits]
+        records=await asyncio.to_thread(self.document_store.get_many, self.collection_alias, record_ids)
+        return [records[record_id]["text"] if record_id in records else None for record_id in record_ids]
+
+    def _release_shard_slot(self, search: asyncio.Task):
+        self.shard_slots.release()
+        if not search.cancelled():
+            # Retrieved here too: nobody awaits the search of a shard that already timed out
+            search.exception()
+
+    async def _search_project_shard(self, vector, collection_name: str, project_id: str, limit: int,
+                                    user_id: str = None, timeout: float = None):
+        with self.shard_latency.time(), tracer.start_as_current_span("search_shard") as span:
+            span.set_attribute("collabry.project_id", project_id)
+            span.set_attribute("collabry.limit", limit)
+            async with self.vectordb_scheduler.slot(user_id, lane=INTERACTIVE):
+                # A thread cannot be cancelled: when the shard times out its search keeps
+                # running, so the slot is released when the thread returns, not here
+                await self.shard_slots.acquire()
+                search = asyncio.ensure_future(asyncio.to_thread(
+                    self.vectordb_client.search_by_vector,
+                    collection_name=collection_name,
+                    vector=vector,
+                    limit=limit,
+                    doc_id=project_id,
+                    timeout=timeout
+                ))
+                search.add_done_callback(self._release_shard_slot)
+                results = await asyncio.shield(search)
+            hits = results[0] if results else []
+            span.set_attribute("collabry.chunk_count", len(hits))
+        return [dict(hit, project_id=project_id) for hit in hits]
+
+    async def search_projects(self, text: str, project_ids: List[str], limit: int = 10,
+                              shard_timeout: float = None, user_id: str = None):
+        """Search several projects concurrently and merge their hits into one global top-k
+
+        Returns None when the query cannot be embedded, otherwise a dict with the
+        merged hits and the projects whose shard timed out or failed.
+        """
+        shard_timeout = shard_timeout or self.app_settings.SEARCH_SHARD_TIMEOUT
+        project_ids = list(dict.fromkeys(project_ids))
+
+        # One embedding for every shard
+        version = self.active_version
+        vector = await self.embed_query(text=text, user_id=user_id, version=version)
+        if vector is None or len(vector) == 0:
+            return None
+
+        with self.retrieval_latency.time(), tracer.start_as_current_span("search_projects") as span:
+            span.set_attribute("collabry.project_count", len(project_ids))
+            shards = {
+                project_id: asyncio.create_task(asyncio.wait_for(
+                    self._search_project_shard(vector, version.collection_name, project_id, limit, user_id,
+                                               timeout=shard_timeout),
+                    timeout=shard_timeout
+                ))
+                for project_id in project_ids
+            }
+            # Each shard is bounded by its own timeout, so a slow one cannot stall the rest
+            await asyncio.gather(*shards.values(), return_exceptions=True)
+
+            shard_hits, timed_out, failed = [], [], []
+            for project_id, shard in shards.items():
+                error = shard.exception()
+                if isinstance(error, TimeoutError):
+                    self.shard_timeouts.inc()
+                    timed_out.append(project_id)
+                elif error is not None:
+                    self.logger.error(f"Search shard for project {project_id} failed: {error}")
+                    failed.append(project_id)
+                else:
+                    shard_hits.append(shard.result())
+
+            # Shards search the same collection with the same model and metric, so
+            # scores compare directly; each list is already ranked, so a heap merge
+            # yields the global top-k without sorting everything
+            sign = 1 if self.vectordb_client.distance_method == DistanceMethodEnums.L2.value else -1
+            hits = list(itertools.islice(heapq.merge(*shard_hits, key=lambda hit: sign * hit["distance"]), limit))
+            span.set_attribute("collabry.chunk_count", len(hits))
+            span.set_attribute("collabry.partial", bool(timed_out or failed))
+
+        hits = [
+            {"project_id": hit["project_id"], "score": hit["distance"], "text": text}
+            for hit, text in zip(hits, await self.get_hit_texts(hits))
+            if text is not None
+        ]
+        self.retrieved_chunks.inc(len(hits))
+        return {
+            "hits": hits,
+            "partial": bool(timed_out or failed),
+            "timed_out": timed_out,
+            "failed": failed,
+        }
     
     def delete_file_from_vectorDB_by_ID(self,project_id:str):
+        collection_name=self.collection_name
         ans=self.vectordb_client.delete_document_by_id(
-            collection_name=self.collection_name,
+            collection_name=collection_name,
             doc_id=project_id
         )
+        if self.index_maintenance is not None:
+            self.index_maintenance.record_deletes(collection_name, ans)
+        migration=self.migration
+        if migration is not None:
+            shadow_deleted=self.vectordb_client.delete_document_by_id(
+                collection_name=migration.version.collection_name,
+                doc_id=project_id
+            )
+            if self.index_maintenance is not None:
+                self.index_maintenance.record_deletes(migration.version.collection_name, shadow_deleted)
+        if self.document_store is not None:
+            self.document_store.delete_by_doc_id(self.collection_alias, project_id)
         return ans
+
+    def schedule_dual_read(self, text: str, hits: list, limit: int):
+        """During a migration, compare a share of searches against the shadow collection"""
+        migration = self.migration
+        if migration is None or random.random() >= self.app_settings.EMBEDDING_MIGRATION_DUAL_READ_RATIO:
+            return
+        # Only hits the shadow collection already holds can be expected back from it
+        record_ids = [hit["id"] for hit in hits if migration.in_shadow(hit["id"])]
+        if not record_ids:
+            return
+        task = asyncio.create_task(self._dual_read(migration, text, record_ids, limit))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _dual_read(self, migration: EmbeddingMigration, text: str, record_ids: list, limit: int):
+        # Runs after the answer is served, in the ingestion lane
+        try:
+            vector = await self.embed_query(text=text, user_id=INGESTION_USER,
+                                            version=migration.version, lane=INGESTION)
+            if vector is None:
+                return
+            async with self.vectordb_scheduler.slot(INGESTION_USER, lane=INGESTION):
+                results = await asyncio.to_thread(
+                    self.vectordb_client.search_by_vector,
+                    collection_name=migration.version.collection_name,
+                    vector=vector,
+                    limit=limit
+                )
+        except Exception as e:
+            self.logger.warning(f"Dual read against {migration.version.collection_name} failed: {e}")
+            return
+        shadow_ids = {hit["id"] for hit in results[0]} if results else set()
+        overlap = len(shadow_ids.intersection(record_ids)) / len(record_ids)
+        migration.overlap_sum += overlap
+        migration.dual_reads += 1
+        EMBEDDING_MIGRATION_OVERLAP.labels(collection=migration.version.collection_name).observe(overlap)
+
+    def get_embedding_versions(self) -> dict:
+        return {
+            "alias": self.collection_alias,
+            "active": self.active_version.describe(),
+            "pending_model_change": self.get_pending_model_change(),
+            "migration": self.migration.describe() if self.migration is not None else None,
+            "versions": (self.collection_registry.get(self.collection_alias) or {}).get("versions")
+                        if self.collection_registry is not None else None,
+        }
+
+    async def start_embedding_migration(self, model_id: str, embedding_size: int, backend: str = None,
+                                        rate: float = None, auto_switch: bool = True):
+        """Re-embed the stored chunks into a shadow collection with another model
+
+        The active collection keeps serving while the copy runs in the background
+        at `rate` chunks per second. Returns the migration status, or None when it
+        cannot start (the reason is logged).
+        """
+        if self.collection_registry is None or self.embedding_client_factory is None:
+            self.logger.error("Embedding migrations need the collection registry and an embedding client factory")
+            return None
+        if self.document_store is None:
+            self.logger.error("Re-embedding reads the chunk text from the local document store "
+                              "(VECTOR_DB_TEXT_STORAGE=local)")
+            return None
+        if self.migration is not None:
+            self.logger.error(f"A migration to {self.migration.version.collection_name} is already running")
+            return None
+
+        backend = backend or self.app_settings.EMBEDDING_BACKEND
+        client = self.embedding_client_factory(backend, model_id, embedding_size)
+        if client is None:
+            self.logger.error(f"Cannot create an embedding client for {backend}/{model_id}")
+            return None
+        collection_name = self.collection_registry.next_collection_name(self.collection_alias)
+        version = self.create_embedding_version(collection_name, backend, client)
+        version.reducer.reset()
+        if not await self.fit_version_projection(version):
+            self.logger.error(f"Cannot fit the projection of {collection_name} on the stored chunks")
+            return None
+        await asyncio.to_thread(
+            self.vectordb_client.create_collection,
+            collection_name=collection_name,
+            embedding_size=version.reducer.output_size,
+            do_reset=True,
+        )
+        total = await asyncio.to_thread(self.document_store.count, self.collection_alias)
+
+        # No await between reading the high-water mark and publishing the migration:
+        # every record either has an id up to copy_upto or sees the migration when indexed
+        copy_upto = self.document_store.max_record_id(self.collection_alias)
+        self.collection_registry.add_version(
+            self.collection_alias, collection_name, backend, model_id, embedding_size,
+            version.reducer.output_size, copy_upto=copy_upto, copied_upto=0, copied=0, total=total,
+            auto_switch=auto_switch,
+        )
+        migration = EmbeddingMigration(version, copy_upto=copy_upto, total=total,
+                                       rate=self.app_settings.EMBEDDING_MIGRATION_RATE if rate is None else rate,
+                                       auto_switch=auto_switch)
+        self.migration = migration
+        migration.task = asyncio.create_task(self._run_embedding_migration(migration))
+        self.logger.info(f"Re-embedding {total} chunks of {self.collection_alias} into {collection_name} "
+                         f"with {model_id}")
+        return migration.describe()
+
+    async def fit_version_projection(self, version: EmbeddingVersion) -> bool:
+        """Fit a new version's PCA projection on stored chunks before anything is indexed into it"""
+        if await asyncio.to_thread(version.reducer.is_fitted):
+            return True
+        alias = self.collection_alias
+        upto = await asyncio.to_thread(self.document_store.max_record_id, alias)
+        records = await asyncio.to_thread(self.document_store.get_range, alias, 0, upto,
+                                          version.reducer.min_fit_samples)
+        vectors = await self.embed_documents([record["text"] for record in records], version.client)
+        if vectors is None:
+            return False
+        return await asyncio.to_thread(version.reducer.ensure_fitted, vectors)
+
+    async def resume_embedding_migration(self):
+        """Continue a migration interrupted by a restart from its last copied record"""
+        if self.collection_registry is None or self.embedding_client_factory is None or self.migration is not None:
+            return None
+        building = self.collection_registry.get_building_version(self.collection_alias)
+        if building is None or self.document_store is None:
+            return None
+        client = self.embedding_client_factory(building["backend"], building["model_id"], building["embedding_size"])
+        if client is None:
+            self.logger.error(f"Cannot resume the migration to {building['collection_name']}: no embedding client")
+            return None
+        version = self.create_embedding_version(building["collection_name"], building["backend"], client)
+        migration = EmbeddingMigration(version, copy_upto=building["copy_upto"], total=building["total"],
+                                       rate=self.app_settings.EMBEDDING_MIGRATION_RATE,
+                                       auto_switch=building.get("auto_switch", True),
+                                       copied_upto=building["copied_upto"], copied=building["copied"])
+        self.migration = migration
+        migration.task = asyncio.create_task(self._run_embedding_migration(migration))
+        self.logger.info(f"Resuming the migration to {version.collection_name} after record {migration.copied_upto}")
+        return migration.describe()
+
+    async def _run_embedding_migration(self, migration: EmbeddingMigration):
+        alias = self.collection_alias
+        try:
+            while migration.copied_upto < migration.copy_upto and not migration.stopping:
+                started = time.monotonic()
+                records = await asyncio.to_thread(
+                    self.document_store.get_range, alias,
+                    migration.copied_upto, migration.copy_upto, self.ingestion_batch_size,
+                )
+                if not records:
+                    break
+                is_inserted = await self.index_version(
+                    migration.version,
+                    [record["text"] for record in records],
+                    [record["metadata"] for record in records],
+                    [record["doc_id"] for record in records],
+                    [record["record_id"] for record in records],
+                )
+                if not is_inserted:
+                    raise RuntimeError(f"inserting into {migration.version.collection_name} failed")
+                migration.copied_upto = records[-1]["record_id"]
+                migration.copied += len(records)
+                self.re_embedded_chunks.inc(len(records))
+                await asyncio.to_thread(
+                    self.collection_registry.update_version, alias, migration.version.collection_name,
+                    copied_upto=migration.copied_upto, copied=migration.copied,
+                )
+                if migration.rate and not migration.stopping:
+                    await asyncio.sleep(max(0.0, len(records) / migration.rate - (time.monotonic() - started)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.fail_embedding_migration(migration, str(e))
+            return
+        if migration.stopping:
+            return
+
+        migration.state = READY
+        self.collection_registry.update_version(alias, migration.version.collection_name,
+                                                state=READY, auto_switch=migration.auto_switch)
+        self.logger.info(f"Shadow collection {migration.version.collection_name} is complete")
+        if migration.auto_switch:
+            self.switch_embedding_version()
+
+    def switch_embedding_version(self) -> bool:
+        """Point the alias at the completed shadow collection"""
+        migration = self.migration
+        if migration is None or migration.state != READY:
+            return False
+        if not self.collection_registry.switch(self.collection_alias, migration.version.collection_name):
+            return False
+        # Requests holding the previous version finish on it; the retired collection is kept
+        self.active_version = migration.version
+        self.migration = None
+        return True
+
+    async def fail_embedding_migration(self, migration: EmbeddingMigration, reason: str):
+        if self.migration is not migration:
+            return
+        self.migration_errors.inc()
+        self.logger.error(f"Migration to {migration.version.collection_name} failed: {reason}")
+        migration.state = FAILED
+        migration.error = reason
+        if migration.task is not None and migration.task is not asyncio.current_task():
+            migration.task.cancel()
+        await self._drop_migration(migration, FAILED)
+
+    async def cancel_embedding_migration(self) -> bool:
+        migration = self.migration
+        if migration is None:
+            return False
+        if migration.task is not None:
+            migration.task.cancel()
+            await asyncio.gather(migration.task, return_exceptions=True)
+        migration.state = CANCELLED
+        await self._drop_migration(migration, CANCELLED)
+        return True
+
+    async def _drop_migration(self, migration: EmbeddingMigration, state: str):
+        if self.migration is migration:
+            self.migration = None
+        self.collection_registry.update_version(self.collection_alias, migration.version.collection_name,
+                                                state=state, error=migration.error)
+        migration.version.reducer.reset()
+        await asyncio.to_thread(self.vectordb_client.delete_collection,
+                                collection_name=migration.version.collection_name)
+        if self.index_maintenance is not None:
+            self.index_maintenance.forget(migration.version.collection_name)
+
+    async def close(self, timeout: float = 10.0):
+        """Stop background work; an unfinished migration resumes on the next start"""
+        tasks = list(self.background_tasks)
+        for task in tasks:
+            task.cancel()
+        migration = self.migration
+        if migration is not None and migration.task is not None:
+            migration.stopping = True
+            try:
+                await asyncio.wait_for(asyncio.shield(migration.task), timeout=timeout)
+            except TimeoutError:
+                migration.task.cancel()
+                tasks.append(migration.task)
+            except Exception:
+                pass
+        await asyncio.gather(*tasks, return_exceptions=True)
     
-    def get_chatbot_answer(self,prompt,user_id,context,chat_history_manager):
-        ans=self.generation_client.generate_text(
-            prompt=prompt,
-            user_id=user_id,
-            context=context,
+    def construct_query(self, prompt: str, context: List[str] = None):
+        if not context:
+            return prompt
+        context_str = "\n\n".join(
+            f"[Context {i+1}]: {text[:500]}{'...' if len(text) > 500 else ''}"
+            for i, text in enumerate(context)
+        )
+        return f"Context:\n{context_str}\n\nQuestion: {prompt}"
+
+    async def get_chatbot_answer(self,prompt,user_id,context,chat_history_manager):
+        with tracer.start_as_current_span("get_conversation") as span:
+            history=await asyncio.to_thread(chat_history_manager.get_conversation, user_id=user_id)
+            span.set_attribute("collabry.message_count", len(history))
+        query=self.construct_query(prompt=prompt, context=context)
+        prompt_tokens=estimate_tokens(query) + sum(estimate_tokens(m["content"]) for m in history)
+        with self.generation_latency.time(), tracer.start_as_current_span("generate_text") as span:
+            span.set_attribute("gen_ai.request.model", str(self.generation_client.generation_model_id))
+            span.set_attribute("collabry.context_chunks", len(context or []))
+            span.set_attribute("gen_ai.usage.input_tokens", prompt_tokens)
+            if history:
+                ans=await self._generate(query=query, history=history, user_id=user_id)
+            else:
+                # Without history the answer depends on the query only, so it can be shared
+                ans=await self.generation_flight.do(
+                    (self.generation_client.generation_model_id, query),
+                    self._generate,
+                    query=query,
+                    user_id=user_id,
+                )
+            span.set_attribute("gen_ai.usage.output_tokens", estimate_tokens(ans))
+        self.prompt_tokens.inc(prompt_tokens)
+        self.completion_tokens.inc(estimate_tokens(ans))
+        if ans:
+            with tracer.start_as_current_span("add_message"):
+                await asyncio.to_thread(
+                    chat_history_manager.add_message, user_id=user_id, question=prompt, answer=ans
+                )
+        return ans
+
+    async def _generate(self, query: str, history: List[dict] = None, user_id: str = None):
+        # The fair scheduler picks whose turn it is; admission, hedging and fallback
+        # are handled by the generation client
+        async with self.generation_scheduler.slot(user_id):
+            return await self.generation_client.agenerate_text(prompt=query, chat_history=history)
+
+    def check_generation_admission(self):
+        """Raise AdmissionRejected now if the answer could not be generated in time"""
+        self.generation_client.check_admission()
+
+    def get_scheduler_stats(self):
+        return {
+            scheduler.name: scheduler.stats()
+            for scheduler in (self.embedding_scheduler, self.generation_scheduler, self.vectordb_scheduler)
+        }
+
+    async def get_index_maintenance_report(self):
+        if self.index_maintenance is None:
+            return None
+        return await self.index_maintenance.get_report()
+
+    async def run_index_maintenance(self):
+        if self.index_maintenance is None:
+            return None
+        return await self.index_maintenance.run_now()
+
+    def get_coalescing_stats(self):
+        return {
+            flight.name: flight.stats()
+            for flight in (self.embedding_flight, self.retrieval_flight, self.generation_flight)
+        }
+
+    def summarize_conversation(self, summary: str, turns: List[dict]):
+        turns_str = "\n".join(
+            f"User: {turn['question']}\nCollabry: {turn['answer']}"
+            for turn in turns
+        )
+        return self.generation_client.generate_text(
+            prompt=summary_prompt.format(summary=summary or "(empty)", turns=turns_str)
         )
-        return ans
\ No newline at end of file
@@ -1,59 +1,85 @@
 from .BaseController import BaseController
 from .ProjectController import ProjectController
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from models.enums import ProcessingEnum
+from helpers.metrics import STAGE_LATENCY, CHUNKS
+from stores.DocumentLoader import DocumentLoaderRegistry, DocumentSource
 import os
+import time
 
 class ProcessController(BaseController):
-    def __init__(self,project_id:str):
+    def __init__(self,project_id:str,project_controller:ProjectController,
+                      loader_registry:DocumentLoaderRegistry=None):
         super().__init__()
         self.project_id=project_id
-        self.project_path=ProjectController().get_project_path(self.project_id)
+        # The app-scoped ProjectController and loader registry are shared across requests
+        self.project_path=project_controller.get_project_path(self.project_id)
+        self.asset_store=project_controller.asset_store
+        self.loader_registry=loader_registry or DocumentLoaderRegistry(self.app_settings)
 
     def get_file_extension(self,file_id):
-        return os.path.splitext(file_id)[-1]
+        return os.path.splitext(file_id)[-1].lower()
 
+    def timed_records(self,records):
+        # Loaders are lazy, so only the time spent inside them counts as load time
+        elapsed=0.0
+        while True:
+            start=time.perf_counter()
+            record=next(records,None)
+            elapsed+=time.perf_counter()-start
+            if record is None:
+                break
+            yield record
+        STAGE_LATENCY.labels(component="process", stage="load").observe(elapsed)
 
-    def get_file_loader(self,file_id:str):
-        file_ext=self.get_file_extension(file_id=file_id)
-        file_path=os.path.join(self.project_path,file_id)
-        if not os.path.exists(file_path):
-            return None
-        if file_ext==ProcessingEnum.TXT.value:
-            return TextLoader(file_path=file_path,encoding="utf-8")
-        
-        if file_ext==ProcessingEnum.PDF.value:
-            return PyMuPDFLoader(file_path=file_path)
-        
-        return None
-    
     def get_file_content(self,file_id:str):
-        loader=self.get_file_loader(file_id=file_id)
-        if loader:
-             return loader.load()
-        return None
-    
-    def process_file_content(self,file_id:str,
-                             file_content:list,chunk_size:int=5000,overlap:int=20):
-        
+        """Lazy page/section records of the file, or None when no loader can read it"""
+        source=DocumentSource(
+            asset_store=self.asset_store,
+            project_id=self.project_id,
+            file_id=file_id,
+            source_path=os.path.join(self.project_path,file_id)
+        )
+        path,_=self.asset_store.get_stored_path(self.project_id,file_id)
+        if path is None:
+            # Originals removed by text_only retention can still be re-chunked from their text
+            if self.asset_store.get_extracted_text_path(self.project_id,file_id) is None:
+                return None
+            source.extracted=True
+            loader=self.loader_registry.create(file_id,extension=ProcessingEnum.TXT.value)
+        else:
+            asset=self.asset_store.get_asset(self.project_id,file_id)
+            loader=self.loader_registry.create(file_id,content_type=asset.get("content_type"))
+
+        if loader is None:
+            return None
+        return self.timed_records(loader.lazy_load(source))
+
+    def iter_file_chunks(self,file_content,chunk_size:int=5000,overlap:int=20):
         text_splitter=RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=overlap,
             length_function=len
         )
-       
-        file_content_text=[
-            record.page_content
-            for record in file_content
-        ]
-        file_content_metadate=[
-            record.metadata
-            for record in file_content
-        ]
-        chunks=text_splitter.create_documents(
-            file_content_text,
-            metadatas=file_content_metadate
-        )
-        return chunks
\ No newline at end of file
+        for record in file_content:
+            with STAGE_LATENCY.labels(component="process", stage="chunk").time():
+                chunks=text_splitter.create_documents(
+                    [record.page_content],
+                    metadatas=[record.metadata]
+                )
+            CHUNKS.labels(stage="produced").inc(len(chunks))
+            yield from chunks
+
+    def iter_chunk_batches(self,file_content,batch_size:int,chunk_size:int=5000,overlap:int=20):
+        batch=[]
+        for chunk in self.iter_file_chunks(file_content,chunk_size=chunk_size,overlap=overlap):
+            batch.append(chunk)
+            if len(batch)>=batch_size:
+                yield batch
+                batch=[]
+        if batch:
+            yield batch
+
+    def process_file_content(self,file_id:str,
+                             file_content,chunk_size:int=5000,overlap:int=20):
+        return list(self.iter_file_chunks(file_content,chunk_size=chunk_size,overlap=overlap))
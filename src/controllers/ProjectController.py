@@ -1,15 +1,29 @@
 from .BaseController import BaseController
 from fastapi import UploadFile
 from models.enums import ResponseSignal
+from stores.AssetStore import AssetStore
 import os
+
+# Project directories already created by this process, so a request does not
+# stat them again; AssetStore.save_upload re-creates one removed since
+_known_project_dirs=set()
+
 class ProjectController(BaseController):
     def __init__(self):
         super().__init__()
+        self.asset_store=AssetStore(
+            files_dir=self.files_dir,
+            compression=self.app_settings.FILE_STORAGE_COMPRESSION,
+            compression_level=self.app_settings.FILE_STORAGE_COMPRESSION_LEVEL,
+            uncompressed_extensions=self.app_settings.FILE_STORAGE_UNCOMPRESSED_EXTENSIONS,
+            retention=self.app_settings.FILE_RETENTION,
+        )
 
     def get_project_path(self,project_id:str):
         project_dir=os.path.join(
             self.files_dir,project_id
         )
-        if not os.path.exists(project_dir):
-            os.makedirs(project_dir)
+        if project_dir not in _known_project_dirs:
+            os.makedirs(project_dir,exist_ok=True)
+            _known_project_dirs.add(project_dir)
         return project_dir
@@ -0,0 +1,162 @@
+"""Admission control in front of the LLM providers.
+
+Each provider gets a concurrency limit, a bounded wait queue and an optional
+token bucket sized to the provider rate limit. Requests that would wait past
+the queue deadline are shed immediately with AdmissionRejected, which the app
+turns into 429 + Retry-After, instead of piling up until workers die.
+
+Everything runs on the event loop, so the counters need no locking.
+"""
+from contextlib import asynccontextmanager
+from helpers.config import get_settings
+from helpers.metrics import STAGE_LATENCY, SHED_REQUESTS
+import asyncio
+import math
+import time
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is overloaded ({reason}), retry after {retry_after:.1f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Reservation-based token bucket: a negative balance is the queue of reserved tokens"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def peek_wait(self) -> float:
+        """Seconds until a new reservation would be usable"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class AdmissionController:
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float,
+                 requests_per_minute: float = 0, burst: int = 1):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, max(1, burst)) if requests_per_minute else None
+
+        self.active = 0
+        self.waiting = 0
+        # EWMA of the time a request holds a slot, used to predict queue wait
+        self.service_time = None
+
+        self.wait_latency = STAGE_LATENCY.labels(component="admission", stage=name)
+
+    def estimated_wait(self) -> float:
+        wait = 0.0
+        if self.active >= self.max_concurrency and self.service_time:
+            wait = (self.waiting + 1) / self.max_concurrency * self.service_time
+        if self.bucket is not None:
+            wait = max(wait, self.bucket.peek_wait())
+        return wait
+
+    def _reject(self, reason: str, retry_after: float):
+        SHED_REQUESTS.labels(provider=self.name, reason=reason).inc()
+        raise AdmissionRejected(self.name, reason, retry_after)
+
+    def check(self):
+        """Shed early, before any retrieval work is spent on a request that cannot be served"""
+        if self.waiting >= self.max_queue:
+            self._reject("queue_full", self.estimated_wait() or self.queue_timeout)
+        wait = self.estimated_wait()
+        if wait > self.queue_timeout:
+            self._reject("deadline", wait)
+
+    @asynccontextmanager
+    async def admit(self):
+        self.check()
+
+        start = time.monotonic()
+        rate_wait = self.bucket.reserve() if self.bucket is not None else 0.0
+        if rate_wait > self.queue_timeout:
+            self.bucket.refund()
+            self._reject("rate_limit", rate_wait)
+
+        self.waiting += 1
+        try:
+            if rate_wait:
+                await asyncio.sleep(rate_wait)
+            async with asyncio.timeout(max(0.0, start + self.queue_timeout - time.monotonic())):
+                await self.semaphore.acquire()
+        except BaseException as e:
+            # The request never reaches the provider, so its rate-limit token goes back
+            if self.bucket is not None:
+                self.bucket.refund()
+            if isinstance(e, TimeoutError):
+                self._reject("timeout", self.estimated_wait() or self.queue_timeout)
+            raise
+        finally:
+            self.waiting -= 1
+        self.wait_latency.observe(time.monotonic() - start)
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+            elapsed = time.monotonic() - started
+            self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "estimated_wait": self.estimated_wait(),
+        }
+
+
+_controllers = {}
+
+
+def get_admission_controller(provider: str) -> AdmissionController:
+    """Process-wide admission controller for a provider backend (e.g. "GIMINI")"""
+    if provider not in _controllers:
+        settings = get_settings()
+        _controllers[provider] = AdmissionController(
+            name=provider,
+            max_concurrency=settings.GENERATION_MAX_CONCURRENCY,
+            max_queue=settings.GENERATION_MAX_QUEUE,
+            queue_timeout=settings.GENERATION_QUEUE_TIMEOUT,
+            requests_per_minute=settings.GENERATION_RATE_LIMITS.get(provider, 0),
+            burst=settings.GENERATION_RATE_BURST,
+        )
+    return _controllers[provider]
+
+
+def get_admission_controllers() -> dict:
+    return dict(_controllers)
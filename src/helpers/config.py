@@ -1,4 +1,6 @@
 from pydantic_settings import BaseSettings,SettingsConfigDict
+from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     APP_NAME:str
@@ -7,8 +9,17 @@ class Settings(BaseSettings):
     FILE_ALLOWED_TYPES:list
     FILE_MAX_SIZE:int
     FILE_DEFAULT_CHUNK_SIZE:int
+    FILE_STORAGE_COMPRESSION: str = "zstd"  # zstd or none
+    FILE_STORAGE_COMPRESSION_LEVEL: int = 3
+    FILE_STORAGE_UNCOMPRESSED_EXTENSIONS: list = [".pdf", ".docx"]
+    FILE_RETENTION: str = "keep"  # keep, or text_only to drop originals after indexing
+    FILE_LOADER_BLOCK_SIZE: int = 65536  # characters per TXT block / max section size
+    FILE_LOADER_CSV_BATCH_ROWS: int = 200
+    FILE_INDEX_BATCH_SIZE: int = 256  # chunks embedded and inserted per batch
     MONGODB_URL:str
     MONGODB_DATABASE:str 
+    MONGODB_BULK_BATCH_SIZE: int = 500
+    MONGODB_BULK_CONCURRENCY: int = 4
 
     GENERATION_BACKEND: str
     EMBEDDING_BACKEND: str
@@ -25,13 +36,123 @@ class Settings(BaseSettings):
     GENERATION_DEFAULT_MAX_TOKENS: int = None
     GENERATION_DEFAULT_TEMPERATURE: float = None
 
+    # none, truncate (Matryoshka-style) or pca; vectors are stored at EMBEDDING_REDUCED_SIZE
+    EMBEDDING_REDUCTION: str = "none"
+    EMBEDDING_REDUCED_SIZE: Optional[int] = None
+    EMBEDDING_PROJECTION_DIR: str = "assets/projections"
+    # Embeddings buffered before a PCA projection is fitted; defaults to 4x EMBEDDING_REDUCED_SIZE
+    EMBEDDING_PCA_FIT_SAMPLES: Optional[int] = None
+
+    # Local encoder: torch, onnx or int8 (dynamically quantized torch)
+    EMBEDDING_ENCODER_BACKEND: str = "torch"
+    EMBEDDING_ENCODER_THREADS: int = 0  # 0 keeps the library default
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_ONNX_FILE: Optional[str] = None  # e.g. onnx/model_qint8_avx512_vnni.onnx
+    EMBEDDING_CONSISTENCY_CHECK: bool = True
+    EMBEDDING_CONSISTENCY_THRESHOLD: float = 0.99
+    EMBEDDING_WORKERS: int = 0  # encoder processes, 0 encodes in the API process
+    EMBEDDING_WORKER_TIMEOUT: float = 120.0
+    EMBEDDING_MAX_CONCURRENCY: int = 8
+    # Re-embedding into a shadow collection when the embedding model changes
+    EMBEDDING_MIGRATION_RATE: float = 50.0  # chunks per second, 0 for unthrottled
+    EMBEDDING_MIGRATION_DUAL_READ_RATIO: float = 0.2  # searches also run against the shadow collection
+    EMBEDDING_MIGRATION_AUTO_START: bool = False  # migrate when EMBEDDING_MODEL_ID differs from the collection's
+
+    LLM_POOL_SIZE: int = 20
+    LLM_POOL_KEEPALIVE: int = 10
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+
+    GENERATION_MAX_CONCURRENCY: int = 8
+    GENERATION_MAX_QUEUE: int = 32
+    GENERATION_QUEUE_TIMEOUT: float = 10.0
+    # Requests per minute per backend, e.g. {"GIMINI": 15}; missing means unlimited
+    GENERATION_RATE_LIMITS: dict = {}
+    GENERATION_RATE_BURST: int = 5
+
+    # Per-user fair scheduling of generation and embedding calls
+    SCHEDULER_POLICY: str = "round_robin"  # round_robin or weighted
+    SCHEDULER_USER_CONCURRENCY: int = 2  # slots one user can hold at once
+    SCHEDULER_MAX_USER_QUEUE: int = 16
+    SCHEDULER_USER_WEIGHTS: dict = {}  # e.g. {"premium-user": 3}; missing users weigh 1
+    SCHEDULER_METRIC_USERS: int = 100  # users with their own wait histogram, the rest are "other"
+    # Priority lanes: ingestion keeps this share of the slots while queries wait, and all of
+    # them when none do; it takes a slot per batch of INGESTION_BATCH_SIZE chunks
+    SCHEDULER_INGESTION_SHARE: float = 0.25
+    SCHEDULER_INGESTION_QUEUE_TIMEOUT: float = 300.0
+    INGESTION_BATCH_SIZE: int = 64
+
+    # Secondary backends and their model ids, tried in this order, e.g. {"OPENAI": "gpt-4o-mini"}
+    GENERATION_FALLBACKS: dict = {}
+    GENERATION_HEDGE_ENABLED: bool = True
+    GENERATION_HEDGE_DELAY: float = 2.0
+    GENERATION_HEDGE_QUANTILE: float = 0.95
+    GENERATION_HEDGE_MIN_DELAY: float = 0.2
+
     VECTOR_DB_BACKEND:str
     VECTOR_DB_PATH:str
     VECTOR_DB_TOKEN:str
     VECTOR_DB_DISTANCE_METRIC:str
+    VECTOR_DB_MAX_CONCURRENCY: int = 8
+    VECTOR_DB_COLLECTION_REGISTRY_PATH: str = "assets/collections.json"
     VECTOR_DB_COLLECTION_NAME:str
+    # Background compaction (purges deleted rows, merges segments) and index rebuilds
+    VECTOR_DB_MAINTENANCE_ENABLED: bool = True
+    VECTOR_DB_MAINTENANCE_INTERVAL: float = 300.0  # seconds between threshold checks
+    VECTOR_DB_MAINTENANCE_WINDOW: str = "01:00-05:00"  # local time; empty runs it only on POST /index/maintenance/run
+    VECTOR_DB_MAINTENANCE_MIN_ROWS: int = 1000
+    VECTOR_DB_MAINTENANCE_STATE_PATH: str = "assets/maintenance.json"
+    # A failing check or operation is retried with exponential backoff, then given up until restart or a manual run
+    VECTOR_DB_MAINTENANCE_MAX_FAILURES: int = 5
+    VECTOR_DB_MAINTENANCE_MAX_BACKOFF: float = 21600.0
+    VECTOR_DB_COMPACTION_TOMBSTONE_RATIO: float = 0.2  # deleted rows / all rows
+    VECTOR_DB_COMPACTION_MAX_SEGMENTS: int = 32
+    VECTOR_DB_COMPACTION_TIMEOUT: float = 600.0
+    VECTOR_DB_INDEX_REBUILD_GROWTH_RATIO: float = 1.0  # rows inserted since the last build / rows then
+    # inline keeps chunk text/metadata in the vector DB; local keeps only ids and
+    # vectors there and the text in DOCUMENT_STORE_PATH (SQLite)
+    VECTOR_DB_TEXT_STORAGE: str = "inline"
+    DOCUMENT_STORE_PATH: str = "assets/document_store.db"
+
+    # Multi-project search: one concurrent shard search per project
+    SEARCH_SHARD_TIMEOUT: float = 2.0
+    SEARCH_MAX_PROJECTS: int = 10
+    SEARCH_MAX_LIMIT: int = 50
+    # Shard searches running in threads at once; one that timed out holds its slot until it returns
+    SEARCH_MAX_INFLIGHT_SHARDS: int = 16
+
+    CHAT_HISTORY_PATH: str = "chat_history.json"
+    CHAT_HISTORY_MAX_TURNS: int = 3
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+
+    WARMUP_ENABLED: bool = True
+    # A failed warmup is retried in the background, doubling the delay up to the max
+    WARMUP_RETRY_BASE_DELAY: float = 2.0
+    WARMUP_RETRY_MAX_DELAY: float = 60.0
+    SHUTDOWN_DRAIN_TIMEOUT: float = 30.0
+
+    TRACING_EXPORTER: str = "none"  # none, file or memory
+    TRACING_FILE_PATH: str = "traces.jsonl"
     class Config:
         env_file=".env"
+        frozen=True
 
+@lru_cache(maxsize=1)
 def get_settings():
-    return Settings()
\ No newline at end of file
+    return Settings()
+
+def reload_settings():
+    """Drop the cached settings and re-read the environment and .env
+
+    Settings read per request through get_settings() or a controller's
+    app_settings take effect at once (request limits, chunking, search and
+    generation parameters). Settings that size or configure objects built at
+    startup do not: the LLM and vector DB clients, connection and worker pools,
+    schedulers and admission controllers, the asset, document and collection
+    stores, and the collection name and embedding model. Those need a restart.
+    """
+    get_settings.cache_clear()
+    return get_settings()
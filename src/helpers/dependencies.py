@@ -0,0 +1,13 @@
+from fastapi import Request
+
+
+def get_nlp_controller(request: Request):
+    return request.app.nlp_controller
+
+
+def get_data_controller(request: Request):
+    return request.app.data_controller
+
+
+def get_chat_history_manager(request: Request):
+    return request.app.chat_history_manager
@@ -0,0 +1,265 @@
+"""Per-user fair scheduling in front of the generation, embedding and vector DB backends.
+
+Every user gets their own FIFO queue. When a slot frees up, the next request
+comes from the user whose head request has the lowest virtual finish tag, so
+users with queued work take turns (round_robin) or share the slots in
+proportion to their weights (weighted), however many requests any one of them
+has queued. A per-user cap bounds the slots one user can hold at once, and a
+request that cannot get a slot within the queue timeout is shed with
+AdmissionRejected (429 + Retry-After).
+
+Requests also belong to a lane. Interactive requests are served before bulk
+ingestion, which only gets a slot while no interactive request is waiting or
+while it holds less than its reserved share of the slots. Ingestion takes one
+slot per batch, so queries overtake a large upload at batch boundaries.
+
+Everything runs on the event loop, so the state needs no locking.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from helpers.admission import AdmissionRejected
+from helpers.config import get_settings
+from helpers.metrics import STAGE_LATENCY, SHED_REQUESTS, USER_QUEUE_WAIT, LANE_QUEUE_WAIT
+import asyncio
+import math
+import time
+
+ANONYMOUS_USER = "anonymous"
+OTHER_USERS = "other"
+
+INTERACTIVE = "interactive"
+INGESTION = "ingestion"
+LANES = (INTERACTIVE, INGESTION)
+
+
+class _Waiter:
+    __slots__ = ("tag", "future", "enqueued_at")
+
+    def __init__(self, tag: float):
+        self.tag = tag
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class _UserQueue:
+    __slots__ = ("lane", "user_id", "waiters", "active", "last_tag", "served", "wait_metric")
+
+    def __init__(self, lane: str, user_id: str, wait_metric):
+        self.lane = lane
+        self.user_id = user_id
+        self.waiters = deque()
+        self.active = 0
+        self.last_tag = 0.0
+        self.served = 0
+        self.wait_metric = wait_metric
+
+
+class FairScheduler:
+
+    def __init__(self, name: str, max_concurrency: int, user_concurrency: int,
+                 max_user_queue: int, queue_timeout: float,
+                 policy: str = "round_robin", weights: dict = None,
+                 metric_users: int = 100,
+                 ingestion_share: float = 0.25, ingestion_queue_timeout: float = 300.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.user_concurrency = user_concurrency
+        self.max_user_queue = max_user_queue
+        self.queue_timeout = queue_timeout
+        self.policy = policy
+        self.weights = weights or {}
+        self.metric_users = metric_users
+        # Slots ingestion may keep using while interactive requests wait, so it is never starved
+        self.ingestion_slots = max(1, math.floor(max_concurrency * ingestion_share))
+        self.ingestion_queue_timeout = ingestion_queue_timeout
+
+        # (lane, user_id) -> _UserQueue
+        self.users = {}
+        self.active = 0
+        self.waiting = 0
+        self.lane_active = {lane: 0 for lane in LANES}
+        self.lane_waiting = {lane: 0 for lane in LANES}
+        # Tag of the last request dispatched; a user that was idle restarts from here
+        # instead of spending credit saved up while away
+        self.virtual_time = 0.0
+        # Users with their own wait histogram; the rest share the "other" label
+        self.labelled_users = set()
+
+        self.wait_latency = STAGE_LATENCY.labels(component="fair_scheduler", stage=name)
+        self.lane_wait_latency = {
+            lane: LANE_QUEUE_WAIT.labels(scheduler=name, lane=lane) for lane in LANES
+        }
+
+    def get_weight(self, user_id: str) -> float:
+        if self.policy != "weighted":
+            return 1.0
+        return max(float(self.weights.get(user_id, 1.0)), 1e-3)
+
+    def _get_user(self, lane: str, user_id: str) -> _UserQueue:
+        user = self.users.get((lane, user_id))
+        if user is None:
+            if user_id not in self.labelled_users and len(self.labelled_users) < self.metric_users:
+                self.labelled_users.add(user_id)
+            label = user_id if user_id in self.labelled_users else OTHER_USERS
+            user = _UserQueue(lane, user_id, USER_QUEUE_WAIT.labels(scheduler=self.name, user_id=label))
+            self.users[(lane, user_id)] = user
+        return user
+
+    def _forget_if_idle(self, user: _UserQueue):
+        key = (user.lane, user.user_id)
+        if not user.waiters and not user.active and self.users.get(key) is user:
+            del self.users[key]
+
+    def _user_cap(self, lane: str) -> int:
+        # Ingestion is bounded by its lane share, not by the per-user cap
+        return self.user_concurrency if lane == INTERACTIVE else self.max_concurrency
+
+    def _reject(self, reason: str, retry_after: float):
+        SHED_REQUESTS.labels(provider=self.name, reason=reason).inc()
+        raise AdmissionRejected(self.name, reason, retry_after)
+
+    def _next_user(self):
+        heads = {lane: None for lane in LANES}
+        for user in self.users.values():
+            if not user.waiters or user.active >= self._user_cap(user.lane):
+                continue
+            head = heads[user.lane]
+            if head is None or user.waiters[0].tag < head.waiters[0].tag:
+                heads[user.lane] = user
+        interactive, ingestion = heads[INTERACTIVE], heads[INGESTION]
+        if ingestion is not None and (interactive is None
+                                      or self.lane_active[INGESTION] < self.ingestion_slots):
+            return ingestion
+        return interactive
+
+    def _dispatch(self):
+        while self.active < self.max_concurrency:
+            chosen = self._next_user()
+            if chosen is None:
+                return
+            waiter = chosen.waiters.popleft()
+            self.waiting -= 1
+            self.lane_waiting[chosen.lane] -= 1
+            if waiter.future.done():
+                continue  # the caller gave up while queued
+            self.virtual_time = max(self.virtual_time, waiter.tag)
+            chosen.active += 1
+            chosen.served += 1
+            self.active += 1
+            self.lane_active[chosen.lane] += 1
+            waiter.future.set_result(None)
+
+    def _release(self, user: _UserQueue):
+        user.active -= 1
+        self.active -= 1
+        self.lane_active[user.lane] -= 1
+        self._forget_if_idle(user)
+        self._dispatch()
+
+    def _abandon(self, user: _UserQueue, waiter: _Waiter):
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Granted in the same loop iteration the caller was cancelled
+            self._release(user)
+            return
+        waiter.future.cancel()
+        try:
+            user.waiters.remove(waiter)
+            self.waiting -= 1
+            self.lane_waiting[user.lane] -= 1
+        except ValueError:
+            pass
+        self._forget_if_idle(user)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str = None, lane: str = INTERACTIVE):
+        user = self._get_user(lane, user_id or ANONYMOUS_USER)
+        queue_timeout = self.queue_timeout if lane == INTERACTIVE else self.ingestion_queue_timeout
+        # Ingestion callers wait on one batch at a time, so its queue is bounded by the uploads
+        if lane == INTERACTIVE and len(user.waiters) >= self.max_user_queue:
+            self._forget_if_idle(user)
+            self._reject("user_queue_full", queue_timeout)
+
+        tag = max(self.virtual_time, user.last_tag) + 1.0 / self.get_weight(user.user_id)
+        user.last_tag = tag
+        waiter = _Waiter(tag)
+        user.waiters.append(waiter)
+        self.waiting += 1
+        self.lane_waiting[lane] += 1
+        self._dispatch()
+
+        try:
+            async with asyncio.timeout(queue_timeout):
+                await waiter.future
+        except TimeoutError:
+            self._abandon(user, waiter)
+            self._reject(f"{lane}_timeout", queue_timeout)
+        except BaseException:
+            self._abandon(user, waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self.wait_latency.observe(waited)
+        user.wait_metric.observe(waited)
+        self.lane_wait_latency[lane].observe(waited)
+        try:
+            yield
+        finally:
+            self._release(user)
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "user_concurrency": self.user_concurrency,
+            "ingestion_slots": self.ingestion_slots,
+            "lanes": {
+                lane: {"active": self.lane_active[lane], "waiting": self.lane_waiting[lane]}
+                for lane in LANES
+            },
+            "users": {
+                user.user_id: {
+                    "active": user.active,
+                    "waiting": len(user.waiters),
+                    "served": user.served,
+                    "weight": self.get_weight(user.user_id),
+                }
+                for user in self.users.values() if user.lane == INTERACTIVE
+            },
+        }
+
+
+_schedulers = {}
+
+
+def get_fair_scheduler(name: str) -> FairScheduler:
+    """Process-wide scheduler for a backend kind ("generation", "embedding" or "vectordb")"""
+    if name not in _schedulers:
+        settings = get_settings()
+        max_concurrency = {
+            "generation": settings.GENERATION_MAX_CONCURRENCY,
+            "embedding": settings.EMBEDDING_MAX_CONCURRENCY,
+            "vectordb": settings.VECTOR_DB_MAX_CONCURRENCY,
+        }[name]
+        # One multi-project search fans out to many shards at once, so the vector DB
+        # is scheduled by lane only
+        user_concurrency = max_concurrency if name == "vectordb" else settings.SCHEDULER_USER_CONCURRENCY
+        _schedulers[name] = FairScheduler(
+            name=name,
+            max_concurrency=max_concurrency,
+            user_concurrency=user_concurrency,
+            max_user_queue=settings.SCHEDULER_MAX_USER_QUEUE,
+            queue_timeout=settings.GENERATION_QUEUE_TIMEOUT,
+            policy=settings.SCHEDULER_POLICY,
+            weights=settings.SCHEDULER_USER_WEIGHTS,
+            metric_users=settings.SCHEDULER_METRIC_USERS,
+            ingestion_share=settings.SCHEDULER_INGESTION_SHARE,
+            ingestion_queue_timeout=settings.SCHEDULER_INGESTION_QUEUE_TIMEOUT,
+        )
+    return _schedulers[name]
+
+
+def get_fair_schedulers() -> dict:
+    return dict(_schedulers)
@@ -0,0 +1,110 @@
+from stores.llm.LLMEnum import DocumentTypeEnum
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class AppLifecycle:
+    """Tracks warmup/readiness and drains in-flight requests on shutdown"""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+        self.warmup_seconds = None
+        self.warmup_attempts = 0
+        self.warmup_task = None
+
+    async def warmup(self, app, collection_name: str):
+        """Pay model load, collection load and first-call costs before taking traffic"""
+        start = time.perf_counter()
+        self.warmup_attempts += 1
+        try:
+            vector = await app.nlp_controller.embedding_client.aembed_text(
+                text="warmup", document_type=DocumentTypeEnum.QUERY.value
+            )
+            if vector is None:
+                raise RuntimeError("embedding client returned no vector")
+
+            is_loaded = await asyncio.to_thread(
+                app.vectordb_client.load_collection, collection_name=collection_name
+            )
+            if is_loaded:
+                vector = app.nlp_controller.embedding_reducer.transform(vector)
+                await asyncio.to_thread(
+                    app.vectordb_client.search_by_vector,
+                    collection_name=collection_name,
+                    vector=vector,
+                    limit=1,
+                )
+        except Exception as e:
+            logger.error(f"Warmup failed, staying unready: {e}")
+            return False
+
+        self.warmup_seconds = time.perf_counter() - start
+        self.ready = True
+        logger.info(f"Warmup finished in {self.warmup_seconds:.2f}s")
+        return True
+
+    async def warmup_until_ready(self, app, base_delay: float, max_delay: float):
+        """Warm up now, and keep retrying in the background with backoff until it succeeds"""
+        if await self.warmup(app, collection_name=app.nlp_controller.collection_name):
+            return True
+        self.warmup_task = asyncio.get_running_loop().create_task(
+            self._retry_warmup(app, base_delay, max_delay)
+        )
+        return False
+
+    async def _retry_warmup(self, app, base_delay: float, max_delay: float):
+        delay = base_delay
+        while not self.draining:
+            logger.warning(f"Retrying warmup in {delay:.1f}s (attempt {self.warmup_attempts + 1})")
+            await asyncio.sleep(delay)
+            if self.draining:
+                return
+            # The collection may have switched to another embedding version meanwhile
+            if await self.warmup(app, collection_name=app.nlp_controller.collection_name):
+                return
+            delay = min(delay * 2, max_delay)
+
+    async def drain(self, timeout: float):
+        """Stop accepting requests and wait for the in-flight ones to finish"""
+        self.ready = False
+        self.draining = True
+        if self.warmup_task is not None:
+            self.warmup_task.cancel()
+            await asyncio.gather(self.warmup_task, return_exceptions=True)
+        deadline = time.monotonic() + timeout
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.in_flight > 0:
+            logger.warning(f"Shutting down with {self.in_flight} requests still in flight")
+
+
+class RequestTrackingMiddleware:
+    """Plain ASGI middleware counting in-flight HTTP requests for the drain"""
+
+    def __init__(self, app, lifecycle: AppLifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if self.lifecycle.draining:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"connection", b"close")],
+            })
+            await send({"type": "http.response.body", "body": b'{"signal":"server_shutting_down"}'})
+            return
+
+        self.lifecycle.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.in_flight -= 1
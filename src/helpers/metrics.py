@@ -0,0 +1,276 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Recording is a dict lookup plus a few additions under the GIL, so it costs
+a few microseconds per observation.
+"""
+from bisect import bisect_left
+import math
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.callback = None
+        registry.register(self)
+
+    def labels(self, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, callback):
+        """Compute values at scrape time: callback() -> {label values tuple: value}"""
+        self.callback = callback
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        if self.callback is not None:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self.callback().items()
+            ]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self.children.items())
+        ]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def render(self):
+        lines = []
+        for key, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+# Application metrics
+
+STAGE_LATENCY = Histogram(
+    "collabry_stage_duration_seconds",
+    "Latency of each stage of the ingestion and chat pipelines",
+    ["component", "stage"],
+)
+LLM_TOKENS = Counter(
+    "collabry_llm_tokens_total",
+    "Estimated tokens sent to and received from LLM providers",
+    ["provider", "direction"],
+)
+CHUNKS = Counter(
+    "collabry_chunks_total",
+    "Chunks produced, indexed and retrieved",
+    ["stage"],
+)
+ERRORS = Counter(
+    "collabry_errors_total",
+    "Errors raised by providers and pipeline stages",
+    ["provider", "operation"],
+)
+COALESCED_CALLS = Counter(
+    "collabry_coalesced_calls_total",
+    "Single-flight calls by stage and whether they executed or joined another call",
+    ["stage", "result"],
+)
+GENERATION_ATTEMPTS = Counter(
+    "collabry_generation_attempts_total",
+    "Generation calls per provider by kind (primary, hedge, fallback) and result",
+    ["provider", "kind", "result"],
+)
+SHED_REQUESTS = Counter(
+    "collabry_shed_requests_total",
+    "Requests rejected by admission control before reaching a provider",
+    ["provider", "reason"],
+)
+REJECTED_UPLOADS = Counter(
+    "collabry_rejected_uploads_total",
+    "Uploads aborted before they were stored, by reason",
+    ["reason"],
+)
+REJECTED_UPLOAD_BYTES = Counter(
+    "collabry_rejected_upload_bytes_total",
+    "Bytes received for uploads that were aborted, by reason",
+    ["reason"],
+)
+USER_QUEUE_WAIT = Histogram(
+    "collabry_user_queue_wait_seconds",
+    "Time requests waited in the fair scheduler before reaching a backend, per user",
+    ["scheduler", "user_id"],
+)
+LANE_QUEUE_WAIT = Histogram(
+    "collabry_lane_queue_wait_seconds",
+    "Time requests waited in the fair scheduler, per priority lane (interactive, ingestion)",
+    ["scheduler", "lane"],
+)
+EMBEDDING_MIGRATION_OVERLAP = Histogram(
+    "collabry_embedding_migration_overlap_ratio",
+    "Share of the active collection's top-k hits the shadow collection also returned, per dual read",
+    ["collection"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+VECTORDB_MAINTENANCE = Counter(
+    "collabry_vectordb_maintenance_total",
+    "Compactions and index rebuilds run by the maintenance scheduler, by result",
+    ["operation", "result"],
+)
+VECTORDB_COLLECTION_STATS = Gauge(
+    "collabry_vectordb_collection_stats",
+    "Rows (deleted ones included until compaction), segments and tombstone ratio per collection",
+    ["collection", "stat"],
+)
+IN_FLIGHT_REQUESTS = Gauge(
+    "collabry_in_flight_requests",
+    "HTTP requests currently being served",
+)
+QUEUE_DEPTH = Gauge(
+    "collabry_queue_depth",
+    "Items waiting in internal queues and pools",
+    ["queue"],
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1 if text else 0
@@ -0,0 +1,48 @@
+from .metrics import COALESCED_CALLS
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight execution.
+
+    The work runs in its own task so a cancelled caller does not cancel it for
+    the others; every caller gets the same result or exception.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self.executed_metric = COALESCED_CALLS.labels(stage=name, result="executed")
+        self.collapsed_metric = COALESCED_CALLS.labels(stage=name, result="collapsed")
+
+    def _on_done(self, key, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func, *args, **kwargs):
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.collapsed += 1
+            self.collapsed_metric.inc()
+        else:
+            self.executions += 1
+            self.executed_metric.inc()
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self.in_flight),
+        }
@@ -0,0 +1,105 @@
+"""OpenTelemetry tracing for the ingestion and chat pipelines.
+
+Spans are opened through the OpenTelemetry API everywhere. They stay no-ops
+until setup_tracing installs an SDK provider, so TRACING_EXPORTER=none costs
+next to nothing on the request path.
+"""
+from fastapi.routing import APIRoute
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (BatchSpanProcessor, SimpleSpanProcessor,
+                                            SpanExporter, SpanExportResult)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from threading import Lock
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+tracer = trace.get_tracer("collabry")
+
+_provider = None
+_memory_exporter = None
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends finished spans to a local file, one JSON document per line"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = Lock()
+        self.file = open(file_path, "a", encoding="utf-8")
+
+    def export(self, spans):
+        with self.lock:
+            if self.file.closed:
+                return SpanExportResult.FAILURE
+            for span in spans:
+                self.file.write(span.to_json(indent=None) + "\n")
+            self.file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self.lock:
+            self.file.close()
+
+
+def setup_tracing(exporter: str, file_path: str = None, service_name: str = "collabry"):
+    """Install the SDK provider for exporter "file" or "memory", "none" keeps spans as no-ops"""
+    global _provider, _memory_exporter
+    if exporter == "none" or _provider is not None:
+        return _provider
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if exporter == "file":
+        # Spans are written by a background thread, off the request path
+        provider.add_span_processor(BatchSpanProcessor(FileSpanExporter(file_path)))
+    elif exporter == "memory":
+        _memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+    else:
+        logger.error(f"Unknown tracing exporter: {exporter}")
+        return None
+
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    return provider
+
+
+def shutdown_tracing():
+    """Flush pending spans and close the exporter"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def get_finished_spans():
+    """Spans collected by the in-memory exporter"""
+    if _memory_exporter is None:
+        return []
+    return list(_memory_exporter.get_finished_spans())
+
+
+def clear_finished_spans():
+    if _memory_exporter is not None:
+        _memory_exporter.clear()
+
+
+class TracedRoute(APIRoute):
+    """Route class opening the root span of every request handled by a router"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path_format
+        span_name = f"{','.join(sorted(self.methods))} {route}"
+
+        async def traced_handler(request):
+            with tracer.start_as_current_span(span_name, kind=trace.SpanKind.SERVER) as span:
+                span.set_attribute("http.request.method", request.method)
+                span.set_attribute("http.route", route)
+                for name, value in request.path_params.items():
+                    span.set_attribute(f"collabry.{name}", str(value))
+                response = await handler(request)
+                span.set_attribute("http.response.status_code", response.status_code)
+                return response
+
+        return traced_handler
@@ -0,0 +1,44 @@
+from helpers.config import get_settings
+from helpers.metrics import REJECTED_UPLOADS
+from models.enums import ResponseSignal
+import json
+
+# Room for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """Plain ASGI middleware rejecting uploads whose declared Content-Length is too large
+
+    The multipart body is spooled to a temporary file before the route runs, so
+    this check is what keeps an oversized request from being read at all. The
+    route still counts the bytes it stores (AssetStore.save_upload), which also
+    covers chunked requests without a Content-Length.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/v1/data/upload"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        max_bytes = get_settings().FILE_MAX_SIZE * 1024 * 1024 + MULTIPART_OVERHEAD
+        if content_length is None or not content_length.isdigit() or int(content_length) <= max_bytes:
+            return await self.app(scope, receive, send)
+
+        REJECTED_UPLOADS.labels(reason="content_length").inc()
+        body = json.dumps({
+            "signal": ResponseSignal.FILE_SIZE_EXCEEDED.value,
+            "rejected_bytes": 0,
+            "declared_bytes": int(content_length),
+            "max_bytes": max_bytes,
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,6 +3,7 @@ from .db_schemes import DataChunk
 from .enums.DataBaseEnum import DataBaseEnum
 from bson.objectid import ObjectId
 from pymongo import InsertOne
+import asyncio
 class ChunkModel(BaseDataModel):
     def __init__(self,db_client:object):
         super().__init__(db_client=db_client)
@@ -15,16 +16,15 @@ class ChunkModel(BaseDataModel):
         return instance
     
     async def init_collection(self):
-        all_collections= await self.db_client.list_collection_names()
-        if DataBaseEnum.COLLECTION_PROJECT_NAME.value not in all_collections:
-            self.collection=self.db_client[DataBaseEnum.COLLECTION_PROJECT_NAME.value]
-            indexes=DataChunk.get_indexes()
-            for index in indexes:
-                await self.collection.create_index(
-                    index["key"],
-                    name=index["name"],
-                    unique=index["unique"]
-                )
+        # create_index is a no-op for an index that already exists, so
+        # collections created before an index was added still get it
+        indexes=DataChunk.get_indexes()
+        for index in indexes:
+            await self.collection.create_index(
+                index["key"],
+                name=index["name"],
+                unique=index["unique"]
+            )
 
     async def create_chunk(self,chunk:DataChunk):
         result=await self.collection.insert_one(chunk.dict(by_alias=True, exclude_unset=True))
@@ -33,23 +33,33 @@ class ChunkModel(BaseDataModel):
     
     async def get_chunk(self,chunk_id:str):
         result=await self.collection.find_one({
-            "id":ObjectId(chunk_id)
+            "_id":ObjectId(chunk_id)
         })
         if result is None:
            return None
         
         return DataChunk(**result) 
     
-    async def insert_many_chunks(self,chunks:list,batch_size:int=100):
-        for i in range(0,len(chunks),batch_size):
-            batch=chunks[i:i+batch_size]
+    async def insert_many_chunks(self,chunks:list,batch_size:int=None,concurrency:int=None):
+        batch_size=batch_size or self.app_settings.MONGODB_BULK_BATCH_SIZE
+        concurrency=concurrency or self.app_settings.MONGODB_BULK_CONCURRENCY
+        semaphore=asyncio.Semaphore(concurrency)
 
+        async def write_batch(batch):
             operations=[
                 InsertOne(chunk.dict(by_alias=True, exclude_unset=True))
                 for chunk in batch
             ]
-            await self.collection.bulk_write(operations)
-        return len(chunks)
+            # Unordered: the server may apply the batch in parallel and does not stop at the first error
+            async with semaphore:
+                result=await self.collection.bulk_write(operations,ordered=False)
+            return result.inserted_count
+
+        inserted=await asyncio.gather(*(
+            write_batch(chunks[i:i+batch_size])
+            for i in range(0,len(chunks),batch_size)
+        ))
+        return sum(inserted)
     
     async def delete_chunks_by_project_id(self,project_id:ObjectId):
         result=await self.collection.delete_many(
@@ -59,15 +69,26 @@ class ChunkModel(BaseDataModel):
         )
         return result.deleted_count
     
-    async def get_all_project_chunks(self,project_id:ObjectId,page_no:int=1,page_size:int=50):
-        records=self.collection.find(
-            {
-                "chunk_project_id":project_id
-             }
-        ).skip((page_no-1)*page_size).limit(page_size).to_list(length=None)
+    async def get_all_project_chunks(self,project_id:ObjectId,after_id:ObjectId=None,
+                                     page_size:int=50,fields:list=None):
+        """Keyset page of the project chunks ordered by _id
+
+        Pass the returned cursor as after_id to get the next page, it is None
+        on the last page. With fields only those are fetched and the raw
+        records are returned instead of DataChunk objects.
+        """
+        query={"chunk_project_id":project_id}
+        if after_id is not None:
+            query["_id"]={"$gt":ObjectId(after_id) if isinstance(after_id,str) else after_id}
+        projection={field:1 for field in fields} if fields else None
+
+        records=await self.collection.find(query,projection).sort("_id",1).limit(page_size).to_list(length=page_size)
 
+        next_cursor=records[-1]["_id"] if len(records)==page_size else None
+        if fields:
+            return records,next_cursor
         return [
             DataChunk(**record)
             for record in records
-        ]
+        ],next_cursor
 
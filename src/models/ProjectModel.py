@@ -1,6 +1,7 @@
 from .BaseDataModel import BaseDataModel
 from .enums.DataBaseEnum import DataBaseEnum
 from .db_schemes.project import Project
+from bson.objectid import ObjectId
 
 class ProjectModel(BaseDataModel):
     def __init__(self,db_client):
@@ -39,15 +40,25 @@ class ProjectModel(BaseDataModel):
             project= await self.create_project(project)
             return project
  
-    async def get_all_projects(self,page:int=1,page_size:int=10):   
-        total_documents=await self.collection.count_documents({})
-        total_pages=total_documents//page_size
-        if total_documents%page_size>0:
-            total_pages+=1
+    async def count_projects(self,estimated:bool=True):
+        # The estimate reads collection metadata instead of scanning the index
+        if estimated:
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents({})
 
-        cursor=self.collection.find().skip((page-1)*page_size).limit(page_size)
+    async def get_all_projects(self,after_id:ObjectId=None,page_size:int=10,with_total:bool=False,
+                               estimated_total:bool=True):
+        """Keyset page of projects ordered by _id, returns (projects, next cursor, total)"""
+        query={}
+        if after_id is not None:
+            query["_id"]={"$gt":ObjectId(after_id) if isinstance(after_id,str) else after_id}
+
+        cursor=self.collection.find(query,{"project_id":1}).sort("_id",1).limit(page_size)
         projects=[]
         async for project in cursor:
             projects.append(Project(**project))
 
-        return projects,total_pages
\ No newline at end of file
+        next_cursor=projects[-1].id if len(projects)==page_size else None
+        total=await self.count_projects(estimated=estimated_total) if with_total else None
+
+        return projects,next_cursor,total
\ No newline at end of file
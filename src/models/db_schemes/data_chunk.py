@@ -18,10 +18,12 @@ class DataChunk(BaseModel):
     def get_indexes(cls):
         return [
             {
+                # _id makes it serve keyset pagination within a project
                 "key":[
-                    ("chunk_project_id",1)
+                    ("chunk_project_id",1),
+                    ("_id",1)
                 ],
-                "name":"chunk_project_id_index_1",
+                "name":"chunk_project_id_id_index_1",
                 "unique":False
             }
         ]
\ No newline at end of file
@@ -4,6 +4,7 @@ class ResponseSignal(Enum):
     FILE_VALIDATED_SUCCESS="file_validate_successfully"
     FILE_TYPE_NOT_SUPPORTED="file_type_not_supported"
     FILE_SIZE_EXCEEDED="file_size_exceeded"
+    FILE_SIGNATURE_MISMATCH="file_signature_mismatch"
     FILE_UPLOADED_SUCCESS="file_uploaded_success"
     FILE_UPLOADED_FAILED="file_uploaded_failed"
 
@@ -18,5 +19,20 @@ class ResponseSignal(Enum):
     VECTORDB_COLLECTION_RETRIEVED="vectordb_collection_retrieved"
     VECTORDB_SEARCH_ERROR="vectordb_search_error"
     VECTORDB_SEARCH_SUCCESS="vectordb_search_success"
+    VECTORDB_SEARCH_PARTIAL="vectordb_search_partial"
+    SEARCH_TOO_MANY_PROJECTS="search_too_many_projects"
+    SEARCH_LIMIT_TOO_LARGE="search_limit_too_large"
     VECTORDB_FILE_NOT_FOUND="project_not_found"
-    VECTORDB_FILE_FOUND="project_deleted_successfully"
\ No newline at end of file
+    VECTORDB_FILE_FOUND="project_deleted_successfully"
+    GENERATION_OVERLOADED="generation_overloaded"
+    EMBEDDING_VERSIONS_RETRIEVED="embedding_versions_retrieved"
+    EMBEDDING_MIGRATION_STARTED="embedding_migration_started"
+    EMBEDDING_MIGRATION_FAILED="embedding_migration_failed"
+    EMBEDDING_MIGRATION_NOT_FOUND="embedding_migration_not_found"
+    EMBEDDING_MIGRATION_NOT_READY="embedding_migration_not_ready"
+    EMBEDDING_MIGRATION_SWITCHED="embedding_migration_switched"
+    EMBEDDING_MIGRATION_CANCELLED="embedding_migration_cancelled"
+    VECTORDB_MAINTENANCE_RETRIEVED="vectordb_maintenance_retrieved"
+    VECTORDB_MAINTENANCE_DISABLED="vectordb_maintenance_disabled"
+    VECTORDB_MAINTENANCE_FINISHED="vectordb_maintenance_finished"
+    VECTORDB_COLLECTION_UNAVAILABLE="vectordb_collection_unavailable"
\ No newline at end of file
@@ -1,4 +1,5 @@
-from fastapi import FastAPI,APIRouter,Depends
+from fastapi import FastAPI,APIRouter,Depends,Request,status
+from fastapi.responses import ORJSONResponse
 from helpers.config import get_settings,Settings
 import os
 base_router=APIRouter(
@@ -8,12 +9,23 @@ base_router=APIRouter(
 
 @base_router.get("/")
 async def welcome(app_settings:Settings =Depends(get_settings)):
-    app_setting=get_settings()
-
-    app_name=app_setting.APP_NAME
-    app_version=app_setting.APP_VERSION
+    app_name=app_settings.APP_NAME
+    app_version=app_settings.APP_VERSION
     return {
         "app_name":app_name,
         "app_version":app_version
         
     }
+
+@base_router.get("/ready")
+async def ready(request: Request):
+    lifecycle=request.app.lifecycle
+    if not lifecycle.ready:
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ready":False,"draining":lifecycle.draining}
+        )
+    return {
+        "ready":True,
+        "warmup_seconds":lifecycle.warmup_seconds
+    }
@@ -1,5 +1,5 @@
 from fastapi import FastAPI,APIRouter,Depends,UploadFile,status,Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse,StreamingResponse
 from .schemes.data import processRequest
 from helpers.config import get_settings,Settings
 from models.enums import ResponseSignal
@@ -9,16 +9,55 @@ from models.db_schemes import DataChunk,Asset
 from models.AssetModel import AssetModel
 from models.enums.AssetTypeEnum import AssetTypeEnum
 from controllers import DataController,ProjectController,ProcessController,NLPController
-import aiofiles
+from helpers.tracing import TracedRoute
+from helpers.dependencies import get_nlp_controller,get_data_controller
+from stores.AssetStore import UploadRejected
+from functools import partial
+import asyncio
 import logging
+import orjson
 import os
 
 logger=logging.getLogger("uvicorn.error")
 
 
+def upload_rejected_response(error: UploadRejected, declared_bytes: int = None):
+    size_exceeded = error.reason == ResponseSignal.FILE_SIZE_EXCEEDED.value
+    return ORJSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE if size_exceeded else status.HTTP_400_BAD_REQUEST,
+        content={
+            "signal": error.reason,
+            "rejected_bytes": error.received_bytes,
+            "declared_bytes": declared_bytes
+        }
+    )
+
+
+def stream_chunks_ndjson(process_controller: ProcessController, file_content, file_id: str,
+                         chunk_size: int, overlap: int):
+    """One JSON line per chunk as it is produced, then a summary line"""
+    total_chunks = 0
+    try:
+        for chunk in process_controller.iter_file_chunks(file_content, chunk_size=chunk_size, overlap=overlap):
+            total_chunks += 1
+            yield orjson.dumps({
+                "chunk_order": total_chunks,
+                "chunk_text": chunk.page_content,
+                "chunk_metadata": chunk.metadata
+            }) + b"\n"
+    except Exception as e:
+        logger.error(f"Error while processing file {file_id}: {str(e)}")
+        yield orjson.dumps({"signal": ResponseSignal.PROCESSING_FAILD.value, "file_id": file_id}) + b"\n"
+        return
+
+    signal = ResponseSignal.PROCESSING_SUCCESS if total_chunks else ResponseSignal.PROCESSING_FAILD
+    yield orjson.dumps({"signal": signal.value, "file_id": file_id, "total_chunks": total_chunks}) + b"\n"
+
+
 data_router=APIRouter(
     prefix="/api/v1/data",
-    tags=["api_v1","data"]
+    tags=["api_v1","data"],
+    route_class=TracedRoute
 )
 
 @data_router.post("/upload_and_process/{project_id}")
@@ -28,14 +67,15 @@ async def upload_and_process_data(
     file: UploadFile,
     chunk_size: int = 1000,
     overlap_size: int = 50,
-    app_settings: Settings = Depends(get_settings)
+    stream: int = 0,  # 1 streams the chunks as NDJSON instead of one JSON body
+    app_settings: Settings = Depends(get_settings),
+    data_controller: DataController = Depends(get_data_controller)
 ):
 
     # Validate file
-    data_controller = DataController()
     is_valid, signal = data_controller.validate_uploaded_file(file=file)
     if not is_valid:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.FILE_UPLOADED_FAILED.value}
         )
@@ -47,26 +87,43 @@ async def upload_and_process_data(
     )
 
     try:
-        # Save file to disk
-        async with aiofiles.open(file_path, "wb") as f:
-            while chunk := await file.read(app_settings.FILE_DEFAULT_CHUNK_SIZE):
-                await f.write(chunk)
+        # Save file to disk, compressed while it streams in; oversized or mislabelled
+        # uploads are aborted as soon as that is known
+        await data_controller.asset_store.save_upload(
+            file=file, file_path=file_path, chunk_size=app_settings.FILE_DEFAULT_CHUNK_SIZE,
+            max_bytes=data_controller.get_max_upload_bytes(),
+            check_head=partial(data_controller.check_file_signature, file.filename, file.content_type)
+        )
+    except UploadRejected as e:
+        return upload_rejected_response(e, declared_bytes=file.size)
     except Exception as e:
         logger.error(f"Error while uploading file: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"signal": ResponseSignal.FILE_UPLOADED_FAILED.value}
         )
 
     # Process file
-    process_controller = ProcessController(project_id=project_id)
+    process_controller = ProcessController(
+        project_id=project_id,
+        project_controller=data_controller.project_controller,
+        loader_registry=data_controller.loader_registry
+    )
     file_content = process_controller.get_file_content(file_id=file_id)
     if file_content is None:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.PROCESSING_FAILD.value}
         )
 
+    if stream:
+        # Chunks are sent as the loader produces them, so large files never sit in memory whole;
+        # the sync generator runs in the threadpool
+        return StreamingResponse(
+            stream_chunks_ndjson(process_controller, file_content, file_id, chunk_size, overlap_size),
+            media_type="application/x-ndjson"
+        )
+
     file_chunks = process_controller.process_file_content(
         file_content=file_content,
         file_id=file_id,
@@ -74,25 +131,16 @@ async def upload_and_process_data(
         overlap=overlap_size
     )
     if not file_chunks:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.PROCESSING_FAILD.value}
         )
 
-    # Prepare response chunks
-    chunks_data = [
-        {
-            "chunk_text": chunk.page_content,
-            "chunk_metadata": chunk.metadata,
-            "chunk_order": i + 1
-        }
-        for i, chunk in enumerate(file_chunks)
-    ]
     chunks=[
         chunk.page_content 
         for i,chunk in enumerate(file_chunks)
     ]
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "signal": ResponseSignal.PROCESSING_SUCCESS.value,
@@ -110,15 +158,16 @@ async def upload_process_and_index(
     chunk_size: int = 500,
     overlap_size: int = 50,
     do_reset: int = 0,  # 1 means reset, 0 means append
-    app_settings: Settings = Depends(get_settings)
+    app_settings: Settings = Depends(get_settings),
+    data_controller: DataController = Depends(get_data_controller),
+    nlp_controller: NLPController = Depends(get_nlp_controller)
 ):
     
 
     # Step 2: Validate File
-    data_controller = DataController()
     is_valid, signal = data_controller.validate_uploaded_file(file=file)
     if not is_valid:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.FILE_UPLOADED_FAILED.value}
         )
@@ -129,72 +178,115 @@ async def upload_process_and_index(
         project_id=project_id
     )
     try:
-        async with aiofiles.open(file_path, "wb") as f:
-            while chunk := await file.read(app_settings.FILE_DEFAULT_CHUNK_SIZE):
-                await f.write(chunk)
+        await data_controller.asset_store.save_upload(
+            file=file, file_path=file_path, chunk_size=app_settings.FILE_DEFAULT_CHUNK_SIZE,
+            max_bytes=data_controller.get_max_upload_bytes(),
+            check_head=partial(data_controller.check_file_signature, file.filename, file.content_type)
+        )
+    except UploadRejected as e:
+        return upload_rejected_response(e, declared_bytes=file.size)
     except Exception as e:
         logger.error(f"Error while uploading file: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"signal": ResponseSignal.FILE_UPLOADED_FAILED.value}
         )
 
     # Step 4: Process File Content into Chunks
-    process_controller = ProcessController(project_id=project_id)
+    process_controller = ProcessController(
+        project_id=project_id,
+        project_controller=data_controller.project_controller,
+        loader_registry=data_controller.loader_registry
+    )
     file_content = process_controller.get_file_content(file_id=file_id)
     if file_content is None:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.PROCESSING_FAILD.value}
         )
 
-    file_chunks = process_controller.process_file_content(
+    # Step 5: Index into the vector DB batch by batch, so memory stays bounded by
+    # FILE_INDEX_BATCH_SIZE chunks instead of the whole file
+    chunk_batches = process_controller.iter_chunk_batches(
         file_content=file_content,
-        file_id=file_id,
+        batch_size=app_settings.FILE_INDEX_BATCH_SIZE,
         chunk_size=chunk_size,
         overlap=overlap_size
     )
-    file_chunks = [
-        {
-            "chunk_text": chunk.page_content,
-            "chunk_metadata": chunk.metadata,
-            "chunk_order": i + 1
-        }
-        for i, chunk in enumerate(file_chunks)
-    ]
-    if not file_chunks:
-        return JSONResponse(
+    total_chunks = 0
+    # Embedded batches waiting for the collection's PCA projection to be fitted, if it needs one
+    pending = []
+    # Rows indexed so far, deleted again if a later batch fails so the file is indexed whole or not at all
+    indexed = []
+    while batch := await asyncio.to_thread(next, chunk_batches, None):
+        file_chunks = [
+            {
+                "chunk_text": chunk.page_content,
+                "chunk_metadata": chunk.metadata,
+                "chunk_order": total_chunks + i + 1
+            }
+            for i, chunk in enumerate(batch)
+        ]
+        chunks_ids = [project_id for _ in range(len(file_chunks))]
+
+        is_inserted = await nlp_controller.index_into_vector_db(
+            chunks=file_chunks,
+            do_reset=do_reset and total_chunks == 0,
+            chunks_ids=chunks_ids,
+            pending=pending,
+            indexed=indexed
+        )
+        if not is_inserted:
+            await nlp_controller.delete_indexed(indexed)
+            return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value}
+            )
+        total_chunks += len(file_chunks)
+
+    if not await nlp_controller.flush_pending_index(pending, indexed=indexed):
+        await nlp_controller.delete_indexed(indexed)
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value}
+        )
+
+    if total_chunks == 0:
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"signal": ResponseSignal.PROCESSING_FAILD.value}
         )
 
-    # Step 5: Directly Index Into Vector DB
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client
+    # Drop the original and keep only its extracted text when retention asks for it;
+    # the file is streamed through its loader a second time instead of held in memory
+    await asyncio.to_thread(
+        data_controller.asset_store.apply_retention,
+        project_id=project_id,
+        file_id=file_id,
+        pages=(record.page_content for record in process_controller.get_file_content(file_id=file_id)),
     )
 
-    chunks_ids = [project_id for _ in  range(len(file_chunks))]
-    
-    is_inserted = nlp_controller.index_into_vector_db(
-
-        chunks=file_chunks,
-        do_reset=do_reset,
-        chunks_ids=chunks_ids
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "signal": ResponseSignal.INSERT_INTO_VECTORDB_success.value,
+            "file_id": file_id,
+            "total_chunks": total_chunks
+        }
     )
 
-    if not is_inserted:
-        return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value}
-        )
+@data_router.get("/storage/{project_id}")
+async def get_storage_report(
+    request: Request,
+    project_id: str,
+    data_controller: DataController = Depends(get_data_controller)
+):
 
-    return JSONResponse(
+    report = await asyncio.to_thread(data_controller.asset_store.get_project_report, project_id)
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "signal": ResponseSignal.INSERT_INTO_VECTORDB_success.value,
-            "file_id": file_id,
-            "total_chunks": len(file_chunks)
+            "project_id": project_id,
+            "storage": report
         }
     )
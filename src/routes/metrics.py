@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from helpers.metrics import REGISTRY
+
+metrics_router=APIRouter(
+    tags=["metrics"]
+)
+
+@metrics_router.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(
+        content=REGISTRY.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -1,9 +1,12 @@
-from fastapi import FastAPI,APIRouter,status,Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI,APIRouter,Depends,status,Request
+from fastapi.responses import ORJSONResponse
 from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
-from .schemes.nlp import PushRequest,SearchRequest
+from .schemes.nlp import PushRequest,SearchRequest,MultiProjectSearchRequest,EmbeddingMigrationRequest
 from controllers import NLPController
+from helpers.tracing import TracedRoute
+from helpers.config import get_settings,Settings
+from helpers.dependencies import get_nlp_controller,get_chat_history_manager
 from models.enums import ResponseSignal
 import logging
 
@@ -12,11 +15,13 @@ logger=logging.getLogger("uvicorn.error")
 
 nlp_router=APIRouter(
     prefix="/api/v1/nlp",
-    tags=["api_v1","nlp"]
+    tags=["api_v1","nlp"],
+    route_class=TracedRoute
 )
 
 @nlp_router.get("/index/info/{project_id}")
-async def get_project_index_info(request: Request, project_id: str):
+async def get_project_index_info(request: Request, project_id: str,
+                                 nlp_controller: NLPController = Depends(get_nlp_controller)):
     
     project_model = await ProjectModel.create_instance(
         db_client=request.app.db_client
@@ -26,15 +31,9 @@ async def get_project_index_info(request: Request, project_id: str):
         project_id=project_id
     )
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-    )
-
     collection_info = nlp_controller.get_vector_db_collection_info()
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "signal": ResponseSignal.VECTORDB_COLLECTION_RETRIEVED.value,
             "collection_info": collection_info
@@ -42,34 +41,149 @@ async def get_project_index_info(request: Request, project_id: str):
     )
 
 
-@nlp_router.post("/index/search/{user_id}")
-async def search_index(request: Request,user_id:str, search_request: SearchRequest):
+@nlp_router.get("/index/versions")
+async def get_embedding_versions(request: Request,
+                                 nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.EMBEDDING_VERSIONS_RETRIEVED.value,
+            "versions": nlp_controller.get_embedding_versions()
+        }
+    )
+
+@nlp_router.get("/index/maintenance")
+async def get_index_maintenance_report(request: Request,
+                                       nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    report = await nlp_controller.get_index_maintenance_report()
+    if report is None:
+        return ORJSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.VECTORDB_MAINTENANCE_DISABLED.value
+            }
+        )
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.VECTORDB_MAINTENANCE_RETRIEVED.value,
+            "maintenance": report
+        }
+    )
+
+@nlp_router.post("/index/maintenance/run")
+async def run_index_maintenance(request: Request,
+                                nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    checks = await nlp_controller.run_index_maintenance()
+    if checks is None:
+        return ORJSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.VECTORDB_MAINTENANCE_DISABLED.value
+            }
+        )
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.VECTORDB_MAINTENANCE_FINISHED.value,
+            "collections": checks
+        }
+    )
+
+@nlp_router.post("/index/migrate")
+async def start_embedding_migration(request: Request, migration_request: EmbeddingMigrationRequest,
+                                    nlp_controller: NLPController = Depends(get_nlp_controller)):
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
+    migration = await nlp_controller.start_embedding_migration(
+        model_id=migration_request.model_id,
+        embedding_size=migration_request.embedding_size,
+        backend=migration_request.backend,
+        rate=migration_request.rate,
+        auto_switch=migration_request.auto_switch
     )
+    if migration is None:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.EMBEDDING_MIGRATION_FAILED.value
+            }
+        )
+
+    return ORJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "signal": ResponseSignal.EMBEDDING_MIGRATION_STARTED.value,
+            "migration": migration
+        }
+    )
+
+@nlp_router.post("/index/migrate/switch")
+async def switch_embedding_version(request: Request,
+                                   nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    if not nlp_controller.switch_embedding_version():
+        return ORJSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "signal": ResponseSignal.EMBEDDING_MIGRATION_NOT_READY.value,
+                "versions": nlp_controller.get_embedding_versions()
+            }
+        )
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.EMBEDDING_MIGRATION_SWITCHED.value,
+            "versions": nlp_controller.get_embedding_versions()
+        }
+    )
+
+@nlp_router.delete("/index/migrate")
+async def cancel_embedding_migration(request: Request,
+                                     nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    if not await nlp_controller.cancel_embedding_migration():
+        return ORJSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "signal": ResponseSignal.EMBEDDING_MIGRATION_NOT_FOUND.value
+            }
+        )
+
+    return ORJSONResponse(
+        content={
+            "signal": ResponseSignal.EMBEDDING_MIGRATION_CANCELLED.value
+        }
+    )
+
+@nlp_router.post("/index/search/{user_id}")
+async def search_index(request: Request,user_id:str, search_request: SearchRequest,
+                       nlp_controller: NLPController = Depends(get_nlp_controller),
+                       chat_history_manager = Depends(get_chat_history_manager)):
+
+    # Shed before spending embedding and retrieval work on a request we cannot answer
+    nlp_controller.check_generation_admission()
 
-    results = nlp_controller.search_vector_db_collection(
-      text=search_request.question, limit=search_request.limit
+    results = await nlp_controller.search_vector_db_collection(
+      text=search_request.question, limit=search_request.limit, user_id=user_id
     )
 
     if not results:
-        return JSONResponse(
+        return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "signal": ResponseSignal.VECTORDB_SEARCH_ERROR.value
                 }
             )
     
-    answer=nlp_controller.get_chatbot_answer(
+    answer=await nlp_controller.get_chatbot_answer(
         prompt=search_request.question,
         user_id=user_id,
         context=results,
-        chat_history_manager=request.app.chat_history_manager
+        chat_history_manager=chat_history_manager
     )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "signal": ResponseSignal.VECTORDB_SEARCH_SUCCESS.value,
@@ -77,28 +191,122 @@ async def search_index(request: Request,user_id:str, search_request: SearchReque
         }
     )
 
-@nlp_router.delete("/index/delete/{project_id}")
-async def delete(request: Request, project_id: str):
+@nlp_router.post("/index/search_projects/{user_id}")
+async def search_projects_index(request: Request, user_id: str, search_request: MultiProjectSearchRequest,
+                                app_settings: Settings = Depends(get_settings),
+                                nlp_controller: NLPController = Depends(get_nlp_controller),
+                                chat_history_manager = Depends(get_chat_history_manager)):
+
+    if len(search_request.project_ids) > app_settings.SEARCH_MAX_PROJECTS:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.SEARCH_TOO_MANY_PROJECTS.value,
+                "max_projects": app_settings.SEARCH_MAX_PROJECTS
+            }
+        )
+    if search_request.limit > app_settings.SEARCH_MAX_LIMIT:
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.SEARCH_LIMIT_TOO_LARGE.value,
+                "max_limit": app_settings.SEARCH_MAX_LIMIT
+            }
+        )
+
+    nlp_controller.check_generation_admission()
 
-    nlp_controller = NLPController(
-        vectordb_client=request.app.vectordb_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
+    results = await nlp_controller.search_projects(
+        text=search_request.question,
+        project_ids=search_request.project_ids,
+        limit=search_request.limit,
+        user_id=user_id
     )
+
+    if not results or not results["hits"]:
+        return ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.VECTORDB_SEARCH_ERROR.value,
+                    "timed_out_projects": results["timed_out"] if results else [],
+                    "failed_projects": results["failed"] if results else []
+                }
+            )
+
+    answer=await nlp_controller.get_chatbot_answer(
+        prompt=search_request.question,
+        user_id=user_id,
+        context=[hit["text"] for hit in results["hits"]],
+        chat_history_manager=chat_history_manager
+    )
+    signal = (ResponseSignal.VECTORDB_SEARCH_PARTIAL if results["partial"]
+              else ResponseSignal.VECTORDB_SEARCH_SUCCESS)
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "signal": signal.value,
+            "results": answer,
+            "partial": results["partial"],
+            "timed_out_projects": results["timed_out"],
+            "failed_projects": results["failed"],
+            "sources": [
+                {"project_id": hit["project_id"], "score": hit["score"]}
+                for hit in results["hits"]
+            ]
+        }
+    )
+
+@nlp_router.delete("/index/delete/{project_id}")
+async def delete(request: Request, project_id: str,
+                 nlp_controller: NLPController = Depends(get_nlp_controller)):
+
     results=nlp_controller.delete_file_from_vectorDB_by_ID(project_id=str(project_id))
 
     if  results==0:
-        return JSONResponse(
+        return ORJSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={
                     "signal": ResponseSignal.VECTORDB_FILE_NOT_FOUND.value
                 }
             )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "signal": ResponseSignal.VECTORDB_FILE_FOUND.value,
             "results": results
         }
-    )
\ No newline at end of file
+    )
+
+@nlp_router.get("/coalescing/stats")
+async def get_coalescing_stats(request: Request,
+                               nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "stats": nlp_controller.get_coalescing_stats()
+        }
+    )
+
+@nlp_router.get("/scheduler/stats")
+async def get_scheduler_stats(request: Request,
+                              nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "stats": nlp_controller.get_scheduler_stats()
+        }
+    )
+
+@nlp_router.get("/generation/stats")
+async def get_generation_stats(request: Request,
+                               nlp_controller: NLPController = Depends(get_nlp_controller)):
+
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "stats": nlp_controller.generation_client.get_stats()
+        }
+    )
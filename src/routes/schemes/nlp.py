@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class PushRequest(BaseModel):
     do_reset:Optional[int]=0
@@ -7,3 +7,15 @@ class PushRequest(BaseModel):
 class SearchRequest(BaseModel):
     question:str
     limit:Optional[int]=5
+
+class EmbeddingMigrationRequest(BaseModel):
+    model_id:str
+    embedding_size:int
+    backend:Optional[str]=None
+    rate:Optional[float]=None  # chunks per second, defaults to EMBEDDING_MIGRATION_RATE
+    auto_switch:Optional[bool]=True
+
+class MultiProjectSearchRequest(BaseModel):
+    question:str
+    project_ids:List[str]=Field(min_length=1)
+    limit:int=Field(default=5,gt=0)
@@ -0,0 +1,253 @@
+from contextlib import contextmanager
+from fastapi import UploadFile
+from helpers.metrics import REJECTED_UPLOADS, REJECTED_UPLOAD_BYTES
+from models.enums import ResponseSignal
+from threading import Lock
+from typing import Iterable, List
+import aiofiles
+import asyncio
+import io
+import json
+import logging
+import mmap
+import os
+import zstandard
+
+COMPRESSED_SUFFIX = ".zst"
+EXTRACTED_SUFFIX = ".extracted.txt.zst"
+MANIFEST_NAME = ".manifest.json"
+
+_manifest_lock = Lock()
+
+
+class UploadRejected(Exception):
+    """An upload aborted while streaming; nothing of it is left on disk"""
+
+    def __init__(self, reason: str, received_bytes: int):
+        super().__init__(f"upload rejected ({reason}) after {received_bytes} bytes")
+        self.reason = reason
+        self.received_bytes = received_bytes
+
+
+class AssetStore:
+    """Project asset files on local disk, zstd-compressed at rest
+
+    Uploads are compressed while they stream in, except for formats that are
+    already compressed (PDF), which are stored raw and memory-mapped when
+    parsed. A per-project manifest records original and stored sizes.
+    """
+
+    def __init__(self, files_dir: str,
+                       compression: str = "zstd",
+                       compression_level: int = 3,
+                       uncompressed_extensions: List[str] = None,
+                       retention: str = "keep"):
+        self.files_dir = files_dir
+        self.compression = compression
+        self.compression_level = compression_level
+        self.uncompressed_extensions = set(uncompressed_extensions or [".pdf", ".docx"])
+        self.retention = retention
+
+        self.logger = logging.getLogger(__name__)
+
+    def get_project_path(self, project_id: str):
+        return os.path.join(self.files_dir, project_id)
+
+    def should_compress(self, file_id: str) -> bool:
+        return (self.compression == "zstd"
+                and os.path.splitext(file_id)[-1].lower() not in self.uncompressed_extensions)
+
+    def get_stored_path(self, project_id: str, file_id: str):
+        """(path, is_compressed) of the stored original, or (None, False) when it is gone"""
+        path = os.path.join(self.get_project_path(project_id), file_id)
+        if os.path.exists(path + COMPRESSED_SUFFIX):
+            return path + COMPRESSED_SUFFIX, True
+        if os.path.exists(path):
+            return path, False
+        return None, False
+
+    def get_extracted_text_path(self, project_id: str, file_id: str):
+        path = os.path.join(self.get_project_path(project_id), file_id + EXTRACTED_SUFFIX)
+        return path if os.path.exists(path) else None
+
+    async def save_upload(self, file: UploadFile, file_path: str, chunk_size: int,
+                                max_bytes: int = None, check_head=None):
+        """Stream an upload to disk, compressing on the fly; returns (stored path, original bytes)
+
+        `check_head(first_block)` returns a rejection reason or None. The upload is
+        aborted with UploadRejected, and the partial file removed, as soon as the
+        first block fails that check or more than `max_bytes` have been received.
+        """
+        compress = self.should_compress(file_path)
+        stored_path = file_path + COMPRESSED_SUFFIX if compress else file_path
+        compressor = zstandard.ZstdCompressor(level=self.compression_level).compressobj() if compress else None
+        original_bytes = 0
+
+        try:
+            try:
+                f = await aiofiles.open(stored_path, "wb")
+            except FileNotFoundError:
+                # The project directory was removed after this process created it
+                os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+                f = await aiofiles.open(stored_path, "wb")
+            try:
+                while chunk := await file.read(chunk_size):
+                    if original_bytes == 0 and check_head is not None:
+                        reason = check_head(chunk)
+                        if reason is not None:
+                            raise UploadRejected(reason, len(chunk))
+                    original_bytes += len(chunk)
+                    if max_bytes is not None and original_bytes > max_bytes:
+                        raise UploadRejected(ResponseSignal.FILE_SIZE_EXCEEDED.value, original_bytes)
+                    if compressor is not None:
+                        # Compression releases the GIL, keep it off the event loop
+                        chunk = await asyncio.to_thread(compressor.compress, chunk)
+                    await f.write(chunk)
+                if compressor is not None:
+                    await f.write(compressor.flush())
+            finally:
+                await f.close()
+        except Exception as e:
+            if os.path.exists(stored_path):
+                os.remove(stored_path)
+            if isinstance(e, UploadRejected):
+                REJECTED_UPLOADS.labels(reason=e.reason).inc()
+                REJECTED_UPLOAD_BYTES.labels(reason=e.reason).inc(e.received_bytes)
+            raise
+
+        project_id = os.path.basename(os.path.dirname(file_path))
+        await asyncio.to_thread(
+            self.record_asset,
+            project_id=project_id,
+            file_id=os.path.basename(file_path),
+            original_bytes=original_bytes,
+            stored_bytes=os.path.getsize(stored_path),
+            compression="zstd" if compress else "none",
+            content_type=file.content_type,
+        )
+        return stored_path, original_bytes
+
+    @contextmanager
+    def open_binary(self, project_id: str, file_id: str):
+        """Readable binary stream of the original file, decompressed on the fly"""
+        path, compressed = self.get_stored_path(project_id, file_id)
+        if path is None:
+            raise FileNotFoundError(file_id)
+        with open(path, "rb") as f:
+            if compressed:
+                with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                    yield reader
+            else:
+                yield f
+
+    @contextmanager
+    def map_file(self, project_id: str, file_id: str):
+        """Buffer over the original file: memory-mapped when stored raw, decompressed otherwise"""
+        path, compressed = self.get_stored_path(project_id, file_id)
+        if path is None:
+            raise FileNotFoundError(file_id)
+        if compressed:
+            with self.open_binary(project_id, file_id) as reader:
+                yield memoryview(reader.read())
+            return
+        if os.path.getsize(path) == 0:
+            yield memoryview(b"")
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                # The map cannot close while a view is exported
+                view.release()
+
+    @contextmanager
+    def open_extracted_text(self, project_id: str, file_id: str):
+        """Readable binary stream of the text kept by text_only retention"""
+        path = self.get_extracted_text_path(project_id, file_id)
+        if path is None:
+            raise FileNotFoundError(file_id + EXTRACTED_SUFFIX)
+        with open(path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            yield reader
+
+    def read_extracted_text(self, project_id: str, file_id: str):
+        if self.get_extracted_text_path(project_id, file_id) is None:
+            return None
+        with self.open_extracted_text(project_id, file_id) as reader:
+            return io.TextIOWrapper(reader, encoding="utf-8").read()
+
+    def apply_retention(self, project_id: str, file_id: str, pages: Iterable[str]) -> bool:
+        """After indexing, replace the original with its extracted text when retention is text_only"""
+        if self.retention != "text_only":
+            return False
+        path, _ = self.get_stored_path(project_id, file_id)
+        if path is None:
+            return False
+
+        text_path = os.path.join(self.get_project_path(project_id), file_id + EXTRACTED_SUFFIX)
+        with open(text_path, "wb") as f:
+            with zstandard.ZstdCompressor(level=self.compression_level).stream_writer(f) as writer:
+                for page in pages:
+                    writer.write(page.encode("utf-8"))
+                    writer.write(b"\n\n")
+        os.remove(path)
+
+        self.update_asset(project_id, file_id,
+                          stored_bytes=os.path.getsize(text_path),
+                          retention="text_only")
+        return True
+
+    def _manifest_path(self, project_id: str):
+        return os.path.join(self.get_project_path(project_id), MANIFEST_NAME)
+
+    def _read_manifest(self, project_id: str) -> dict:
+        path = self._manifest_path(project_id)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _write_manifest(self, project_id: str, manifest: dict):
+        path = self._manifest_path(project_id)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def record_asset(self, project_id: str, file_id: str, original_bytes: int,
+                           stored_bytes: int, compression: str, content_type: str = None):
+        with _manifest_lock:
+            manifest = self._read_manifest(project_id)
+            manifest[file_id] = {
+                "original_bytes": original_bytes,
+                "stored_bytes": stored_bytes,
+                "compression": compression,
+                "content_type": content_type,
+                "retention": "original",
+            }
+            self._write_manifest(project_id, manifest)
+
+    def get_asset(self, project_id: str, file_id: str) -> dict:
+        with _manifest_lock:
+            return self._read_manifest(project_id).get(file_id, {})
+
+    def update_asset(self, project_id: str, file_id: str, **fields):
+        with _manifest_lock:
+            manifest = self._read_manifest(project_id)
+            if file_id not in manifest:
+                return
+            manifest[file_id].update(fields)
+            self._write_manifest(project_id, manifest)
+
+    def get_project_report(self, project_id: str) -> dict:
+        with _manifest_lock:
+            manifest = self._read_manifest(project_id)
+        original_bytes = sum(entry["original_bytes"] for entry in manifest.values())
+        stored_bytes = sum(entry["stored_bytes"] for entry in manifest.values())
+        return {
+            "files": len(manifest),
+            "original_bytes": original_bytes,
+            "stored_bytes": stored_bytes,
+            "bytes_saved": original_bytes - stored_bytes,
+            "compression_ratio": original_bytes / stored_bytes if stored_bytes else None,
+            "text_only_files": sum(1 for entry in manifest.values() if entry["retention"] == "text_only"),
+        }
@@ -0,0 +1 @@
+from .AssetStore import AssetStore, UploadRejected
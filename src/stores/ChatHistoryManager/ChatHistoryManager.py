@@ -1,9 +1,12 @@
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from threading import Lock
+from typing import List, Dict, Optional, Callable
+from threading import RLock
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
+from helpers.metrics import STAGE_LATENCY, ERRORS
+import logging
 import uuid
 
 class ChatHistoryManager:
@@ -12,20 +15,38 @@ class ChatHistoryManager:
         storage_path: str = "chat_history.json",
         max_history_per_user: int = 100,
         encryption_key: Optional[bytes] = None,
-        retention_days: int = 30
+        retention_days: int = 30,
+        max_turns: int = 3,
+        token_budget: int = 2000,
+        summarizer: Optional[Callable[[str, List[Dict]], Optional[str]]] = None
     ):
         """
         Args:
             storage_path: Path to JSON storage file
-            max_history_per_user: Maximum messages stored per user
+            max_history_per_user: Maximum turns stored per user
             encryption_key: Fernet key for encryption (None for plaintext)
             retention_days: Days to keep inactive conversations
+            max_turns: Number of recent turns replayed verbatim
+            token_budget: Approximate token budget for summary + recent turns
+            summarizer: Callable(summary, turns) -> new summary, run in background
         """
         self.storage_path = storage_path
         self.max_history = max_history_per_user
         self.retention_days = retention_days
-        self.lock = Lock()
-        
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.lock = RLock()
+
+        # Summaries are generated off the request path, one at a time
+        self.summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+        self.pending_summaries = set()
+        self.logger = logging.getLogger(__name__)
+
+        self.read_latency = STAGE_LATENCY.labels(component="chat_history", stage="read")
+        self.write_latency = STAGE_LATENCY.labels(component="chat_history", stage="write")
+        self.summary_latency = STAGE_LATENCY.labels(component="chat_history", stage="summarize")
+
         # Encryption setup
         self.cipher = Fernet(encryption_key) if encryption_key else None
         self._initialize_storage()
@@ -35,7 +56,7 @@ class ChatHistoryManager:
         with self.lock:
             if not os.path.exists(self.storage_path):
                 with open(self.storage_path, 'w') as f:
-                    json.dump({"conversations": {}, "metadata": {"version": 1}}, f)
+                    json.dump({"conversations": {}, "metadata": {"version": 2}}, f)
 
     def _encrypt(self, text: str) -> str:
         """Encrypt message content if cipher exists"""
@@ -61,89 +82,233 @@ class ChatHistoryManager:
             with open(self.storage_path, 'w') as f:
                 json.dump(data, f, indent=2)
 
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token)"""
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def _strip_context(content: str) -> str:
+        """Drop the retrieved context blob from a legacy stored prompt"""
+        marker = "\n\nQuestion: "
+        if marker in content:
+            return content.rsplit(marker, 1)[-1]
+        return content
+
+    def _get_turns(self, conversation: Dict) -> List[Dict]:
+        """Return stored turns, converting legacy message threads on the fly"""
+        if "turns" in conversation:
+            return conversation["turns"]
+
+        turns = []
+        for thread in conversation.get("messages", []):
+            questions = [m["content"] for m in thread if m["role"] == "human"]
+            answers = [m["content"] for m in thread if m["role"] != "human"]
+            if not questions or not answers:
+                continue
+            turns.append({
+                "id": str(uuid.uuid4()),
+                "question": self._encrypt(self._strip_context(questions[-1])),
+                "answer": self._encrypt(answers[-1]),
+                "created_at": conversation.get("updated_at", datetime.now().isoformat())
+            })
+        return turns
+
+    def _get_pending_turns(self, conversation: Dict) -> List[Dict]:
+        """Turns that left the recent window but are not folded into the summary yet"""
+        turns = self._get_turns(conversation)
+        window_start = max(len(turns) - self.max_turns, 0)
+        summarized_id = conversation.get("summarized_through")
+
+        start = 0
+        if summarized_id:
+            for i, turn in enumerate(turns):
+                if turn["id"] == summarized_id:
+                    start = i + 1
+                    break
+        return turns[start:window_start]
+
     def add_message(
         self,
         user_id: str,
-        message
+        question: str,
+        answer: str
     ) -> None:
-        """Add a new message to history
-        
+        """Add a new turn to history
+
+        Only the user question and the model answer are stored, the retrieved
+        context is not.
+
         Args:
             user_id: Unique user/conversation identifier
-            role: 'user' or 'bot'
-            content: Message text
-            metadata: Additional tracking data
+            question: The user question without retrieved context
+            answer: The generated answer
         """
-        data = self._read_data()
-        
-        if user_id not in data["conversations"]:
-            data["conversations"][user_id] = {
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-                "messages": []
-            }
-
-        data["conversations"][user_id]["messages"].append(message)
-        data["conversations"][user_id]["updated_at"] = datetime.now().isoformat()
-        
-        # Enforce max history limit
-        if len(data["conversations"][user_id]["messages"]) > self.max_history:
-            data["conversations"][user_id]["messages"] = data["conversations"][user_id]["messages"][-self.max_history:]
-        
-        self._write_data(data)
+        with self.write_latency.time(), self.lock:
+            data = self._read_data()
+
+            if user_id not in data["conversations"]:
+                data["conversations"][user_id] = {
+                    "created_at": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat(),
+                    "turns": [],
+                    "summary": None,
+                    "summarized_through": None
+                }
+
+            conversation = data["conversations"][user_id]
+            turns = self._get_turns(conversation)
+            conversation.pop("messages", None)
+            turns.append({
+                "id": str(uuid.uuid4()),
+                "question": self._encrypt(question),
+                "answer": self._encrypt(answer),
+                "created_at": datetime.now().isoformat()
+            })
+
+            # Enforce max history limit
+            conversation["turns"] = turns[-self.max_history:]
+            conversation["updated_at"] = datetime.now().isoformat()
+
+            has_pending = len(self._get_pending_turns(conversation)) > 0
+            self._write_data(data)
+
+        if has_pending:
+            self._schedule_summary(user_id)
+
+    def _schedule_summary(self, user_id: str):
+        """Queue a background summary update for the user"""
+        if not self.summarizer:
+            return
+        with self.lock:
+            if user_id in self.pending_summaries:
+                return
+            self.pending_summaries.add(user_id)
+        try:
+            self.summary_executor.submit(self._update_summary, user_id)
+        except RuntimeError:
+            # Executor already shut down, the summary catches up on the next turn
+            self.pending_summaries.discard(user_id)
+
+    def _update_summary(self, user_id: str):
+        """Fold turns that left the recent window into the running summary"""
+        try:
+            with self.lock:
+                self.pending_summaries.discard(user_id)
+                data = self._read_data()
+                conversation = data["conversations"].get(user_id)
+                if not conversation:
+                    return
+                pending = self._get_pending_turns(conversation)
+                summary = conversation.get("summary")
+
+            if not pending:
+                return
+
+            # The LLM call runs without holding the lock
+            with self.summary_latency.time():
+                new_summary = self.summarizer(
+                    self._decrypt(summary) if summary else "",
+                    [
+                        {"question": self._decrypt(t["question"]), "answer": self._decrypt(t["answer"])}
+                        for t in pending
+                    ]
+                )
+            if not new_summary:
+                return
+
+            with self.lock:
+                data = self._read_data()
+                conversation = data["conversations"].get(user_id)
+                if not conversation:
+                    return
+                conversation["summary"] = self._encrypt(new_summary)
+                conversation["summarized_through"] = pending[-1]["id"]
+                self._write_data(data)
+        except Exception as e:
+            ERRORS.labels(provider="chat_history", operation="summarize").inc()
+            self.logger.error(f"Error while summarizing history of {user_id}: {e}")
+
+    def get_pending_summaries(self) -> int:
+        return len(self.pending_summaries)
+
+    def close(self, wait: bool = True):
+        """Finish queued summary updates and stop the background worker"""
+        self.summary_executor.shutdown(wait=wait)
 
     def get_conversation(
         self,
         user_id: str,
-        max_messages: Optional[int] = 3,
-        include_metadata: bool = False
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None
     ) -> List[Dict]:
-        """Retrieve conversation history
-        
+        """Retrieve conversation history as summary + last turns
+
         Args:
             user_id: User identifier
-            max_messages: None for all messages
-            include_metadata: Whether to include message metadata
+            max_turns: Recent turns to replay (defaults to max_turns)
+            token_budget: Approximate token budget (defaults to token_budget)
         """
-        data = self._read_data()
+        max_turns = max_turns if max_turns is not None else self.max_turns
+        token_budget = token_budget if token_budget is not None else self.token_budget
+
+        with self.read_latency.time():
+            data = self._read_data()
         if user_id not in data["conversations"]:
             return []
-        messages = data["conversations"][user_id]["messages"]
-        if max_messages:
-            messages = messages[-max_messages:]
- 
-        ans=[]
-        for thread in messages:
-            for msg in thread:
-                x={
-                    "role":msg["role"],
-                    "content":msg["content"]
-                }
-                ans.append(x)
-        return ans
+        conversation = data["conversations"][user_id]
+        turns = self._get_turns(conversation)
+        turns = turns[-max_turns:] if max_turns else []
+
+        summary_message = []
+        if conversation.get("summary"):
+            summary = self._decrypt(conversation["summary"])
+            summary_message = [{
+                "role": "human",
+                "content": f"Summary of our earlier conversation:\n{summary}"
+            }]
+            token_budget -= self._estimate_tokens(summary)
+
+        # Keep the newest turns that fit into the remaining budget
+        ans = []
+        for turn in reversed(turns):
+            question = self._decrypt(turn["question"])
+            answer = self._decrypt(turn["answer"])
+            cost = self._estimate_tokens(question) + self._estimate_tokens(answer)
+            if cost > token_budget:
+                break
+            token_budget -= cost
+            ans = [
+                {"role": "human", "content": question},
+                {"role": "ai", "content": answer}
+            ] + ans
+
+        return summary_message + ans
 
 
     def cleanup_old_conversations(self):
         """Remove conversations older than retention_days"""
         threshold = datetime.now() - timedelta(days=self.retention_days)
-        data = self._read_data()
-        
-        updated = False
-        for user_id, conv in list(data["conversations"].items()):
-            last_update = datetime.fromisoformat(conv["updated_at"])
-            if last_update < threshold:
-                del data["conversations"][user_id]
-                updated = True
-        
-        if updated:
-            self._write_data(data)
+        with self.lock:
+            data = self._read_data()
+
+            updated = False
+            for user_id, conv in list(data["conversations"].items()):
+                last_update = datetime.fromisoformat(conv["updated_at"])
+                if last_update < threshold:
+                    del data["conversations"][user_id]
+                    updated = True
+
+            if updated:
+                self._write_data(data)
 
     def delete_conversation(self, user_id: str) -> bool:
         """Remove specific conversation"""
-        data = self._read_data()
-        if user_id in data["conversations"]:
-            del data["conversations"][user_id]
-            self._write_data(data)
-            return True
+        with self.lock:
+            data = self._read_data()
+            if user_id in data["conversations"]:
+                del data["conversations"][user_id]
+                self._write_data(data)
+                return True
         return False
-    
+
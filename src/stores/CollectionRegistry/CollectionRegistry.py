@@ -0,0 +1,138 @@
+from threading import Lock
+import copy
+import json
+import logging
+import os
+import time
+
+# Version states
+ACTIVE = "active"
+BUILDING = "building"
+READY = "ready"
+RETIRED = "retired"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class CollectionRegistry:
+    """Which physical vector DB collection serves each logical collection
+
+    Every physical collection is tagged with the embedding backend, model and
+    dimension that produced its vectors. The logical name acts as an alias:
+    searches and inserts resolve it to the active version, and switching the
+    alias to a rebuilt collection is a single atomic file replace.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write(self, registry: dict):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    def get(self, alias: str) -> dict:
+        with self.lock:
+            entry = self._read().get(alias)
+        return copy.deepcopy(entry)
+
+    def get_active_version(self, alias: str) -> dict:
+        entry = self.get(alias)
+        if entry is None:
+            return None
+        return dict(entry["versions"][entry["active"]], collection_name=entry["active"])
+
+    def get_building_version(self, alias: str) -> dict:
+        entry = self.get(alias)
+        if entry is None:
+            return None
+        for collection_name, version in entry["versions"].items():
+            if version["state"] in (BUILDING, READY):
+                return dict(version, collection_name=collection_name)
+        return None
+
+    def ensure(self, alias: str, backend: str, model_id: str, embedding_size: int, vector_size: int) -> dict:
+        """Active version of the alias, registering the existing collection on first use
+
+        A collection created before versioning keeps the alias as its physical
+        name and is assumed to come from the configured model.
+        """
+        with self.lock:
+            registry = self._read()
+            if alias not in registry:
+                registry[alias] = {
+                    "active": alias,
+                    "versions": {
+                        alias: {
+                            "backend": backend,
+                            "model_id": model_id,
+                            "embedding_size": embedding_size,
+                            "vector_size": vector_size,
+                            "state": ACTIVE,
+                            "created_at": time.time(),
+                        }
+                    },
+                }
+                self._write(registry)
+        return self.get_active_version(alias)
+
+    def next_collection_name(self, alias: str) -> str:
+        entry = self.get(alias) or {"versions": {}}
+        number = len(entry["versions"]) + 1
+        while f"{alias}_v{number}" in entry["versions"]:
+            number += 1
+        return f"{alias}_v{number}"
+
+    def add_version(self, alias: str, collection_name: str, backend: str, model_id: str,
+                          embedding_size: int, vector_size: int, **fields) -> dict:
+        with self.lock:
+            registry = self._read()
+            version = {
+                "backend": backend,
+                "model_id": model_id,
+                "embedding_size": embedding_size,
+                "vector_size": vector_size,
+                "state": BUILDING,
+                "created_at": time.time(),
+                **fields,
+            }
+            registry[alias]["versions"][collection_name] = version
+            self._write(registry)
+        return dict(version, collection_name=collection_name)
+
+    def update_version(self, alias: str, collection_name: str, **fields):
+        with self.lock:
+            registry = self._read()
+            version = registry.get(alias, {}).get("versions", {}).get(collection_name)
+            if version is None:
+                return
+            version.update(fields)
+            self._write(registry)
+
+    def switch(self, alias: str, collection_name: str) -> bool:
+        """Point the alias at another version; the previous one is kept, retired"""
+        with self.lock:
+            registry = self._read()
+            entry = registry.get(alias)
+            if entry is None or collection_name not in entry["versions"]:
+                return False
+            previous = entry["active"]
+            if previous != collection_name:
+                entry["versions"][previous]["state"] = RETIRED
+                entry["versions"][previous]["retired_at"] = time.time()
+            entry["versions"][collection_name]["state"] = ACTIVE
+            entry["versions"][collection_name]["activated_at"] = time.time()
+            entry["active"] = collection_name
+            self._write(registry)
+        self.logger.info(f"Collection alias {alias} now points to {collection_name} (was {previous})")
+        return True
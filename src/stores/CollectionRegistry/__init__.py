@@ -0,0 +1 @@
+from .CollectionRegistry import CollectionRegistry
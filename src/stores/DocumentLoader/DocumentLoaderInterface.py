@@ -0,0 +1,22 @@
+from .DocumentSource import DocumentSource
+from abc import ABC, abstractmethod
+from langchain_core.documents import Document
+from typing import Iterator
+
+class DocumentLoaderInterface(ABC):
+    """Streaming extractor for one document format
+
+    Loaders read through a DocumentSource and yield page/section records one
+    at a time, so memory stays bounded by `block_size` rather than file size.
+    """
+
+    def __init__(self, block_size: int = 65536, batch_rows: int = 200):
+        self.block_size = block_size
+        self.batch_rows = batch_rows
+
+    @abstractmethod
+    def lazy_load(self, source: DocumentSource) -> Iterator[Document]:
+        pass
+
+    def load(self, source: DocumentSource):
+        return list(self.lazy_load(source))
@@ -0,0 +1,66 @@
+from models.enums import ProcessingEnum
+import importlib
+import os
+
+# Extension -> (module, class) under .loaders, or a loader class registered at runtime
+LOADER_REGISTRY = {
+    ProcessingEnum.TXT.value: ("TextLoader", "TextLoader"),
+    ProcessingEnum.MD.value: ("MarkdownLoader", "MarkdownLoader"),
+    ProcessingEnum.MARKDOWN.value: ("MarkdownLoader", "MarkdownLoader"),
+    ProcessingEnum.HTML.value: ("HTMLLoader", "HTMLLoader"),
+    ProcessingEnum.HTM.value: ("HTMLLoader", "HTMLLoader"),
+    ProcessingEnum.CSV.value: ("CSVLoader", "CSVLoader"),
+    ProcessingEnum.DOCX.value: ("DOCXLoader", "DOCXLoader"),
+    ProcessingEnum.PDF.value: ("PDFLoader", "PDFLoader"),
+}
+
+# MIME type -> extension, used when the file name has no known extension
+MIME_REGISTRY = {
+    "text/plain": ProcessingEnum.TXT.value,
+    "text/markdown": ProcessingEnum.MD.value,
+    "text/x-markdown": ProcessingEnum.MD.value,
+    "text/html": ProcessingEnum.HTML.value,
+    "application/xhtml+xml": ProcessingEnum.HTML.value,
+    "text/csv": ProcessingEnum.CSV.value,
+    "application/csv": ProcessingEnum.CSV.value,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ProcessingEnum.DOCX.value,
+    "application/pdf": ProcessingEnum.PDF.value,
+}
+
+
+def register_loader(extension: str, loader_class, mime_types: list = ()):
+    """Plug in a loader (a DocumentLoaderInterface subclass) for a new format"""
+    LOADER_REGISTRY[extension.lower()] = loader_class
+    for mime_type in mime_types:
+        MIME_REGISTRY[mime_type] = extension.lower()
+
+
+class DocumentLoaderRegistry:
+    def __init__(self, config):
+        self.config = config
+
+    def resolve_extension(self, file_id: str, content_type: str = None):
+        extension = os.path.splitext(file_id)[-1].lower()
+        if extension in LOADER_REGISTRY:
+            return extension
+        if content_type:
+            return MIME_REGISTRY.get(content_type.split(";")[0].strip().lower())
+        return None
+
+    def load_loader_class(self, extension: str):
+        entry = LOADER_REGISTRY[extension]
+        if not isinstance(entry, tuple):
+            return entry
+        module_name, class_name = entry
+        module = importlib.import_module(f".loaders.{module_name}", package=__package__)
+        return getattr(module, class_name)
+
+    def create(self, file_id: str, content_type: str = None, extension: str = None):
+        extension = extension or self.resolve_extension(file_id, content_type)
+        if extension not in LOADER_REGISTRY:
+            return None
+        loader_class = self.load_loader_class(extension)
+        return loader_class(
+            block_size=self.config.FILE_LOADER_BLOCK_SIZE,
+            batch_rows=self.config.FILE_LOADER_CSV_BATCH_ROWS,
+        )
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from langchain_core.documents import Document
+
+class DocumentSource:
+    """An asset as seen by a loader: streams and buffers, whatever the storage format"""
+
+    def __init__(self, asset_store, project_id: str, file_id: str,
+                       source_path: str, extracted: bool = False):
+        self.asset_store = asset_store
+        self.project_id = project_id
+        self.file_id = file_id
+        self.source_path = source_path
+        # Read the text kept by text_only retention instead of the original
+        self.extracted = extracted
+
+    def open_binary(self):
+        if self.extracted:
+            return self.asset_store.open_extracted_text(self.project_id, self.file_id)
+        return self.asset_store.open_binary(self.project_id, self.file_id)
+
+    @contextmanager
+    def map_file(self):
+        if self.extracted:
+            raise FileNotFoundError(self.file_id)
+        with self.asset_store.map_file(self.project_id, self.file_id) as buffer:
+            yield buffer
+
+    def record(self, text: str, **metadata) -> Document:
+        return Document(page_content=text, metadata={"source": self.source_path, **metadata})
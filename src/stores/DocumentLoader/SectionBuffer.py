@@ -0,0 +1,31 @@
+class SectionBuffer:
+    """Accumulates the text of the current section, split at headings or every `max_size` characters"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.heading = None
+        self.level = 0
+        self.index = 0
+        self.parts = []
+        self.size = 0
+
+    def append(self, text: str) -> bool:
+        """Add text; True when the section reached `max_size` and should be flushed"""
+        self.parts.append(text)
+        self.size += len(text)
+        return self.size >= self.max_size
+
+    def start(self, heading: str, level: int):
+        self.heading = heading
+        self.level = level
+
+    def flush(self):
+        """(text, metadata) of the buffered section, or None when it holds no text"""
+        text = "".join(self.parts).strip()
+        self.parts = []
+        self.size = 0
+        if not text:
+            return None
+        metadata = {"section": self.index, "heading": self.heading, "heading_level": self.level}
+        self.index += 1
+        return text, metadata
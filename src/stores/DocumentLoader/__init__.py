@@ -0,0 +1,3 @@
+from .DocumentLoaderInterface import DocumentLoaderInterface
+from .DocumentLoaderRegistry import DocumentLoaderRegistry, register_loader
+from .DocumentSource import DocumentSource
@@ -0,0 +1,24 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+import csv
+import io
+
+class CSVLoader(DocumentLoaderInterface):
+    """CSV rows in batches of `batch_rows`, each row rendered as `column: value` pairs"""
+
+    def lazy_load(self, source):
+        with source.open_binary() as f:
+            reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8-sig", newline=""))
+            header = next(reader, None)
+            if header is None:
+                return
+            lines = []
+            first_row = 1
+            for row_number, row in enumerate(reader, start=1):
+                names = header + [f"column_{i}" for i in range(len(header), len(row))]
+                lines.append("; ".join(f"{name}: {value}" for name, value in zip(names, row) if value))
+                if len(lines) >= self.batch_rows:
+                    yield source.record("\n".join(lines), row_start=first_row, row_end=row_number)
+                    lines = []
+                    first_row = row_number + 1
+            if lines:
+                yield source.record("\n".join(lines), row_start=first_row, row_end=first_row + len(lines) - 1)
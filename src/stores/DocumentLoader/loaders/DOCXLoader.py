@@ -0,0 +1,59 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+from ..SectionBuffer import SectionBuffer
+from xml.etree import ElementTree
+import io
+import zipfile
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DOCXLoader(DocumentLoaderInterface):
+    """Word documents parsed paragraph by paragraph, one record per heading section"""
+
+    def paragraph(self, element):
+        """(text, style) of a w:p element"""
+        parts = []
+        for node in element.iter():
+            if node.tag == W + "t":
+                parts.append(node.text or "")
+            elif node.tag == W + "tab":
+                parts.append("\t")
+            elif node.tag in (W + "br", W + "cr"):
+                parts.append("\n")
+        style = element.find(f"{W}pPr/{W}pStyle")
+        return "".join(parts), style.get(W + "val", "") if style is not None else ""
+
+    def heading_level(self, style: str):
+        if style == "Title":
+            return 1
+        if style.startswith("Heading") and style[7:].isdigit():
+            return int(style[7:])
+        return 0
+
+    def lazy_load(self, source):
+        buffer = SectionBuffer(self.block_size)
+        with source.open_binary() as f:
+            if not f.seekable():
+                # Zip needs random access; .docx is normally stored raw (FILE_STORAGE_UNCOMPRESSED_EXTENSIONS)
+                f = io.BytesIO(f.read())
+            with zipfile.ZipFile(f) as archive, archive.open("word/document.xml") as xml:
+                for _, element in ElementTree.iterparse(xml, events=("end",)):
+                    if element.tag != W + "p":
+                        continue
+                    text, style = self.paragraph(element)
+                    element.clear()
+
+                    level = self.heading_level(style)
+                    if level:
+                        section = buffer.flush()
+                        if section:
+                            yield source.record(section[0], **section[1])
+                        buffer.start(text.strip(), level)
+                    if text and buffer.append(text + "\n"):
+                        section = buffer.flush()
+                        if section:
+                            yield source.record(section[0], **section[1])
+
+        section = buffer.flush()
+        if section:
+            yield source.record(section[0], **section[1])
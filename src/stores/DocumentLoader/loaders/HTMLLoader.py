@@ -0,0 +1,80 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+from ..SectionBuffer import SectionBuffer
+from collections import deque
+from html.parser import HTMLParser
+import io
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "head", "svg"}
+BLOCK_TAGS = {"p", "div", "li", "br", "tr", "td", "th", "section", "article",
+              "table", "ul", "ol", "pre", "blockquote", "header", "footer", "main"}
+
+
+class _SectionParser(HTMLParser):
+    """Collects visible text into sections split at h1-h6, fed incrementally"""
+
+    def __init__(self, max_size: int):
+        super().__init__(convert_charrefs=True)
+        self.buffer = SectionBuffer(max_size)
+        self.sections = deque()
+        self.skip_depth = 0
+        self.heading_level = 0
+        self.heading_parts = []
+
+    def flush(self):
+        section = self.buffer.flush()
+        if section:
+            text = "\n".join(" ".join(line.split()) for line in section[0].splitlines() if line.strip())
+            self.sections.append((text, section[1]))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in HEADING_TAGS:
+            self.flush()
+            self.heading_level = HEADING_TAGS[tag]
+            self.heading_parts = []
+        elif tag in BLOCK_TAGS:
+            self.buffer.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.buffer.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in HEADING_TAGS and self.heading_level:
+            heading = " ".join("".join(self.heading_parts).split())
+            self.buffer.start(heading, self.heading_level)
+            self.buffer.append(heading + "\n")
+            self.heading_level = 0
+        elif tag in BLOCK_TAGS:
+            self.buffer.append("\n")
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.heading_level:
+            self.heading_parts.append(data)
+        elif self.buffer.append(data):
+            self.flush()
+
+
+class HTMLLoader(DocumentLoaderInterface):
+    """Visible HTML text, one record per heading section"""
+
+    def lazy_load(self, source):
+        parser = _SectionParser(self.block_size)
+        with source.open_binary() as f:
+            reader = io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+            while data := reader.read(self.block_size):
+                parser.feed(data)
+                while parser.sections:
+                    text, metadata = parser.sections.popleft()
+                    yield source.record(text, **metadata)
+        parser.close()
+        parser.flush()
+        while parser.sections:
+            text, metadata = parser.sections.popleft()
+            yield source.record(text, **metadata)
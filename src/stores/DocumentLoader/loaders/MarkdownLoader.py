@@ -0,0 +1,36 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+from ..SectionBuffer import SectionBuffer
+import io
+import re
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+class MarkdownLoader(DocumentLoaderInterface):
+    """Markdown read line by line, one record per heading section"""
+
+    def lazy_load(self, source):
+        buffer = SectionBuffer(self.block_size)
+        fence = None
+        with source.open_binary() as f:
+            for line in io.TextIOWrapper(f, encoding="utf-8"):
+                fence_match = FENCE_PATTERN.match(line)
+                if fence_match:
+                    # '#' lines inside code blocks are not headings
+                    marker = fence_match.group(1)
+                    fence = None if fence == marker else (fence or marker)
+                heading = HEADING_PATTERN.match(line) if fence is None else None
+                if heading:
+                    section = buffer.flush()
+                    if section:
+                        yield source.record(section[0], **section[1])
+                    buffer.start(heading.group(2), len(heading.group(1)))
+
+                if buffer.append(line):
+                    section = buffer.flush()
+                    if section:
+                        yield source.record(section[0], **section[1])
+
+        section = buffer.flush()
+        if section:
+            yield source.record(section[0], **section[1])
@@ -0,0 +1,15 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+import fitz
+
+class PDFLoader(DocumentLoaderInterface):
+    """One record per PDF page, parsed from the memory-mapped file"""
+
+    def lazy_load(self, source):
+        # PyMuPDF parses straight from the mapped file instead of a copy in memory
+        with source.map_file() as buffer:
+            document = fitz.open(stream=buffer, filetype="pdf")
+            try:
+                for page in document:
+                    yield source.record(page.get_text(), page=page.number, total_pages=document.page_count)
+            finally:
+                document.close()
@@ -0,0 +1,24 @@
+from ..DocumentLoaderInterface import DocumentLoaderInterface
+import io
+
+class TextLoader(DocumentLoaderInterface):
+    """Plain text in fixed-size blocks, cut at the last line break or space"""
+
+    def lazy_load(self, source):
+        with source.open_binary() as f:
+            reader = io.TextIOWrapper(f, encoding="utf-8")
+            carry = ""
+            block = 0
+            while data := reader.read(self.block_size):
+                data = carry + data
+                # Keep words (and lines where possible) whole across blocks
+                cut = data.rfind("\n")
+                if cut < len(data) // 2:
+                    cut = data.rfind(" ")
+                if cut <= 0:
+                    cut = len(data) - 1
+                text, carry = data[:cut + 1], data[cut + 1:]
+                yield source.record(text, block=block)
+                block += 1
+            if carry:
+                yield source.record(carry, block=block)
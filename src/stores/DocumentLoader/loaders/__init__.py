@@ -0,0 +1,17 @@
+import importlib
+
+# Loaders are resolved on first access so importing the package stays cheap
+_LAZY_LOADERS = {
+    "TextLoader": ".TextLoader",
+    "MarkdownLoader": ".MarkdownLoader",
+    "HTMLLoader": ".HTMLLoader",
+    "CSVLoader": ".CSVLoader",
+    "DOCXLoader": ".DOCXLoader",
+    "PDFLoader": ".PDFLoader",
+}
+
+def __getattr__(name):
+    if name not in _LAZY_LOADERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_LOADERS[name], package=__name__)
+    return getattr(module, name)
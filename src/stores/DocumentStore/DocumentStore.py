@@ -0,0 +1,141 @@
+from helpers.metrics import STAGE_LATENCY
+from threading import Lock, local
+from typing import List
+import json
+import logging
+import os
+import sqlite3
+
+
+class DocumentStore:
+    """Chunk text and metadata in a local SQLite file
+
+    Used when the vector DB keeps only ids and vectors
+    (VECTOR_DB_TEXT_STORAGE=local). Record ids are assigned here and stored as
+    the vector DB primary key, so the text of the top-k hits is fetched with a
+    single primary-key lookup after search.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        # One connection per thread (calls arrive through asyncio.to_thread);
+        # WAL lets readers proceed while a write is in progress
+        self.local = local()
+        self.connections = []
+        self.connections_lock = Lock()
+        self.write_lock = Lock()
+
+        self.logger = logging.getLogger(__name__)
+        self.insert_latency = STAGE_LATENCY.labels(component="document_store", stage="insert")
+        self.fetch_latency = STAGE_LATENCY.labels(component="document_store", stage="fetch")
+
+        with self.write_lock:
+            connection = self.get_connection()
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    doc_id TEXT,
+                    text TEXT NOT NULL,
+                    metadata TEXT
+                );
+                CREATE INDEX IF NOT EXISTS chunks_collection_doc_id ON chunks (collection, doc_id);
+            """)
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    def insert_many(self, collection_name: str, texts: list,
+                          metadata: list = None, doc_ids: list = None) -> List[int]:
+        """Store chunks and return their record ids, in input order"""
+        metadata = metadata or [None] * len(texts)
+        doc_ids = doc_ids or [None] * len(texts)
+        record_ids = []
+        # AUTOINCREMENT: ids are never reused, so a stale vector can never point at another chunk
+        with self.insert_latency.time(), self.write_lock:
+            connection = self.get_connection()
+            with connection:
+                for text, meta, doc_id in zip(texts, metadata, doc_ids):
+                    cursor = connection.execute(
+                        "INSERT INTO chunks (collection, doc_id, text, metadata) VALUES (?, ?, ?, ?)",
+                        (collection_name, doc_id, text, json.dumps(meta) if meta is not None else None),
+                    )
+                    record_ids.append(cursor.lastrowid)
+        return record_ids
+
+    def get_many(self, collection_name: str, record_ids: list) -> dict:
+        """record_id -> {"text", "metadata"} for the ids that exist, in one query"""
+        if not record_ids:
+            return {}
+        placeholders = ",".join("?" * len(record_ids))
+        with self.fetch_latency.time():
+            rows = self.get_connection().execute(
+                f"SELECT record_id, text, metadata FROM chunks "
+                f"WHERE collection = ? AND record_id IN ({placeholders})",
+                (collection_name, *[int(record_id) for record_id in record_ids]),
+            ).fetchall()
+        return {
+            record_id: {"text": text, "metadata": json.loads(metadata) if metadata else None}
+            for record_id, text, metadata in rows
+        }
+
+    def max_record_id(self, collection_name: str) -> int:
+        row = self.get_connection().execute(
+            "SELECT MAX(record_id) FROM chunks WHERE collection = ?", (collection_name,)
+        ).fetchone()
+        return row[0] or 0
+
+    def get_range(self, collection_name: str, after_id: int, upto_id: int, limit: int) -> list:
+        """Records with after_id < record_id <= upto_id in id order, for paging through a collection"""
+        with self.fetch_latency.time():
+            rows = self.get_connection().execute(
+                "SELECT record_id, doc_id, text, metadata FROM chunks "
+                "WHERE collection = ? AND record_id > ? AND record_id <= ? ORDER BY record_id LIMIT ?",
+                (collection_name, after_id, upto_id, limit),
+            ).fetchall()
+        return [
+            {"record_id": record_id, "doc_id": doc_id, "text": text,
+             "metadata": json.loads(metadata) if metadata else None}
+            for record_id, doc_id, text, metadata in rows
+        ]
+
+    def _delete(self, query: str, params: tuple) -> int:
+        with self.write_lock:
+            connection = self.get_connection()
+            with connection:
+                return connection.execute(query, params).rowcount
+
+    def delete_records(self, record_ids: list) -> int:
+        if not record_ids:
+            return 0
+        placeholders = ",".join("?" * len(record_ids))
+        return self._delete(f"DELETE FROM chunks WHERE record_id IN ({placeholders})", tuple(record_ids))
+
+    def delete_by_doc_id(self, collection_name: str, doc_id: str) -> int:
+        return self._delete("DELETE FROM chunks WHERE collection = ? AND doc_id = ?", (collection_name, doc_id))
+
+    def delete_collection(self, collection_name: str) -> int:
+        return self._delete("DELETE FROM chunks WHERE collection = ?", (collection_name,))
+
+    def count(self, collection_name: str) -> int:
+        return self.get_connection().execute(
+            "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection_name,)
+        ).fetchone()[0]
+
+    def close(self):
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+        self.local = local()
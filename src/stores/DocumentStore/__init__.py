@@ -0,0 +1 @@
+from .DocumentStore import DocumentStore
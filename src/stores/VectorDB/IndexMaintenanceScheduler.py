@@ -0,0 +1,324 @@
+from helpers.fair_scheduler import get_fair_scheduler, INTERACTIVE, INGESTION
+from helpers.metrics import VECTORDB_MAINTENANCE, VECTORDB_COLLECTION_STATS
+from datetime import datetime
+from threading import Lock
+import asyncio
+import json
+import logging
+import os
+import time
+
+MAINTENANCE_USER = "maintenance"
+
+
+class IndexMaintenanceScheduler:
+    """Background compaction and index rebuilds for the vector DB collections
+
+    Filter deletes leave tombstones in the vector DB until a compaction purges
+    them, and an index built over a small collection serves it poorly once it
+    has grown. Inserted and deleted rows are counted per collection (and kept
+    in a state file across restarts); every `interval` seconds collections over
+    the tombstone, segment or growth thresholds are compacted or re-indexed,
+    but only inside the maintenance window and while no query is using the
+    vector DB. Without a window nothing runs until run_now is called.
+
+    A failing check or operation is retried after an exponential backoff, and
+    given up after `max_failures` consecutive failures until the next restart
+    or run_now.
+    """
+
+    def __init__(self, vectordb_client, state_path: str,
+                       interval: float = 300.0,
+                       window: str = "01:00-05:00",
+                       min_rows: int = 1000,
+                       tombstone_ratio: float = 0.2,
+                       max_segments: int = 32,
+                       growth_ratio: float = 1.0,
+                       compaction_timeout: float = 600.0,
+                       max_failures: int = 5,
+                       max_backoff: float = 21600.0):
+        self.vectordb_client = vectordb_client
+        self.state_path = state_path
+        if os.path.dirname(state_path):
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        self.interval = interval
+        self.window_text = window
+        self.window = self.parse_window(window)
+        self.min_rows = min_rows
+        self.tombstone_ratio = tombstone_ratio
+        self.max_segments = max_segments
+        self.growth_ratio = growth_ratio
+        self.compaction_timeout = compaction_timeout
+        self.max_failures = max_failures
+        self.max_backoff = max_backoff
+        # (collection, operation) -> (consecutive failures, monotonic time of the next attempt)
+        self.failures = {}
+        self.check_failures = 0
+
+        self.lock = Lock()
+        self.state = self._read_state()
+        self.dirty = False
+        self.running = None  # (collection, operation) in progress
+        # A forced run and the background loop never check at the same time
+        self.run_lock = asyncio.Lock()
+        self.task = None
+        self.vectordb_scheduler = get_fair_scheduler("vectordb")
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def parse_window(window: str):
+        """"HH:MM-HH:MM" (local time, may wrap past midnight) -> (start, end) minutes, or None for never"""
+        if not window:
+            return None
+        bounds = []
+        for bound in window.split("-"):
+            hours, minutes = bound.strip().split(":")
+            bounds.append(int(hours) * 60 + int(minutes))
+        return tuple(bounds)
+
+    def _read_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def _write_state(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            state = json.dumps(self.state, indent=2)
+            self.dirty = False
+        with open(self.state_path + ".tmp", "w") as f:
+            f.write(state)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _get_entry(self, collection_name: str) -> dict:
+        entry = self.state.get(collection_name)
+        if entry is None:
+            entry = self.state[collection_name] = {
+                "inserted_since_rebuild": 0,
+                "deleted_since_compaction": 0,
+                # Unknown for collections seen for the first time, set on the next check
+                "rows_at_rebuild": None,
+                "last_compaction_at": None,
+                "last_index_rebuild_at": None,
+            }
+        return entry
+
+    def record_inserts(self, collection_name: str, count: int):
+        with self.lock:
+            self._get_entry(collection_name)["inserted_since_rebuild"] += count
+            self.dirty = True
+
+    def record_deletes(self, collection_name: str, count: int):
+        if not count:
+            return
+        with self.lock:
+            self._get_entry(collection_name)["deleted_since_compaction"] += count
+            self.dirty = True
+
+    def forget(self, collection_name: str):
+        with self.lock:
+            if self.state.pop(collection_name, None) is not None:
+                self.dirty = True
+
+    def in_window(self, now: datetime = None) -> bool:
+        if self.window is None:
+            return False
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        start, end = self.window
+        if start <= end:
+            return start <= minute < end
+        return minute >= start or minute < end
+
+    def is_off_peak(self) -> bool:
+        scheduler = self.vectordb_scheduler
+        return (self.in_window()
+                and scheduler.lane_active[INTERACTIVE] == 0
+                and scheduler.lane_waiting[INTERACTIVE] == 0)
+
+    def describe(self, collection_name: str, stats: dict) -> dict:
+        """Counters, segment stats and the maintenance a collection is due for"""
+        with self.lock:
+            entry = dict(self._get_entry(collection_name))
+        row_count = stats["row_count"] if stats else None
+        segments = stats["segments"] if stats else None
+        deleted = entry["deleted_since_compaction"]
+        inserted = entry["inserted_since_rebuild"]
+
+        # Milvus counts deleted rows until they are compacted away
+        tombstone_ratio = deleted / max(row_count or 0, deleted, 1)
+        rows_at_rebuild = entry["rows_at_rebuild"]
+        if rows_at_rebuild is None and row_count is not None:
+            rows_at_rebuild = max(row_count - inserted, 0)
+        # None when the index was built over an empty collection
+        growth_ratio = inserted / rows_at_rebuild if rows_at_rebuild else None
+
+        due = []
+        if row_count is not None and row_count >= self.min_rows:
+            if deleted and tombstone_ratio >= self.tombstone_ratio:
+                due.append("compaction")
+            elif segments is not None and segments > self.max_segments:
+                due.append("compaction")
+            if inserted and (growth_ratio is None or growth_ratio >= self.growth_ratio):
+                due.append("index_rebuild")
+
+        return dict(
+            entry,
+            rows_at_rebuild=rows_at_rebuild,
+            row_count=row_count,
+            segments=segments,
+            tombstone_ratio=tombstone_ratio,
+            growth_ratio=growth_ratio,
+            due=due,
+        )
+
+    async def get_report(self) -> dict:
+        collections = {}
+        for collection_name in list(self.state):
+            stats = await asyncio.to_thread(self.vectordb_client.get_segment_stats, collection_name)
+            if stats is not None:
+                collections[collection_name] = self.describe(collection_name, stats)
+        return {
+            "off_peak": self.is_off_peak(),
+            "window": self.window_text or None,
+            "running": self.running,
+            "stopped": self.check_failures >= self.max_failures,
+            "failures": {
+                f"{collection_name}:{operation}": {
+                    "count": count,
+                    "gave_up": count >= self.max_failures,
+                    "retry_in": None if count >= self.max_failures else max(retry_at - time.monotonic(), 0.0),
+                }
+                for (collection_name, operation), (count, retry_at) in self.failures.items()
+            },
+            "collections": collections,
+        }
+
+    async def run_once(self, force: bool = False) -> dict:
+        """Check every tracked collection, running due maintenance when off-peak; returns the checks"""
+        async with self.run_lock:
+            return await self._run_once(force)
+
+    async def run_now(self) -> dict:
+        """Run the due maintenance right away, forgetting past failures and restarting a stopped loop"""
+        self.failures.clear()
+        self.check_failures = 0
+        if self.task is not None and self.task.done():
+            self.task = None
+            self.start()
+        return await self.run_once(force=True)
+
+    async def _run_once(self, force: bool) -> dict:
+        checks = {}
+        for collection_name in list(self.state):
+            stats = await asyncio.to_thread(self.vectordb_client.get_segment_stats, collection_name)
+            if stats is None:
+                self.forget(collection_name)
+                continue
+            check = checks[collection_name] = self.describe(collection_name, stats)
+            self.record_stats(collection_name, check)
+            with self.lock:
+                entry = self._get_entry(collection_name)
+                if entry["rows_at_rebuild"] is None:
+                    entry["rows_at_rebuild"] = check["rows_at_rebuild"]
+                    self.dirty = True
+
+            for operation in check["due"]:
+                if not force and not self.is_off_peak():
+                    self.logger.info(f"Deferring {operation} of {collection_name} until off-peak")
+                    break
+                if not force and not self.may_attempt(collection_name, operation):
+                    continue
+                await self.run_operation(collection_name, operation)
+        await asyncio.to_thread(self._write_state)
+        return checks
+
+    def backoff(self, failures: int) -> float:
+        return min(self.interval * 2 ** failures, self.max_backoff)
+
+    def may_attempt(self, collection_name: str, operation: str) -> bool:
+        count, retry_at = self.failures.get((collection_name, operation), (0, 0.0))
+        return count < self.max_failures and time.monotonic() >= retry_at
+
+    def record_failure(self, collection_name: str, operation: str):
+        count = self.failures.get((collection_name, operation), (0, 0.0))[0] + 1
+        self.failures[(collection_name, operation)] = (count, time.monotonic() + self.backoff(count))
+        if count >= self.max_failures:
+            self.logger.error(f"Giving up on {operation} of {collection_name} after {count} "
+                              f"consecutive failures, until restart or POST /index/maintenance/run")
+
+    async def run_operation(self, collection_name: str, operation: str) -> bool:
+        with self.lock:
+            entry = self._get_entry(collection_name)
+            # The rebuild indexes these; rows inserted while it runs are counted after it
+            inserted_before = entry["inserted_since_rebuild"]
+        self.running = (collection_name, operation)
+        try:
+            # Maintenance takes an ingestion slot so queries keep priority on the vector DB
+            async with self.vectordb_scheduler.slot(MAINTENANCE_USER, lane=INGESTION):
+                if operation == "compaction":
+                    is_done = await asyncio.to_thread(self.vectordb_client.compact, collection_name,
+                                                      timeout=self.compaction_timeout)
+                else:
+                    is_done = await asyncio.to_thread(self.vectordb_client.rebuild_index, collection_name)
+        except Exception as e:
+            self.logger.error(f"Error while running {operation} of {collection_name}: {e}")
+            is_done = False
+        finally:
+            self.running = None
+        VECTORDB_MAINTENANCE.labels(operation=operation, result="success" if is_done else "failed").inc()
+        if not is_done:
+            self.record_failure(collection_name, operation)
+            return False
+        self.failures.pop((collection_name, operation), None)
+
+        stats = await asyncio.to_thread(self.vectordb_client.get_segment_stats, collection_name)
+        with self.lock:
+            entry = self._get_entry(collection_name)
+            if operation == "compaction":
+                entry["deleted_since_compaction"] = 0
+                entry["last_compaction_at"] = time.time()
+            else:
+                # Rows inserted while the index was rebuilt count towards the next rebuild
+                entry["inserted_since_rebuild"] = max(entry["inserted_since_rebuild"] - inserted_before, 0)
+                entry["rows_at_rebuild"] = max(stats["row_count"] - entry["deleted_since_compaction"]
+                                               - entry["inserted_since_rebuild"], 0)
+                entry["last_index_rebuild_at"] = time.time()
+            self.dirty = True
+        self.logger.info(f"Finished {operation} of {collection_name}")
+        return True
+
+    def record_stats(self, collection_name: str, check: dict):
+        VECTORDB_COLLECTION_STATS.labels(collection=collection_name, stat="rows").set(check["row_count"])
+        VECTORDB_COLLECTION_STATS.labels(collection=collection_name, stat="tombstone_ratio").set(
+            check["tombstone_ratio"])
+        if check["segments"] is not None:
+            VECTORDB_COLLECTION_STATS.labels(collection=collection_name, stat="segments").set(check["segments"])
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.backoff(self.check_failures) if self.check_failures else self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.check_failures += 1
+                if self.check_failures >= self.max_failures:
+                    self.logger.error(f"Vector DB maintenance check failed {self.check_failures} times "
+                                      f"in a row, stopping until restart or POST /index/maintenance/run: {e}")
+                    return
+                self.logger.error(f"Vector DB maintenance check failed: {e}")
+            else:
+                self.check_failures = 0
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await asyncio.to_thread(self._write_state)
@@ -6,4 +6,8 @@ class VectorDBEnums(Enum):
 class DistanceMethodEnums(Enum):
     COSINE = "COSINE"
     DOT = "DOT"
-    L2="L2"
\ No newline at end of file
+    L2="L2"
+
+class TextStorageEnum(Enum):
+    INLINE = "inline"
+    LOCAL = "local"
@@ -1,5 +1,19 @@
 from abc import ABC, abstractmethod
 from typing import List
+import math
+
+
+class CollectionUnavailable(Exception):
+    """The collection cannot serve reads or deletes right now, e.g. while its index is rebuilt"""
+
+    def __init__(self, collection_name: str, reason: str, retry_after: float):
+        super().__init__(f"collection {collection_name} is unavailable ({reason}), retry after {retry_after:.1f}s")
+        self.collection_name = collection_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
 
 class VectorDBInterface(ABC):
 
@@ -27,6 +41,10 @@ class VectorDBInterface(ABC):
     def delete_collection(self, collection_name: str):
         pass
 
+    @abstractmethod
+    def load_collection(self, collection_name: str) -> bool:
+        pass
+
     @abstractmethod
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
@@ -42,7 +60,9 @@ class VectorDBInterface(ABC):
     @abstractmethod
     def insert_many(self, collection_name: str, texts: list, 
                           vectors: list, metadata: list = None, 
-                          record_ids: list = None, batch_size: int = 50):
+                          doc_ids: list = None, record_ids: list = None,
+                          batch_size: int = 50):
+        """Returns the record ids of the inserted rows, or None when nothing was kept"""
         pass
 
     @abstractmethod
@@ -50,6 +70,22 @@ class VectorDBInterface(ABC):
         pass
 
     @abstractmethod
-    def search_by_vector(self, collection_name: str, vector: list, limit: int):
+    def delete_by_record_ids(self, collection_name: str, record_ids: list) -> int:
+        pass
+
+    @abstractmethod
+    def search_by_vector(self, collection_name: str, vector: list, limit: int,
+                               doc_id: str = None, timeout: float = None):
+        pass
+
+    @abstractmethod
+    def get_segment_stats(self, collection_name: str) -> dict:
+        pass
+
+    @abstractmethod
+    def compact(self, collection_name: str, timeout: float = None) -> bool:
+        pass
+
+    @abstractmethod
+    def rebuild_index(self, collection_name: str) -> bool:
         pass
-    
\ No newline at end of file
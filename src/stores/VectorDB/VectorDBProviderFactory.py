@@ -1,14 +1,30 @@
-from .providers import MilvusDBProvider
-from .VectorDBEnum import VectorDBEnums
+from .VectorDBEnum import VectorDBEnums, TextStorageEnum
+import importlib
+
+# Backend modules are only imported when selected
+PROVIDER_REGISTRY = {
+    VectorDBEnums.MILVUS.value: ("MilvusDBProvider", "MilvusDBProvider"),
+}
 
 class VectorDBProviderFactory:
     def __init__(self,config):
         self.config=config
 
+    def load_provider_class(self, provider: str):
+        module_name, class_name = PROVIDER_REGISTRY[provider]
+        module = importlib.import_module(f".providers.{module_name}", package=__package__)
+        return getattr(module, class_name)
+
     def create(self,provider:str):
+        if provider not in PROVIDER_REGISTRY:
+            return None
+        provider_class = self.load_provider_class(provider)
+
         if provider==VectorDBEnums.MILVUS.value:
-            return MilvusDBProvider(
+            return provider_class(
                 db_path=self.config.VECTOR_DB_PATH,
                 token=self.config.VECTOR_DB_TOKEN,
-                distance_method="L2"
-            )
\ No newline at end of file
+                distance_method="L2",
+                store_text=self.config.VECTOR_DB_TEXT_STORAGE != TextStorageEnum.LOCAL.value
+            )
+        return None
@@ -1,18 +1,25 @@
-from pymilvus import Collection, connections,MilvusClient,DataType
-from ..VectorDBInterface import VectorDBInterface
+from pymilvus import Collection, connections,MilvusClient,DataType,utility
+from ..VectorDBInterface import VectorDBInterface, CollectionUnavailable
 from ..VectorDBEnum import DistanceMethodEnums
+from helpers.metrics import STAGE_LATENCY, ERRORS
+from contextlib import contextmanager
+from threading import Condition
 import logging
 from typing import List
 import json
+import time
 
 class MilvusDBProvider(VectorDBInterface):
 
-    def __init__(self, db_path: str, distance_method: str,token:str):
+    def __init__(self, db_path: str, distance_method: str,token:str,store_text:bool=True,
+                       index_rebuild_drain_timeout: float = 30.0):
 
         self.client = None
         self.db_path = db_path
         self.distance_method = None
         self.token=token
+        # Without text, rows hold only the caller's record_id, doc_id and vector
+        self.store_text=store_text
         if distance_method not in [DistanceMethodEnums.COSINE.value, 
                                    DistanceMethodEnums.DOT.value,
                                    DistanceMethodEnums.L2.value]:
@@ -20,18 +27,40 @@ class MilvusDBProvider(VectorDBInterface):
         self.distance_method = distance_method
         self.search_params = {"metric_type": self.distance_method , "params": {"nprobe": 10}}    
 
+        # A collection is released while its index is rebuilt. Searches and deletes
+        # on it fail fast with CollectionUnavailable instead of holding a thread;
+        # a rebuild starts once the ones in flight are done
+        self.index_gate = Condition()
+        self.rebuilding = {}  # collection_name -> rebuild start (monotonic)
+        self.active_operations = {}
+        self.index_rebuild_drain_timeout = index_rebuild_drain_timeout
+        self.last_rebuild_seconds = 30.0
+        # ORM connection for the utility calls that MilvusClient does not expose
+        self.orm_alias = f"collabry-{id(self)}"
+
         self.logger = logging.getLogger(__name__)
 
+        self.insert_latency = STAGE_LATENCY.labels(component="vectordb", stage="insert")
+        self.search_latency = STAGE_LATENCY.labels(component="vectordb", stage="search")
+        self.delete_latency = STAGE_LATENCY.labels(component="vectordb", stage="delete")
+        self.insert_errors = ERRORS.labels(provider="milvus", operation="insert")
+        self.search_errors = ERRORS.labels(provider="milvus", operation="search")
+        self.compaction_latency = STAGE_LATENCY.labels(component="vectordb", stage="compaction")
+        self.index_rebuild_latency = STAGE_LATENCY.labels(component="vectordb", stage="index_rebuild")
+        self.maintenance_errors = ERRORS.labels(provider="milvus", operation="maintenance")
+
     def connect(self):
         self.client = MilvusClient(
         uri=self.db_path,
         token=self.token
          )
+        connections.connect(alias=self.orm_alias, uri=self.db_path, token=self.token)
         
     def disconnect(self):
         if self.client:
             self.client.close()
             self.client = None
+            connections.disconnect(self.orm_alias)
 
     def is_collection_existed(self, collection_name: str) -> bool:
         res = self.client.list_collections()
@@ -57,6 +86,13 @@ class MilvusDBProvider(VectorDBInterface):
             return True
         return False
         
+    def load_collection(self, collection_name: str) -> bool:
+        """Load the collection into memory ahead of the first search"""
+        if not self.is_collection_existed(collection_name):
+            return False
+        self.client.load_collection(collection_name=collection_name)
+        return True
+
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
                                 do_reset: bool = False):
@@ -64,34 +100,46 @@ class MilvusDBProvider(VectorDBInterface):
             _ = self.delete_collection(collection_name=collection_name)
         
         if not self.is_collection_existed(collection_name):
-            schema=MilvusClient.create_schema(
-                auto_id=True,
-                enable_dynamic_field=True,
-            )
-            schema.add_field(field_name="metadata",datatype=DataType.JSON)
-            schema.add_field(field_name="record_id",datatype=DataType.VARCHAR,is_primary=True,auto_id=True,max_length=2500)
-            schema.add_field(field_name="doc_id",datatype=DataType.VARCHAR,max_length=2500)
-            schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=embedding_size)
-            schema.add_field(field_name="text", datatype=DataType.VARCHAR, max_length=2500)
-            index_params = self.client.prepare_index_params()
-
-            index_params.add_index(
-                field_name="record_id",
-                index_type="AUTOINDEX"
-            )
-
-            index_params.add_index(
-                field_name="vector", 
-                index_type="IVF_FLAT",
-                metric_type=self.distance_method
-            )
+            if self.store_text:
+                schema=MilvusClient.create_schema(
+                    auto_id=True,
+                    enable_dynamic_field=True,
+                )
+                schema.add_field(field_name="metadata",datatype=DataType.JSON)
+                schema.add_field(field_name="record_id",datatype=DataType.VARCHAR,is_primary=True,auto_id=True,max_length=2500)
+                schema.add_field(field_name="doc_id",datatype=DataType.VARCHAR,max_length=2500)
+                schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=embedding_size)
+                schema.add_field(field_name="text", datatype=DataType.VARCHAR, max_length=2500)
+            else:
+                schema=MilvusClient.create_schema(
+                    auto_id=False,
+                    enable_dynamic_field=False,
+                )
+                schema.add_field(field_name="record_id",datatype=DataType.INT64,is_primary=True)
+                schema.add_field(field_name="doc_id",datatype=DataType.VARCHAR,max_length=2500)
+                schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=embedding_size)
             self.client.create_collection(
             collection_name=collection_name,
             schema=schema,
-            index_params=index_params
+            index_params=self.build_index_params()
              )
             return True
         return False
+
+    def build_index_params(self):
+        index_params = self.client.prepare_index_params()
+
+        index_params.add_index(
+            field_name="record_id",
+            index_type="AUTOINDEX"
+        )
+
+        index_params.add_index(
+            field_name="vector", 
+            index_type="IVF_FLAT",
+            metric_type=self.distance_method
+        )
+        return index_params
     
     def insert_one(self, collection_name: str, text: str, vector: list,
                          metadata: dict = None, 
@@ -100,6 +148,10 @@ class MilvusDBProvider(VectorDBInterface):
         if not self.is_collection_existed(collection_name):
             self.logger.error(f"Can not insert new record to non-existed collection: {collection_name}")
             return False
+
+        if not self.store_text:
+            self.logger.error("insert_one is not supported when chunk text is stored outside the vector DB")
+            return False
         
         try:
             data=[
@@ -122,59 +174,194 @@ class MilvusDBProvider(VectorDBInterface):
     
     def insert_many(self, collection_name: str, texts: list,
                     vectors: list, metadata: list = None,
-                    doc_ids: list = None, batch_size: int = 50):
-
-        if metadata is None:
-            metadata = [None] * len(texts)
+                    doc_ids: list = None, record_ids: list = None,
+                    batch_size: int = 50):
 
         if doc_ids is None:
-            return False
+            return None
+
+        if not self.store_text and record_ids is None:
+            self.logger.error("record_ids are required when chunk text is stored outside the vector DB")
+            return None
+
+        if self.store_text and metadata is None:
+            metadata = [None] * len(texts)
         
         if len(vectors)<batch_size:
             batch_size=len(vectors)
 
-        for i in range(0, len(texts), batch_size):
+        inserted_ids = []
+        for i in range(0, len(vectors), batch_size):
             batch_end = i + batch_size
 
-            batch_texts = texts[i:batch_end]
             batch_vectors = vectors[i:batch_end]
-            batch_metadata = metadata[i:batch_end]
             batch_ids = doc_ids[i:batch_end]
 
             # Build data as list of dictionaries
-            batch_data = [
-                {
-                    "doc_id": batch_ids[j],
-                    "vector": batch_vectors[j],
-                    "text": batch_texts[j],
-                    "metadata": batch_metadata[j]
-                }
-                for j in range(len(batch_texts))
-            ]
+            if self.store_text:
+                batch_texts = texts[i:batch_end]
+                batch_metadata = metadata[i:batch_end]
+                batch_data = [
+                    {
+                        "doc_id": batch_ids[j],
+                        "vector": batch_vectors[j],
+                        "text": batch_texts[j],
+                        "metadata": batch_metadata[j]
+                    }
+                    for j in range(len(batch_vectors))
+                ]
+            else:
+                batch_record_ids = record_ids[i:batch_end]
+                batch_data = [
+                    {
+                        "record_id": int(batch_record_ids[j]),
+                        "doc_id": batch_ids[j],
+                        "vector": batch_vectors[j],
+                    }
+                    for j in range(len(batch_vectors))
+                ]
 
             try:
-                self.client.insert(collection_name=collection_name, data=batch_data)
+                with self.insert_latency.time():
+                    res = self.client.insert(collection_name=collection_name, data=batch_data)
             except Exception as e:
+                self.insert_errors.inc()
                 self.logger.error(f"Error while inserting batch: {e}")
-                return False
+                # Earlier batches are already in; take them out so the call inserts all or nothing
+                if inserted_ids:
+                    try:
+                        self.delete_by_record_ids(collection_name, inserted_ids)
+                    except Exception as rollback_error:
+                        self.logger.error(f"Could not roll back {len(inserted_ids)} rows "
+                                          f"of {collection_name}: {rollback_error}")
+                return None
+            inserted_ids.extend(res["ids"])
 
-        return True
+        return inserted_ids
     def delete_document_by_id(self,collection_name:str,doc_id:str):
         expre=f"doc_id==\"{doc_id}\""
-        results=self.client.delete(
-            collection_name=collection_name,
-            filter=expre)
+        with self.using_collection(collection_name), self.delete_latency.time():
+            results=self.client.delete(
+                collection_name=collection_name,
+                filter=expre)
+        return results["delete_count"]
+
+    def delete_by_record_ids(self, collection_name: str, record_ids: list) -> int:
+        if not record_ids or not self.is_collection_existed(collection_name):
+            return 0
+        with self.using_collection(collection_name), self.delete_latency.time():
+            results = self.client.delete(collection_name=collection_name, ids=list(record_ids))
         return results["delete_count"]
           
         
         
-    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5):
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5,
+                               doc_id: str = None, timeout: float = None):
 
-        return self.client.search(
-            collection_name=collection_name,
-            data=[vector],
-            anns_field="vector",
-            output_fields=["text"],
-            limit=limit,
-            search_params=self.search_params
-        )
\ No newline at end of file
+        try:
+            with self.using_collection(collection_name), self.search_latency.time():
+                return self.client.search(
+                    collection_name=collection_name,
+                    data=[vector],
+                    anns_field="vector",
+                    # json.dumps quotes and escapes the id as an expression string literal
+                    filter=f"doc_id=={json.dumps(doc_id)}" if doc_id is not None else "",
+                    output_fields=["text"] if self.store_text else [],
+                    limit=limit,
+                    search_params=self.search_params,
+                    timeout=timeout
+                )
+        except Exception:
+            self.search_errors.inc()
+            raise
+
+    @contextmanager
+    def using_collection(self, collection_name: str):
+        """Count a search or delete on the collection, refusing it while the index is rebuilt"""
+        with self.index_gate:
+            started_at = self.rebuilding.get(collection_name)
+            if started_at is not None:
+                retry_after = max(self.last_rebuild_seconds - (time.monotonic() - started_at), 1.0)
+                raise CollectionUnavailable(collection_name, "index rebuild", retry_after)
+            self.active_operations[collection_name] = self.active_operations.get(collection_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self.index_gate:
+                self.active_operations[collection_name] -= 1
+                if not self.active_operations[collection_name]:
+                    del self.active_operations[collection_name]
+                self.index_gate.notify_all()
+
+    def get_segment_stats(self, collection_name: str) -> dict:
+        """Row count, deleted rows included until they are compacted away, and loaded segments"""
+        if not self.is_collection_existed(collection_name):
+            return None
+        stats = self.client.get_collection_stats(collection_name=collection_name)
+        segments = None
+        try:
+            segments = len(utility.get_query_segment_info(collection_name, using=self.orm_alias))
+        except Exception as e:
+            self.logger.warning(f"Could not list the segments of {collection_name}: {e}")
+        return {"row_count": int(stats["row_count"]), "segments": segments}
+
+    def compact(self, collection_name: str, timeout: float = None) -> bool:
+        """Merge small segments and purge deleted rows, waiting for the compaction to finish"""
+        if not self.is_collection_existed(collection_name):
+            return False
+        try:
+            with self.compaction_latency.time():
+                job_id = self.client.compact(collection_name=collection_name)
+                deadline = time.monotonic() + timeout if timeout else None
+                while self.client.get_compaction_state(job_id=job_id) != "Completed":
+                    if deadline is not None and time.monotonic() > deadline:
+                        self.logger.warning(f"Compaction {job_id} of {collection_name} still running after {timeout}s")
+                        return False
+                    time.sleep(1.0)
+        except Exception as e:
+            self.maintenance_errors.inc()
+            self.logger.error(f"Error while compacting {collection_name}: {e}")
+            return False
+        return True
+
+    def rebuild_index(self, collection_name: str) -> bool:
+        """Drop and rebuild the collection's indexes over all of its current rows"""
+        if not self.is_collection_existed(collection_name):
+            return False
+        with self.index_gate:
+            if collection_name in self.rebuilding:
+                return False
+            self.rebuilding[collection_name] = time.monotonic()
+            # New operations are refused from here on; give the ones in flight time to finish
+            drained = self.index_gate.wait_for(lambda: collection_name not in self.active_operations,
+                                               timeout=self.index_rebuild_drain_timeout)
+            if not drained:
+                del self.rebuilding[collection_name]
+                self.index_gate.notify_all()
+                self.logger.warning(f"Not rebuilding the index of {collection_name}: operations still "
+                                    f"running after {self.index_rebuild_drain_timeout}s")
+                return False
+        started_at = time.monotonic()
+        try:
+            with self.index_rebuild_latency.time():
+                # Indexes can only be dropped on a released collection
+                self.client.release_collection(collection_name=collection_name)
+                for index_name in self.client.list_indexes(collection_name=collection_name):
+                    self.client.drop_index(collection_name=collection_name, index_name=index_name)
+                self.client.create_index(collection_name=collection_name,
+                                         index_params=self.build_index_params())
+                self.client.load_collection(collection_name=collection_name)
+            self.last_rebuild_seconds = time.monotonic() - started_at
+        except Exception as e:
+            self.maintenance_errors.inc()
+            self.logger.error(f"Error while rebuilding the index of {collection_name}: {e}")
+            try:
+                self.client.load_collection(collection_name=collection_name)
+            except Exception:
+                pass
+            return False
+        finally:
+            with self.index_gate:
+                del self.rebuilding[collection_name]
+                self.index_gate.notify_all()
+        return True
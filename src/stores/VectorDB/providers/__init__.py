@@ -1 +1,12 @@
-from .MilvusDBProvider import MilvusDBProvider
\ No newline at end of file
+import importlib
+
+# Providers are resolved on first access so importing the package stays cheap
+_LAZY_PROVIDERS = {
+    "MilvusDBProvider": ".MilvusDBProvider",
+}
+
+def __getattr__(name):
+    if name not in _LAZY_PROVIDERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_PROVIDERS[name], package=__name__)
+    return getattr(module, name)
@@ -0,0 +1,120 @@
+from .GenerationScheme import ConnectionConfig
+from threading import Lock
+import asyncio
+import logging
+import random
+import time
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_clients = {}
+_clients_lock = Lock()
+
+
+def _build_limits(config: ConnectionConfig):
+    return httpx.Limits(
+        max_connections=config.pool_size,
+        max_keepalive_connections=config.pool_keepalive,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+
+
+def build_timeout(config: ConnectionConfig):
+    return httpx.Timeout(
+        config.read_timeout,
+        connect=config.connect_timeout,
+    )
+
+
+def get_http_client(config: ConnectionConfig) -> httpx.Client:
+    """Process-wide keep-alive client shared by every provider with the same config"""
+    key = ("sync", config.cache_key())
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = httpx.Client(
+                limits=_build_limits(config),
+                timeout=build_timeout(config),
+            )
+        return _clients[key]
+
+
+def get_async_http_client(config: ConnectionConfig) -> httpx.AsyncClient:
+    """Async counterpart of get_http_client, bound to the app event loop"""
+    key = ("async", config.cache_key())
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = httpx.AsyncClient(
+                limits=_build_limits(config),
+                timeout=build_timeout(config),
+            )
+        return _clients[key]
+
+
+async def close_http_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        if isinstance(client, httpx.AsyncClient):
+            await client.aclose()
+        else:
+            client.close()
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if status_code in RETRYABLE_STATUS_CODES:
+        return True
+    # SDK connection/timeout errors wrap the httpx ones
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def backoff_delay(config: ConnectionConfig, attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    cap = min(config.retry_max_delay, config.retry_base_delay * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def retry_with_jitter(config: ConnectionConfig, func, *args, **kwargs):
+    for attempt in range(config.max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= config.max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(config, attempt)
+            logger.warning(f"Retrying after {type(e).__name__} in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+
+async def aretry_with_jitter(config: ConnectionConfig, func, *args, **kwargs):
+    for attempt in range(config.max_retries + 1):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= config.max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(config, attempt)
+            logger.warning(f"Retrying after {type(e).__name__} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+
+def get_pool_stats() -> dict:
+    """Open connections and queued requests across the shared pools"""
+    connections = 0
+    queued = 0
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections += len(getattr(pool, "connections", []) or [])
+        queued += len(getattr(pool, "_requests", []) or [])
+    return {"connections": connections, "queued": queued}
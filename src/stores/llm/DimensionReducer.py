@@ -0,0 +1,150 @@
+from .LLMEnum import EmbeddingReductionEnum
+from threading import RLock
+import logging
+import os
+import numpy as np
+
+
+class DimensionReducer:
+    """Maps model embeddings to the dimension stored in the vector DB
+
+    "truncate" keeps the leading components and re-normalizes, which suits
+    Matryoshka-trained models. "pca" projects onto principal components
+    fitted once at least `min_fit_samples` embeddings of the collection are
+    available (callers buffer indexing batches until then). The projection is
+    saved next to the other assets and reused at query time.
+    """
+
+    def __init__(self, method: str, source_size: int, target_size: int = None,
+                       storage_dir: str = None, collection_name: str = None,
+                       model_id: str = None, min_fit_samples: int = None):
+        self.method = method
+        if self.method != EmbeddingReductionEnum.NONE.value and source_size is None:
+            raise ValueError(f"EMBEDDING_MODEL_SIZE must be set to use EMBEDDING_REDUCTION={self.method}")
+        self.source_size = source_size
+        self.target_size = target_size or source_size
+        self.storage_dir = storage_dir
+        self.collection_name = collection_name
+        self.model_id = model_id
+
+        if self.method != EmbeddingReductionEnum.NONE.value and self.target_size > self.source_size:
+            raise ValueError(f"Cannot reduce {self.source_size} dimensions to {self.target_size}")
+        # A basis fitted on barely more samples than dimensions mostly captures noise
+        self.min_fit_samples = max(min_fit_samples or 4 * self.target_size, self.target_size)
+
+        self.mean = None
+        self.components = None
+        self.lock = RLock()
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def output_size(self) -> int:
+        if self.method == EmbeddingReductionEnum.NONE.value:
+            return self.source_size
+        return self.target_size
+
+    @property
+    def projection_path(self) -> str:
+        return os.path.join(self.storage_dir, f"{self.collection_name}.pca.npz")
+
+    def needs_fit(self) -> bool:
+        return self.method == EmbeddingReductionEnum.PCA.value and self.components is None
+
+    def load(self) -> bool:
+        """Load the persisted projection of the collection, if any"""
+        if not self.needs_fit():
+            return True
+        with self.lock:
+            if self.components is not None:
+                return True
+            if not os.path.exists(self.projection_path):
+                return False
+            with np.load(self.projection_path) as projection:
+                if str(projection["model_id"]) != str(self.model_id):
+                    self.logger.warning(
+                        f"Projection for {self.collection_name} was fitted on {projection['model_id']}, "
+                        f"now embedding with {self.model_id}"
+                    )
+                self.mean = projection["mean"]
+                self.components = projection["components"]
+        return True
+
+    def fit(self, vectors) -> bool:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.source_size:
+            self.logger.error(f"Cannot fit projection on vectors of shape {vectors.shape}")
+            return False
+
+        if len(vectors) < self.target_size:
+            # The missing axes would carry no variance of the data at all
+            self.logger.error(
+                f"Cannot fit a {self.target_size}-dimensional projection on {len(vectors)} embeddings"
+            )
+            return False
+
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = vt[:self.target_size]
+
+        with self.lock:
+            self.mean = mean.astype(np.float32)
+            self.components = np.ascontiguousarray(components, dtype=np.float32)
+            os.makedirs(self.storage_dir, exist_ok=True)
+            np.savez(self.projection_path, mean=self.mean, components=self.components,
+                     model_id=np.array(str(self.model_id)))
+        return True
+
+    def reset(self):
+        """Forget the projection, the next indexed batch fits a new one"""
+        with self.lock:
+            self.mean = None
+            self.components = None
+            if self.storage_dir and os.path.exists(self.projection_path):
+                os.remove(self.projection_path)
+
+    def transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.source_size and vectors.shape[-1] != self.source_size:
+            self.logger.error(
+                f"Embedding has {vectors.shape[-1]} dimensions, expected EMBEDDING_MODEL_SIZE={self.source_size}"
+            )
+            return None
+
+        if self.method == EmbeddingReductionEnum.NONE.value:
+            return vectors
+
+        if self.method == EmbeddingReductionEnum.TRUNCATE.value:
+            reduced = vectors[..., :self.target_size]
+            norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+            return reduced / np.maximum(norms, 1e-12)
+
+        if not self.load():
+            self.logger.error(f"No projection fitted yet for collection {self.collection_name}")
+            return None
+        return (vectors - self.mean) @ self.components.T
+
+    def is_fitted(self) -> bool:
+        """Whether vectors can be transformed now, loading a saved projection if there is one"""
+        return not self.needs_fit() or self.load()
+
+    def ensure_fitted(self, vectors) -> bool:
+        """Fit on `vectors` unless a projection already exists"""
+        with self.lock:
+            return self.is_fitted() or self.fit(vectors)
+
+    def fit_transform(self, vectors):
+        """Transform an indexing batch, fitting the projection on it first if the collection has
+        none and the batch holds at least min_fit_samples embeddings"""
+        with self.lock:
+            # Concurrent first batches must not each fit their own projection
+            if not self.is_fitted():
+                if len(vectors) < self.min_fit_samples:
+                    self.logger.error(
+                        f"No projection for {self.collection_name} and {len(vectors)} embeddings are "
+                        f"too few to fit one, need {self.min_fit_samples}"
+                    )
+                    return None
+                if not self.fit(vectors):
+                    return None
+        return self.transform(vectors)
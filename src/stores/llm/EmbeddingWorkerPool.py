@@ -0,0 +1,369 @@
+"""Out-of-process pool for the local sentence-transformer encoder.
+
+Each worker process loads the encoder once and talks to the API process over
+its own pipe. Texts go in through the pipe; vectors come back through a
+shared memory block allocated by the API process, so only a short "done"
+message is pickled per batch. A supervisor thread dispatches queued batches
+to idle workers and restarts workers that die or exceed the task timeout.
+The batch such a worker was holding is failed, not retried, since it most
+likely caused the crash, and identical batches are quarantined so that a
+client retrying it cannot take down worker after worker.
+"""
+from .GenerationScheme import EncoderConfig
+from .LocalEncoder import load_local_encoder, encode
+from helpers.metrics import STAGE_LATENCY, ERRORS
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from threading import Lock, Thread
+import asyncio
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import signal
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_pools = []
+_pools_lock = Lock()
+
+
+def _worker_main(conn, model_id: str, encoder_config: dict, embedding_size: int, loader):
+    """Entry point of a worker process"""
+    # Ctrl-C is handled by the API process, which closes the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config = EncoderConfig(**encoder_config)
+    try:
+        model = loader(model_id, config)
+    except Exception as e:
+        conn.send(("failed", None, str(e)))
+        return
+    conn.send(("ready", None, None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if task is None:
+            return
+        task_id, texts, shm_name = task
+        try:
+            vectors = encode(model, texts, batch_size=config.batch_size)
+            if vectors.shape != (len(texts), embedding_size):
+                raise ValueError(f"encoder returned shape {vectors.shape}, expected ({len(texts)}, {embedding_size})")
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)[:] = vectors
+            finally:
+                shm.close()
+            conn.send(("done", task_id, None))
+        except Exception as e:
+            conn.send(("error", task_id, str(e)))
+
+
+class _Task:
+    __slots__ = ("task_id", "texts", "shm", "future", "submitted_at")
+
+    def __init__(self, task_id, texts, shm):
+        self.task_id = task_id
+        self.texts = texts
+        self.shm = shm
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class _Worker:
+    __slots__ = ("worker_id", "process", "conn", "ready", "task", "task_started_at", "restarts")
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.task = None
+        self.task_started_at = None
+        self.restarts = 0
+
+
+class EmbeddingWorkerPool:
+
+    def __init__(self, model_id: str, embedding_size: int,
+                       encoder_config: EncoderConfig = None,
+                       workers: int = 2,
+                       task_timeout: float = 120.0,
+                       health_interval: float = 1.0,
+                       max_load_failures: int = 3,
+                       max_quarantined: int = 1000,
+                       loader=load_local_encoder):
+        self.model_id = model_id
+        self.embedding_size = embedding_size
+        self.encoder_config = encoder_config or EncoderConfig()
+        self.task_timeout = task_timeout
+        self.health_interval = health_interval
+        self.max_load_failures = max_load_failures
+        self.loader = loader
+        # Digests of batches that crashed or hung a worker, oldest first
+        self.quarantine = OrderedDict()
+        self.max_quarantined = max_quarantined
+
+        # spawn: workers must not inherit the API process threads, sockets or event loop
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = [_Worker(worker_id) for worker_id in range(workers)]
+        self.pending = deque()
+        self.pending_lock = Lock()
+        self.task_ids = itertools.count()
+        self.load_failures = 0
+        self.broken = None
+        self.closed = False
+
+        self.wake_reader, self.wake_writer = self.context.Pipe(duplex=False)
+        self.queue_latency = STAGE_LATENCY.labels(component="embedding_pool", stage="queue")
+        self.encode_latency = STAGE_LATENCY.labels(component="embedding_pool", stage="encode")
+
+        for worker in self.workers:
+            self._start_worker(worker)
+        self.supervisor = Thread(target=self._supervise, name="embedding-pool-supervisor", daemon=True)
+        self.supervisor.start()
+
+        with _pools_lock:
+            _pools.append(self)
+
+    def _start_worker(self, worker: _Worker):
+        parent_conn, child_conn = self.context.Pipe()
+        worker.process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_id, self.encoder_config.model_dump(), self.embedding_size, self.loader),
+            name=f"embedding-worker-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.ready = False
+
+    def _restart_worker(self, worker: _Worker, reason: str):
+        ERRORS.labels(provider="embedding_worker", operation=reason).inc()
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+        task, worker.task = worker.task, None
+        if task is not None:
+            self._quarantine(task.texts)
+            self._finish(task, error=RuntimeError(f"embedding worker {reason} while encoding this batch"))
+
+        if self.closed or self.broken:
+            return
+        worker.restarts += 1
+        logger.warning(f"Restarting embedding worker {worker.worker_id} after {reason}")
+        self._start_worker(worker)
+
+    @staticmethod
+    def _digest(texts: list) -> str:
+        digest = hashlib.sha1()
+        for text in texts:
+            digest.update(text.encode("utf-8", "surrogatepass"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _quarantine(self, texts: list):
+        with self.pending_lock:
+            self.quarantine[self._digest(texts)] = time.time()
+            while len(self.quarantine) > self.max_quarantined:
+                self.quarantine.popitem(last=False)
+
+    def _finish(self, task: _Task, error: Exception = None):
+        try:
+            if error is None:
+                shape = (len(task.texts), self.embedding_size)
+                vectors = np.ndarray(shape, dtype=np.float32, buffer=task.shm.buf).copy()
+        finally:
+            task.shm.close()
+            task.shm.unlink()
+        if task.future.done():
+            return
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(vectors)
+
+    def _fail_all(self, error: Exception):
+        with self.pending_lock:
+            tasks, self.pending = list(self.pending), deque()
+        for task in tasks:
+            self._finish(task, error=error)
+
+    def _handle_message(self, worker: _Worker, message):
+        kind, task_id, detail = message
+        if kind == "ready":
+            worker.ready = True
+            self.load_failures = 0
+            return
+        if kind == "failed":
+            self.load_failures += 1
+            logger.error(f"Embedding worker {worker.worker_id} could not load the encoder: {detail}")
+            if self.load_failures >= self.max_load_failures:
+                self.broken = RuntimeError(f"embedding workers cannot load {self.model_id}: {detail}")
+                self._fail_all(self.broken)
+            return
+
+        task, worker.task = worker.task, None
+        if task is None or task.task_id != task_id:
+            return
+        self.encode_latency.observe(time.monotonic() - worker.task_started_at)
+        if kind == "done":
+            self._finish(task)
+        else:
+            self._finish(task, error=RuntimeError(f"embedding worker error: {detail}"))
+
+    def _dispatch(self):
+        if self.broken:
+            self._fail_all(self.broken)
+            return
+        for worker in self.workers:
+            if not worker.ready or worker.task is not None:
+                continue
+            with self.pending_lock:
+                if not self.pending:
+                    return
+                task = self.pending.popleft()
+            if task.future.cancelled():
+                self._finish(task, error=asyncio.CancelledError())
+                continue
+            worker.task = task
+            worker.task_started_at = time.monotonic()
+            self.queue_latency.observe(worker.task_started_at - task.submitted_at)
+            try:
+                worker.conn.send((task.task_id, task.texts, task.shm.name))
+            except (BrokenPipeError, OSError):
+                # The worker was already gone, the batch never reached it
+                worker.task = None
+                with self.pending_lock:
+                    self.pending.appendleft(task)
+                self._restart_worker(worker, "crash")
+
+    def _check_health(self):
+        if self.broken:
+            return
+        now = time.monotonic()
+        for worker in self.workers:
+            if not worker.process.is_alive():
+                self._restart_worker(worker, "crash")
+            elif worker.task is not None and now - worker.task_started_at > self.task_timeout:
+                self._restart_worker(worker, "timeout")
+
+    def _supervise(self):
+        while not self.closed:
+            by_waitable = {}
+            for worker in self.workers:
+                if worker.conn.closed:
+                    continue
+                by_waitable[worker.conn] = worker
+                by_waitable[worker.process.sentinel] = worker
+            ready = wait(list(by_waitable) + [self.wake_reader], timeout=self.health_interval)
+
+            for waitable in ready:
+                if waitable is self.wake_reader:
+                    while self.wake_reader.poll():
+                        self.wake_reader.recv_bytes()
+                    continue
+                worker = by_waitable[waitable]
+                if waitable is not worker.conn:
+                    continue  # process exit, handled by the health check
+                try:
+                    message = worker.conn.recv()
+                except (EOFError, OSError):
+                    continue
+                self._handle_message(worker, message)
+
+            if self.closed:
+                break
+            self._check_health()
+            self._dispatch()
+
+    def submit(self, texts: list) -> Future:
+        if self.broken:
+            raise self.broken
+        if self.closed:
+            raise RuntimeError("embedding pool is closed")
+        if self._digest(texts) in self.quarantine:
+            ERRORS.labels(provider="embedding_worker", operation="quarantined").inc()
+            raise RuntimeError("this batch crashed an embedding worker before and is quarantined")
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self.embedding_size * 4))
+        task = _Task(next(self.task_ids), list(texts), shm)
+        with self.pending_lock:
+            self.pending.append(task)
+        self.wake_writer.send_bytes(b"")
+        return task.future
+
+    def embed(self, text):
+        """Blocking embed with the embed_text contract: a str gives one vector, a list gives a matrix"""
+        if isinstance(text, str):
+            return self.submit([text]).result()[0]
+        return self.submit(text).result()
+
+    async def aembed(self, text):
+        if isinstance(text, str):
+            return (await asyncio.wrap_future(self.submit([text])))[0]
+        return await asyncio.wrap_future(self.submit(text))
+
+    def get_pending(self) -> int:
+        return len(self.pending) + sum(1 for worker in self.workers if worker.task is not None)
+
+    def health(self) -> dict:
+        return {
+            "broken": str(self.broken) if self.broken else None,
+            "pending": len(self.pending),
+            "workers": [
+                {
+                    "worker_id": worker.worker_id,
+                    "alive": worker.process.is_alive(),
+                    "ready": worker.ready,
+                    "busy": worker.task is not None,
+                    "restarts": worker.restarts,
+                }
+                for worker in self.workers
+            ],
+        }
+
+    def close(self, timeout: float = 5.0):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake_writer.send_bytes(b"")
+        self.supervisor.join(timeout=timeout)
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.kill()
+            task, worker.task = worker.task, None
+            if task is not None:
+                self._finish(task, error=RuntimeError("embedding pool closed"))
+        self._fail_all(RuntimeError("embedding pool closed"))
+        with _pools_lock:
+            if self in _pools:
+                _pools.remove(self)
+
+
+def get_embedding_pool_stats() -> dict:
+    with _pools_lock:
+        pools = list(_pools)
+    return {"pending": sum(pool.get_pending() for pool in pools)}
+
+
+def shutdown_embedding_pools():
+    with _pools_lock:
+        pools = list(_pools)
+    for pool in pools:
+        pool.close()
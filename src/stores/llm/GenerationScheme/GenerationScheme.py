@@ -6,4 +6,25 @@ class GenerationConfig(BaseModel):
     temperature: float = Field(default=0.7, ge=0, le=1)
     max_output_tokens: int = Field(default=2048, gt=0)
     top_p: Optional[float] = Field(default=None, ge=0, le=1)
-    top_k: Optional[int] = Field(default=None, ge=0)
\ No newline at end of file
+    top_k: Optional[int] = Field(default=None, ge=0)
+
+class ConnectionConfig(BaseModel):
+    pool_size: int = Field(default=20, gt=0)
+    pool_keepalive: int = Field(default=10, ge=0)
+    keepalive_expiry: float = Field(default=30.0, gt=0)
+    connect_timeout: float = Field(default=5.0, gt=0)
+    read_timeout: float = Field(default=60.0, gt=0)
+    max_retries: int = Field(default=3, ge=0)
+    retry_base_delay: float = Field(default=0.5, ge=0)
+    retry_max_delay: float = Field(default=8.0, ge=0)
+
+    def cache_key(self):
+        return tuple(self.model_dump().values())
+
+class EncoderConfig(BaseModel):
+    backend: str = "torch"
+    threads: int = Field(default=0, ge=0)
+    batch_size: int = Field(default=32, gt=0)
+    onnx_file: Optional[str] = None
+    consistency_check: bool = True
+    consistency_threshold: float = Field(default=0.99, ge=0, le=1)
@@ -1 +1 @@
-from .GenerationScheme import GenerationConfig
\ No newline at end of file
+from .GenerationScheme import GenerationConfig, ConnectionConfig, EncoderConfig
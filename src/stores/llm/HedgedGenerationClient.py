@@ -0,0 +1,215 @@
+from .LLMInterface import LLMInterface
+from helpers.admission import AdmissionRejected, get_admission_controller
+from helpers.metrics import STAGE_LATENCY, GENERATION_ATTEMPTS
+from helpers.tracing import tracer
+from collections import deque
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class GenerationMember:
+
+    def __init__(self, name: str, client: LLMInterface, provider: str = None):
+        self.name = name
+        self.client = client
+        # Rate and concurrency limits belong to the provider backend, whatever the model
+        self.admission = get_admission_controller(provider or name)
+        self.latency = LatencyTracker()
+        self.latency_metric = STAGE_LATENCY.labels(component="generation", stage=name)
+
+
+class HedgedGenerationClient(LLMInterface):
+    """Generation over a primary provider with hedged and fallback secondaries
+
+    The primary gets a head start of hedge_delay, by default its own p95
+    latency. If it has not answered by then the next provider is raced
+    against it, and the first successful answer wins while the other call is
+    cancelled. A failed or rejected call falls through to the next provider
+    right away. Every call goes through the admission controller of its
+    provider.
+    """
+
+    def __init__(self, members: List[Tuple[str, str, LLMInterface]],
+                       hedging_enabled: bool = True,
+                       hedge_delay: float = 2.0,
+                       hedge_quantile: float = 0.95,
+                       hedge_min_delay: float = 0.2):
+        self.members = [GenerationMember(name, client, provider) for name, provider, client in members]
+        self.hedging_enabled = hedging_enabled
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def primary(self) -> LLMInterface:
+        return self.members[0].client
+
+    @property
+    def generation_model_id(self):
+        return self.primary.generation_model_id
+
+    @property
+    def embedding_model_id(self):
+        return self.primary.embedding_model_id
+
+    @property
+    def embedding_size(self):
+        return self.primary.embedding_size
+
+    def set_generation_model(self, model_id: str):
+        self.primary.set_generation_model(model_id=model_id)
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        self.primary.set_embedding_model(model_id=model_id, embedding_size=embedding_size)
+
+    def get_hedge_delay(self) -> float:
+        p = self.members[0].latency.quantile(self.hedge_quantile)
+        if p is None:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, p)
+
+    def check_admission(self):
+        """Raise AdmissionRejected only when no provider could take the request"""
+        rejected = None
+        for member in self.members:
+            try:
+                member.admission.check()
+                return
+            except AdmissionRejected as e:
+                rejected = rejected or e
+        raise rejected
+
+    async def _attempt(self, member: GenerationMember, kind: str, **kwargs):
+        with tracer.start_as_current_span("generation.attempt") as span:
+            span.set_attribute("collabry.provider", member.name)
+            span.set_attribute("collabry.attempt_kind", kind)
+            try:
+                async with member.admission.admit():
+                    start = time.monotonic()
+                    result = await member.client.agenerate_text(**kwargs)
+                    elapsed = time.monotonic() - start
+            except asyncio.CancelledError:
+                GENERATION_ATTEMPTS.labels(provider=member.name, kind=kind, result="cancelled").inc()
+                raise
+            except AdmissionRejected:
+                GENERATION_ATTEMPTS.labels(provider=member.name, kind=kind, result="rejected").inc()
+                raise
+
+            if not result:
+                GENERATION_ATTEMPTS.labels(provider=member.name, kind=kind, result="error").inc()
+                return None
+
+            member.latency.observe(elapsed)
+            member.latency_metric.observe(elapsed)
+            GENERATION_ATTEMPTS.labels(provider=member.name, kind=kind, result="success").inc()
+            return result
+
+    async def agenerate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                                   temperature: float = None):
+        kwargs = {
+            "prompt": prompt,
+            "chat_history": chat_history,
+            "max_output_tokens": max_output_tokens,
+            "temperature": temperature,
+        }
+        pending = set()
+        next_member = 0
+        rejected = None
+
+        def launch(kind: str):
+            nonlocal next_member
+            member = self.members[next_member]
+            next_member += 1
+            pending.add(asyncio.ensure_future(self._attempt(member, kind, **kwargs)))
+
+        launch("primary")
+        try:
+            while pending:
+                can_hedge = self.hedging_enabled and next_member < len(self.members)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.get_hedge_delay() if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    launch("hedge")
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    error = task.exception()
+                    if error is None and task.result():
+                        return task.result()
+                    if isinstance(error, AdmissionRejected):
+                        rejected = rejected or error
+                    elif error is not None:
+                        self.logger.error(f"Generation attempt failed: {error}")
+
+                if not pending and next_member < len(self.members):
+                    launch("fallback")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Every provider refused the request, surface it as overload rather than an error
+        if rejected is not None:
+            raise rejected
+        return None
+
+    def generate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                            temperature: float = None):
+        # Background callers (history summaries) only need the fallback order
+        for member in self.members:
+            result = member.client.generate_text(
+                prompt=prompt,
+                chat_history=chat_history,
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+            )
+            if result:
+                return result
+        return None
+
+    def embed_text(self, text: str, document_type: str = None):
+        return self.primary.embed_text(text=text, document_type=document_type)
+
+    async def aembed_text(self, text: str, document_type: str = None):
+        return await self.primary.aembed_text(text=text, document_type=document_type)
+
+    def construct_prompt(self, prompt: str, role: str):
+        return self.primary.construct_prompt(prompt=prompt, role=role)
+
+    def get_stats(self) -> dict:
+        return {
+            "hedge_delay": self.get_hedge_delay() if len(self.members) > 1 else None,
+            "providers": {
+                member.name: {
+                    "p50": member.latency.quantile(0.5),
+                    "p95": member.latency.quantile(0.95),
+                    "samples": len(member.latency.samples),
+                    "admission": member.admission.stats(),
+                }
+                for member in self.members
+            },
+        }
@@ -20,6 +20,16 @@ class CoHereEnums(Enum):
 
 class GIMINIEnums(Enum):
     pass
+class EmbeddingReductionEnum(Enum):
+    NONE = "none"
+    TRUNCATE = "truncate"
+    PCA = "pca"
+
+class EncoderBackendEnum(Enum):
+    TORCH = "torch"
+    ONNX = "onnx"
+    INT8 = "int8"
+
 class DocumentTypeEnum(Enum):
     DOCUMENT = "document"
     QUERY = "query"
\ No newline at end of file
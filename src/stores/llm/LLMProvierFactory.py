@@ -1,27 +1,69 @@
 from .LLMEnum import LLMEnums
-from .providers import OpenAIProvider, CoHereProvider,GIMINIProvider
-from stores.ChatHistoryManager import ChatHistoryManager
+from .GenerationScheme import ConnectionConfig, EncoderConfig
+from .HedgedGenerationClient import HedgedGenerationClient
+import importlib
+import logging
+
+# Backend modules are only imported when selected, each pulls in a heavy SDK
+PROVIDER_REGISTRY = {
+    LLMEnums.OPENAI.value: ("OpenAIProvider", "OpenAIProvider"),
+    LLMEnums.COHERE.value: ("CoHereProvider", "CoHereProvider"),
+    LLMEnums.GIMINI.value: ("GiminiProvider", "GIMINIProvider"),
+}
 
 class LLMProviderFactory:
     def __init__(self, config: dict):
         self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    def load_provider_class(self, provider: str):
+        module_name, class_name = PROVIDER_REGISTRY[provider]
+        module = importlib.import_module(f".providers.{module_name}", package=__package__)
+        return getattr(module, class_name)
+
+    def get_connection_config(self):
+        return ConnectionConfig(
+            pool_size=self.config.LLM_POOL_SIZE,
+            pool_keepalive=self.config.LLM_POOL_KEEPALIVE,
+            connect_timeout=self.config.LLM_CONNECT_TIMEOUT,
+            read_timeout=self.config.LLM_READ_TIMEOUT,
+            max_retries=self.config.LLM_MAX_RETRIES,
+            retry_base_delay=self.config.LLM_RETRY_BASE_DELAY,
+            retry_max_delay=self.config.LLM_RETRY_MAX_DELAY,
+        )
+
+    def get_encoder_config(self):
+        return EncoderConfig(
+            backend=self.config.EMBEDDING_ENCODER_BACKEND,
+            threads=self.config.EMBEDDING_ENCODER_THREADS,
+            batch_size=self.config.EMBEDDING_BATCH_SIZE,
+            onnx_file=self.config.EMBEDDING_ONNX_FILE,
+            consistency_check=self.config.EMBEDDING_CONSISTENCY_CHECK,
+            consistency_threshold=self.config.EMBEDDING_CONSISTENCY_THRESHOLD,
+        )
 
     def create(self, provider: str):
+        if provider not in PROVIDER_REGISTRY:
+            return None
+        provider_class = self.load_provider_class(provider)
+
         if provider == LLMEnums.OPENAI.value:
-            return OpenAIProvider(
+            return provider_class(
                 api_key = self.config.OPENAI_API_KEY,
                 api_url = self.config.OPENAI_API_URL,
                 default_input_max_characters=self.config.INPUT_DEFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DEFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE,
+                connection_config=self.get_connection_config()
             )
 
         if provider == LLMEnums.COHERE.value:
-            return CoHereProvider(
+            return provider_class(
                 api_key = self.config.COHERE_API_KEY,
                 default_input_max_characters=self.config.INPUT_DEFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DEFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DEFAULT_TEMPERATURE,
+                connection_config=self.get_connection_config()
             )
         if provider == LLMEnums.GIMINI.value:
             config = {
@@ -29,8 +71,54 @@ class LLMProviderFactory:
             "default_max_tokens": self.config.GENERATION_DEFAULT_MAX_TOKENS,
             "default_temperature": self.config.GENERATION_DEFAULT_TEMPERATURE,
             "embedding_model_id":self.config.EMBEDDING_MODEL_ID,
+            "connection_config":self.get_connection_config(),
+            "encoder_config":self.get_encoder_config(),
+            "embedding_workers":self.config.EMBEDDING_WORKERS,
+            "embedding_worker_timeout":self.config.EMBEDDING_WORKER_TIMEOUT,
+            "google_api_key":self.config.GOOGLE_API_KEY,
         }
 
-            return GIMINIProvider(config=config
+            return provider_class(config=config
             )
-        return None
\ No newline at end of file
+        return None
+
+    def create_embedding_client(self, provider: str, model_id: str, embedding_size: int):
+        client = self.create(provider=provider)
+        if client is None:
+            return None
+        client.set_embedding_model(model_id=model_id, embedding_size=embedding_size)
+        return client
+
+    def create_generation_client(self):
+        """Primary generation backend plus the configured hedge/fallback backends"""
+        members = []
+        # Keyed by (backend, model): a fallback may be another model of the primary backend
+        entries = [(self.config.GENERATION_BACKEND, self.config.GENERATION_MODEL_ID)]
+        for backend, model_id in self.config.GENERATION_FALLBACKS.items():
+            if (backend, model_id) in entries:
+                self.logger.warning(f"Ignoring generation fallback {backend}:{model_id}, it is already configured")
+                continue
+            entries.append((backend, model_id))
+
+        used_backends = set()
+        for backend, model_id in entries:
+            client = self.create(provider=backend)
+            if client is None:
+                self.logger.error(f"Unknown generation backend {backend}, skipping it")
+                continue
+            client.set_generation_model(model_id=model_id)
+            # Members of the same backend share its admission controller but are named apart
+            name = f"{backend}:{model_id}" if backend in used_backends else backend
+            used_backends.add(backend)
+            members.append((name, backend, client))
+
+        if not members:
+            return None
+
+        return HedgedGenerationClient(
+            members=members,
+            hedging_enabled=self.config.GENERATION_HEDGE_ENABLED,
+            hedge_delay=self.config.GENERATION_HEDGE_DELAY,
+            hedge_quantile=self.config.GENERATION_HEDGE_QUANTILE,
+            hedge_min_delay=self.config.GENERATION_HEDGE_MIN_DELAY,
+        )
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""CPU backends for the local sentence-transformer encoder.
+
+"torch" is the reference fp32 model. "onnx" runs the same model through
+ONNX Runtime (optionally a pre-quantized ONNX file), "int8" applies dynamic
+int8 quantization to the Linear layers of the torch model. Optimized
+backends are checked against the reference on a fixed probe set when
+loaded, and the reference is used instead if they drift.
+
+SentenceTransformer.encode sorts each call's inputs by length before batching.
+NLPController.embed_documents encodes an upload in INGESTION_BATCH_SIZE calls,
+so it sorts each indexing batch by length before splitting it, keeping the
+padding within each call minimal.
+"""
+from .GenerationScheme import EncoderConfig
+from .LLMEnum import EncoderBackendEnum
+from helpers.metrics import ERRORS
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROBE_TEXTS = [
+    "What is the role of mitochondria in cellular respiration?",
+    "Quantum entanglement links the states of two particles regardless of distance.",
+    "The randomized controlled trial compared the treatment against a placebo in 240 patients.",
+    "Gradient descent iteratively updates model parameters to minimize a loss function.",
+    "Summarize the main findings of the uploaded paper.",
+    "Carbon isotopes in ice cores record atmospheric conditions over thousands of years.",
+    "def embed(texts): return model.encode(texts, batch_size=32)",
+    "Les protéines se replient en structures tridimensionnelles.",
+]
+
+
+def set_torch_threads(threads: int):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def load_reference_encoder(model_id: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_id, device="cpu")
+
+
+def load_onnx_encoder(model_id: str, config: EncoderConfig):
+    import onnxruntime
+    from sentence_transformers import SentenceTransformer
+
+    session_options = onnxruntime.SessionOptions()
+    if config.threads:
+        session_options.intra_op_num_threads = config.threads
+        session_options.inter_op_num_threads = 1
+
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+    if config.onnx_file:
+        model_kwargs["file_name"] = config.onnx_file
+    return SentenceTransformer(model_id, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+def load_int8_encoder(model_id: str):
+    import torch
+    model = load_reference_encoder(model_id)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def encode(model, texts, batch_size: int = 32):
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype(np.float32, copy=False)
+
+
+def compare_embeddings(candidate: np.ndarray, reference: np.ndarray) -> dict:
+    """Row-wise cosine similarity between two embedding matrices"""
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cosine = (candidate * reference).sum(axis=1)
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def check_consistency(model, reference, config: EncoderConfig, texts=PROBE_TEXTS) -> dict:
+    stats = compare_embeddings(
+        encode(model, texts, config.batch_size),
+        encode(reference, texts, config.batch_size),
+    )
+    stats["passed"] = stats["min_cosine"] >= config.consistency_threshold
+    return stats
+
+
+def load_local_encoder(model_id: str, config: EncoderConfig = None):
+    """Load the encoder for the configured backend, falling back to the reference model"""
+    config = config or EncoderConfig()
+    set_torch_threads(config.threads)
+
+    if config.backend == EncoderBackendEnum.TORCH.value:
+        return load_reference_encoder(model_id)
+
+    try:
+        if config.backend == EncoderBackendEnum.ONNX.value:
+            model = load_onnx_encoder(model_id, config)
+        elif config.backend == EncoderBackendEnum.INT8.value:
+            model = load_int8_encoder(model_id)
+        else:
+            logger.error(f"Unknown encoder backend {config.backend}, using the reference model")
+            return load_reference_encoder(model_id)
+    except Exception as e:
+        ERRORS.labels(provider="encoder", operation="load").inc()
+        logger.error(f"Could not load the {config.backend} encoder, using the reference model: {e}")
+        return load_reference_encoder(model_id)
+
+    if config.consistency_check:
+        reference = load_reference_encoder(model_id)
+        stats = check_consistency(model, reference, config)
+        if not stats["passed"]:
+            ERRORS.labels(provider="encoder", operation="consistency").inc()
+            logger.error(
+                f"{config.backend} encoder drifted from the reference (min cosine "
+                f"{stats['min_cosine']:.4f} < {config.consistency_threshold}), using the reference model"
+            )
+            return reference
+        logger.info(f"{config.backend} encoder matches the reference (min cosine {stats['min_cosine']:.4f})")
+    return model
@@ -1,15 +1,21 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnum import CoHereEnums, DocumentTypeEnum
-#import cohere
+from ..GenerationScheme import ConnectionConfig
+from ..ConnectionPool import (get_http_client, get_async_http_client,
+                              retry_with_jitter, aretry_with_jitter)
+import cohere
+from helpers.metrics import ERRORS
 import logging
+import numpy as np
 
 class CoHereProvider(LLMInterface):
 
     def __init__(self, api_key: str,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
-        
+                       default_generation_temperature: float=0.1,
+                       connection_config: ConnectionConfig=None):
+
         self.api_key = api_key
 
         self.default_input_max_characters = default_input_max_characters
@@ -21,7 +27,18 @@ class CoHereProvider(LLMInterface):
         self.embedding_model_id = None
         self.embedding_size = None
 
-        self.client = cohere.Client(api_key=self.api_key)
+        self.connection_config = connection_config or ConnectionConfig()
+
+        self.client = cohere.Client(
+            api_key=self.api_key,
+            timeout=self.connection_config.read_timeout,
+            httpx_client=get_http_client(self.connection_config)
+        )
+        self.async_client = cohere.AsyncClient(
+            api_key=self.api_key,
+            timeout=self.connection_config.read_timeout,
+            httpx_client=get_async_http_client(self.connection_config)
+        )
 
         self.logger = logging.getLogger(__name__)
 
@@ -35,7 +52,27 @@ class CoHereProvider(LLMInterface):
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
 
-    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+    def _build_generation_request(self, prompt: str, chat_history: list, max_output_tokens: int,
+                                        temperature: float):
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+
+        return {
+            "model": self.generation_model_id,
+            "chat_history": self.construct_history(chat_history),
+            "message": self.process_text(prompt),
+            "temperature": temperature,
+            "max_tokens": max_output_tokens
+        }
+
+    def _parse_generation_response(self, response):
+        if not response or not response.text:
+            self.logger.error("Error while generating text with CoHere")
+            return None
+
+        return response.text
+
+    def generate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
                             temperature: float = None):
 
         if not self.client:
@@ -45,52 +82,123 @@ class CoHereProvider(LLMInterface):
         if not self.generation_model_id:
             self.logger.error("Generation model for CoHere was not set")
             return None
-        
-        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
-        temperature = temperature if temperature else self.default_generation_temperature
 
-        response = self.client.chat(
-            model = self.generation_model_id,
-            chat_history = chat_history,
-            message = self.process_text(prompt),
-            temperature = temperature,
-            max_tokens = max_output_tokens
-        )
+        try:
+            response = retry_with_jitter(
+                self.connection_config,
+                self.client.chat,
+                **self._build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="cohere", operation="generate").inc()
+            self.logger.error(f"Error while generating text with CoHere: {e}")
+            return None
 
-        if not response or not response.text:
-            self.logger.error("Error while generating text with CoHere")
+        return self._parse_generation_response(response)
+
+    async def agenerate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                                   temperature: float = None):
+
+        if not self.async_client:
+            self.logger.error("CoHere async client was not set")
             return None
-        
-        return response.text
-    
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for CoHere was not set")
+            return None
+
+        try:
+            response = await aretry_with_jitter(
+                self.connection_config,
+                self.async_client.chat,
+                **self._build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="cohere", operation="generate").inc()
+            self.logger.error(f"Error while generating text with CoHere: {e}")
+            return None
+
+        return self._parse_generation_response(response)
+
+    def _build_embedding_request(self, text, document_type: str):
+        input_type = CoHereEnums.DOCUMENT.value
+        if document_type == DocumentTypeEnum.QUERY.value:
+            input_type = CoHereEnums.QUERY.value
+
+        texts = [text] if isinstance(text, str) else text
+        return {
+            "model": self.embedding_model_id,
+            "texts": [ self.process_text(t) for t in texts ],
+            "input_type": input_type,
+            "embedding_types": ['float'],
+        }
+
+    def _parse_embedding_response(self, response, text):
+        if not response or not response.embeddings or not response.embeddings.float_:
+            self.logger.error("Error while embedding text with CoHere")
+            return None
+
+        vectors = np.asarray(response.embeddings.float_, dtype=np.float32)
+        if isinstance(text, str):
+            return vectors[0]
+        return vectors
+
     def embed_text(self, text: str, document_type: str = None):
         if not self.client:
             self.logger.error("CoHere client was not set")
             return None
-        
+
         if not self.embedding_model_id:
             self.logger.error("Embedding model for CoHere was not set")
             return None
-        
-        input_type = CoHereEnums.DOCUMENT
-        if document_type == DocumentTypeEnum.QUERY:
-            input_type = CoHereEnums.QUERY
-
-        response = self.client.embed(
-            model = self.embedding_model_id,
-            texts = [self.process_text(text)],
-            input_type = input_type,
-            embedding_types=['float'],
-        )
 
-        if not response or not response.embeddings or not response.embeddings.float:
-            self.logger.error("Error while embedding text with CoHere")
+        try:
+            response = retry_with_jitter(
+                self.connection_config,
+                self.client.embed,
+                **self._build_embedding_request(text, document_type)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="cohere", operation="embed").inc()
+            self.logger.error(f"Error while embedding text with CoHere: {e}")
+            return None
+
+        return self._parse_embedding_response(response, text)
+
+    async def aembed_text(self, text: str, document_type: str = None):
+        if not self.async_client:
+            self.logger.error("CoHere async client was not set")
             return None
-        
-        return response.embeddings.float[0]
-    
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for CoHere was not set")
+            return None
+
+        try:
+            response = await aretry_with_jitter(
+                self.connection_config,
+                self.async_client.embed,
+                **self._build_embedding_request(text, document_type)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="cohere", operation="embed").inc()
+            self.logger.error(f"Error while embedding text with CoHere: {e}")
+            return None
+
+        return self._parse_embedding_response(response, text)
+
+    def construct_history(self, chat_history: list):
+        """Map stored human/ai turns onto CoHere chat roles"""
+        return [
+            {
+                "role": CoHereEnums.USER.value if msg["role"] == "human" else CoHereEnums.ASSISTANT.value,
+                "message": msg["content"]
+            }
+            for msg in (chat_history or [])
+        ]
+
     def construct_prompt(self, prompt: str, role: str):
         return {
             "role": role,
             "text": self.process_text(prompt)
-        }
\ No newline at end of file
+        }
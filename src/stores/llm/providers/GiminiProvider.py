@@ -1,23 +1,21 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnum import DocumentTypeEnum
-from sentence_transformers import SentenceTransformer
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import AIMessage,HumanMessage
-from langchain_core.messages import SystemMessage
 from typing import Optional, Dict, List, Any
-from langgraph.graph import Graph, END
 from .Prompt import collabry_prompt
-from langgraph.prebuilt import ToolNode
-from ...ChatHistoryManager import ChatHistoryManager
-from helpers.config import get_settings
-from ..GenerationScheme.GenerationScheme import GenerationConfig
+from ..GenerationScheme.GenerationScheme import GenerationConfig, ConnectionConfig, EncoderConfig
+from ..LocalEncoder import load_local_encoder, encode
+from ..EmbeddingWorkerPool import EmbeddingWorkerPool
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START,MessagesState,StateGraph,END
+from threading import Lock
+import asyncio
+from helpers.metrics import ERRORS
+from helpers.tracing import tracer
 import logging
 import os
 
-settings=get_settings()
-os.environ["GOOGLE_API_KEY"] =  settings.GOOGLE_API_KEY
-
 class GIMINIProvider(LLMInterface):
     def __init__(self, config: Dict[str, Any]):
         """
@@ -29,37 +27,90 @@ class GIMINIProvider(LLMInterface):
                 - default_max_tokens: Default maximum tokens (default: 2048)
                 - default_temperature: Default temperature (default: 0.7)
                 - embedding_model_id: ID of the embedding model
+                - connection_config: ConnectionConfig with timeouts and retries
+                - encoder_config: EncoderConfig for the local embedding model
+                - embedding_workers: Encoder processes, 0 encodes in the API process
+                - embedding_worker_timeout: Seconds before a stuck worker is restarted
+                - google_api_key: API key for Gemini (falls back to GOOGLE_API_KEY env)
         """
         self.generation_model_id = config.get("generation_model_id")
         self.embedding_model_id = config.get("embedding_model_id")
+        self.embedding_size = None
+        self.connection_config = config.get("connection_config") or ConnectionConfig()
+        self.encoder_config = config.get("encoder_config") or EncoderConfig()
+        self.embedding_workers = config.get("embedding_workers", 0)
+        self.embedding_worker_timeout = config.get("embedding_worker_timeout", 120.0)
+
+        self.google_api_key = config.get("google_api_key") or os.environ.get("GOOGLE_API_KEY")
+
+        # The Google client keeps its own channel alive for the provider lifetime
+        self.llm = self.create_llm()
+        self.graph = self.create_graph()
+
+        self.embedding_model = None
+        self.embedding_model_lock = Lock()
 
-        self.llm = ChatGoogleGenerativeAI(
+        self.logger = logging.getLogger(__name__)
+
+    def create_llm(self):
+        return ChatGoogleGenerativeAI(
             model=self.generation_model_id,
+            google_api_key=self.google_api_key,
             temperature=0.7,
             max_tokens=None,
-            timeout=None,
-            max_retries=2,
+            timeout=self.connection_config.read_timeout,
+            max_retries=self.connection_config.max_retries,
         )
 
-        self.logger = logging.getLogger(__name__)
-
     def set_generation_model(self, model_id: str):
-        self.generation_model_id = model_id
+        # The chat model is bound to its model id, rebuild it when it changes
+        if model_id != self.generation_model_id:
+            self.generation_model_id = model_id
+            self.llm = self.create_llm()
 
     def set_embedding_model(self, model_id: str, embedding_size: int):
+        if model_id != self.embedding_model_id or embedding_size != self.embedding_size:
+            if isinstance(self.embedding_model, EmbeddingWorkerPool):
+                self.embedding_model.close()
+            self.embedding_model = None
         self.embedding_model_id = model_id
         self.embedding_size = embedding_size
 
+    def load_embedding_model(self):
+        """Load the sentence-transformer once and reuse it for every call"""
+        if self.embedding_model is None:
+            with self.embedding_model_lock:
+                if self.embedding_model is None:
+                    if self.embedding_workers:
+                        # Each worker process loads its own copy of the encoder
+                        self.embedding_model = EmbeddingWorkerPool(
+                            model_id=self.embedding_model_id,
+                            embedding_size=self.embedding_size,
+                            encoder_config=self.encoder_config,
+                            workers=self.embedding_workers,
+                            task_timeout=self.embedding_worker_timeout,
+                        )
+                    else:
+                        # torch/onnxruntime are imported here so generation-only deployments never load them
+                        self.embedding_model = load_local_encoder(self.embedding_model_id, self.encoder_config)
+        return self.embedding_model
+
     def call_llm(self,state: MessagesState):
         """Execute the LLM with current state"""
         chain = collabry_prompt | self.llm
         result = chain.invoke(state["messages"])
         return {"messages": [AIMessage(content=result.content, name="Collabry chatbot")]}
 
+    async def acall_llm(self,state: MessagesState):
+        """Execute the LLM with current state without blocking the event loop"""
+        chain = collabry_prompt | self.llm
+        result = await chain.ainvoke(state["messages"])
+        return {"messages": [AIMessage(content=result.content, name="Collabry chatbot")]}
+
     def create_graph(self):
         """Create the LangGraph workflow without checkpointer"""
         workflow = StateGraph(state_schema=MessagesState)
-        workflow.add_node("collabry", self.call_llm)
+        workflow.add_node("collabry", RunnableLambda(self.call_llm, afunc=self.acall_llm))
         workflow.add_edge(START, "collabry")
         workflow.add_edge("collabry", END)
         return workflow.compile()
@@ -68,17 +119,18 @@ class GIMINIProvider(LLMInterface):
     def generate_text(
         self,
         prompt: str,
-        user_id: str,
-        context:List=None,
+        chat_history: list=None,
+        max_output_tokens: int=None,
+        temperature: float = None,
     ) -> Optional[str]:
         """
         Generate text using the configured language model.
         
         Args:
             prompt: The input prompt/text
-            user_id: ID of the user making the request
-            chat_history_manager: Optional chat history manager
-            generation_config: Optional generation configuration
+            chat_history: Previous messages as {"role", "content"} dicts
+            max_output_tokens: Unused, kept for interface compatibility
+            temperature: Unused, kept for interface compatibility
             
         Returns:
             Generated text or None if generation fails
@@ -88,43 +140,55 @@ class GIMINIProvider(LLMInterface):
             return None
 
         try:
-            # Prepare input state
-            history_manager = ChatHistoryManager()
-    
-            # Load existing history
-            history = history_manager.get_conversation(user_id=user_id)
-            messages = [
-                HumanMessage(content=msg["content"]) if msg["role"] == "human" 
-                else AIMessage(content=msg["content"])
-                for msg in history
-            ]
-            if context:
-                    context_str = "\n\n".join(
-                        f"[Context {i+1}]: {text[:500]}{'...' if len(text) > 500 else ''}"
-                        for i, text in enumerate(context)
-                    )
-            query = f"Context:\n{context_str}\n\nQuestion: {prompt}"
-            # Add current message
-            messages.append(HumanMessage(content=query))
-            
-            # Create and execute graph
-            graph = self.create_graph()
-            res = graph.invoke({"messages": messages})
-            
-            # Save updated history
-            new_history = [
-                {"role": "human" if isinstance(m, HumanMessage) else "ai", 
-                "content": m.content}
-                for m in messages + [res["messages"][-1]]]
-            history_manager.add_message(user_id=user_id, message=new_history)
+            messages = self.construct_messages(prompt=prompt, chat_history=chat_history)
+            with tracer.start_as_current_span("graph.invoke") as span:
+                span.set_attribute("gen_ai.request.model", self.generation_model_id)
+                span.set_attribute("collabry.message_count", len(messages))
+                res = self.graph.invoke({"messages": messages})
             
             return res["messages"][-1].content
         
         except Exception as e:
+            ERRORS.labels(provider="gimini", operation="generate").inc()
+            self.logger.error(f"Error during text generation: {e}")
+            return None
+
+    async def agenerate_text(
+        self,
+        prompt: str,
+        chat_history: list=None,
+        max_output_tokens: int=None,
+        temperature: float = None,
+    ) -> Optional[str]:
+        """Async counterpart of generate_text"""
+        if not self.generation_model_id:
+            self.logger.error("Generation model ID is not set.")
+            return None
+
+        try:
+            messages = self.construct_messages(prompt=prompt, chat_history=chat_history)
+            with tracer.start_as_current_span("graph.invoke") as span:
+                span.set_attribute("gen_ai.request.model", self.generation_model_id)
+                span.set_attribute("collabry.message_count", len(messages))
+                res = await self.graph.ainvoke({"messages": messages})
+
+            return res["messages"][-1].content
+
+        except Exception as e:
+            ERRORS.labels(provider="gimini", operation="generate").inc()
             self.logger.error(f"Error during text generation: {e}")
             return None
 
-                
+    def construct_messages(self, prompt: str, chat_history: list=None):
+        messages = [
+            HumanMessage(content=msg["content"]) if msg["role"] == "human" 
+            else AIMessage(content=msg["content"])
+            for msg in (chat_history or [])
+        ]
+        # Add current message
+        messages.append(HumanMessage(content=prompt))
+        return messages
+
 
     def embed_text(self, text: str, document_type: str = None):
         if not self.embedding_model_id:
@@ -132,13 +196,26 @@ class GIMINIProvider(LLMInterface):
             return None
 
         try:
-            model = SentenceTransformer(self.embedding_model_id)
-            response = model.encode(text)
-            return response
+            model = self.load_embedding_model()
+            if isinstance(model, EmbeddingWorkerPool):
+                return model.embed(text)
+            return encode(model, text, batch_size=self.encoder_config.batch_size)
         except Exception as e:
+            ERRORS.labels(provider="gimini", operation="embed").inc()
             self.logger.error(f"Error during text embedding: {e}")
             return None
 
+    async def aembed_text(self, text: str, document_type: str = None):
+        if self.embedding_workers and self.embedding_model_id:
+            # Worker processes do the encoding, the event loop only awaits the result
+            try:
+                return await self.load_embedding_model().aembed(text)
+            except Exception as e:
+                ERRORS.labels(provider="gimini", operation="embed").inc()
+                self.logger.error(f"Error during text embedding: {e}")
+                return None
+        # The encoder runs locally, keep it off the event loop
+        return await asyncio.to_thread(self.embed_text, text=text, document_type=document_type)
 
     def construct_prompt(self, prompt: str, role: str):
         return {
@@ -1,15 +1,22 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnum import OpenAIEnums
-from openai import OpenAI
+from ..GenerationScheme import ConnectionConfig
+from ..ConnectionPool import (get_http_client, get_async_http_client, build_timeout,
+                              retry_with_jitter, aretry_with_jitter)
+from openai import OpenAI, AsyncOpenAI
+from helpers.metrics import ERRORS
+import base64
 import logging
+import numpy as np
 
 class OpenAIProvider(LLMInterface):
 
     def __init__(self, api_key: str, api_url: str=None,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
-        
+                       default_generation_temperature: float=0.1,
+                       connection_config: ConnectionConfig=None):
+
         self.api_key = api_key
         self.api_url = api_url
 
@@ -22,9 +29,22 @@ class OpenAIProvider(LLMInterface):
         self.embedding_model_id = None
         self.embedding_size = None
 
+        self.connection_config = connection_config or ConnectionConfig()
+
+        # Retries are handled by retry_with_jitter, not by the SDK
         self.client = OpenAI(
             api_key = self.api_key,
-            api_url = self.api_url
+            base_url = self.api_url,
+            http_client = get_http_client(self.connection_config),
+            timeout = build_timeout(self.connection_config),
+            max_retries = 0
+        )
+        self.async_client = AsyncOpenAI(
+            api_key = self.api_key,
+            base_url = self.api_url,
+            http_client = get_async_http_client(self.connection_config),
+            timeout = build_timeout(self.connection_config),
+            max_retries = 0
         )
 
         self.logger = logging.getLogger(__name__)
@@ -39,9 +59,33 @@ class OpenAIProvider(LLMInterface):
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
 
-    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+    def _build_generation_request(self, prompt: str, chat_history: list, max_output_tokens: int,
+                                        temperature: float):
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+
+        messages = self.construct_history(chat_history)
+        messages.append(
+            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value)
+        )
+
+        return {
+            "model": self.generation_model_id,
+            "messages": messages,
+            "max_tokens": max_output_tokens,
+            "temperature": temperature
+        }
+
+    def _parse_generation_response(self, response):
+        if not response or not response.choices or len(response.choices) == 0 or not response.choices[0].message:
+            self.logger.error("Error while generating text with OpenAI")
+            return None
+
+        return response.choices[0].message.content
+
+    def generate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
                             temperature: float = None):
-        
+
         if not self.client:
             self.logger.error("OpenAI client was not set")
             return None
@@ -49,30 +93,60 @@ class OpenAIProvider(LLMInterface):
         if not self.generation_model_id:
             self.logger.error("Generation model for OpenAI was not set")
             return None
-        
-        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
-        temperature = temperature if temperature else self.default_generation_temperature
 
-        chat_history.append(
-            self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value)
-        )
+        try:
+            response = retry_with_jitter(
+                self.connection_config,
+                self.client.chat.completions.create,
+                **self._build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="openai", operation="generate").inc()
+            self.logger.error(f"Error while generating text with OpenAI: {e}")
+            return None
 
-        response = self.client.chat.completions.create(
-            model = self.generation_model_id,
-            messages = chat_history,
-            max_tokens = max_output_tokens,
-            temperature = temperature
-        )
+        return self._parse_generation_response(response)
 
-        if not response or not response.choices or len(response.choices) == 0 or not response.choices[0].message:
-            self.logger.error("Error while generating text with OpenAI")
+    async def agenerate_text(self, prompt: str, chat_history: list=None, max_output_tokens: int=None,
+                                   temperature: float = None):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
             return None
 
-        return response.choices[0].message["content"]
+        if not self.generation_model_id:
+            self.logger.error("Generation model for OpenAI was not set")
+            return None
 
+        try:
+            response = await aretry_with_jitter(
+                self.connection_config,
+                self.async_client.chat.completions.create,
+                **self._build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+            )
+        except Exception as e:
+            ERRORS.labels(provider="openai", operation="generate").inc()
+            self.logger.error(f"Error while generating text with OpenAI: {e}")
+            return None
+
+        return self._parse_generation_response(response)
+
+    def _parse_embedding_response(self, response, text):
+        if not response or not response.data or len(response.data) == 0 or not response.data[0].embedding:
+            self.logger.error("Error while embedding text with OpenAI")
+            return None
+
+        # base64 float32 decodes straight into an array, with no list of Python floats
+        vectors = np.stack([
+            np.frombuffer(base64.b64decode(record.embedding), dtype=np.float32)
+            for record in response.data
+        ])
+        if isinstance(text, str):
+            return vectors[0]
+        return vectors
 
     def embed_text(self, text: str, document_type: str = None):
-        
+
         if not self.client:
             self.logger.error("OpenAI client was not set")
             return None
@@ -80,20 +154,59 @@ class OpenAIProvider(LLMInterface):
         if not self.embedding_model_id:
             self.logger.error("Embedding model for OpenAI was not set")
             return None
-        
-        response = self.client.embeddings.create(
-            model = self.embedding_model_id,
-            input = text,
-        )
 
-        if not response or not response.data or len(response.data) == 0 or not response.data[0].embedding:
-            self.logger.error("Error while embedding text with OpenAI")
+        try:
+            response = retry_with_jitter(
+                self.connection_config,
+                self.client.embeddings.create,
+                model = self.embedding_model_id,
+                input = text,
+                encoding_format = "base64",
+            )
+        except Exception as e:
+            ERRORS.labels(provider="openai", operation="embed").inc()
+            self.logger.error(f"Error while embedding text with OpenAI: {e}")
             return None
 
-        return response.data[0].embedding
+        return self._parse_embedding_response(response, text)
+
+    async def aembed_text(self, text: str, document_type: str = None):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return None
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return None
+
+        try:
+            response = await aretry_with_jitter(
+                self.connection_config,
+                self.async_client.embeddings.create,
+                model = self.embedding_model_id,
+                input = text,
+                encoding_format = "base64",
+            )
+        except Exception as e:
+            ERRORS.labels(provider="openai", operation="embed").inc()
+            self.logger.error(f"Error while embedding text with OpenAI: {e}")
+            return None
+
+        return self._parse_embedding_response(response, text)
+
+    def construct_history(self, chat_history: list):
+        """Map stored human/ai turns onto OpenAI chat roles"""
+        return [
+            {
+                "role": OpenAIEnums.USER.value if msg["role"] == "human" else OpenAIEnums.ASSISTANT.value,
+                "content": msg["content"]
+            }
+            for msg in (chat_history or [])
+        ]
 
     def construct_prompt(self, prompt: str, role: str):
         return {
             "role": role,
             "content": self.process_text(prompt)
-        }
\ No newline at end of file
+        }
@@ -27,4 +27,15 @@ User: "Hi!"
 You: "Welcome to Collabry's knowledge base! 🧪 How can I help you today?" 
 """),
     MessagesPlaceholder(variable_name="messages")
-])
\ No newline at end of file
+])
+
+summary_prompt = """Update the running summary of a conversation between a user and Collabry.
+Keep the facts, topics and open questions the user cares about, drop greetings and formatting.
+Answer with the updated summary only, in at most 150 words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+"""
@@ -1,3 +1,14 @@
-from .CoHereProvider import CoHereProvider
-from .OpenAIProvider import OpenAIProvider
-from .GiminiProvider import GIMINIProvider
\ No newline at end of file
+import importlib
+
+# Providers are resolved on first access so importing the package stays cheap
+_LAZY_PROVIDERS = {
+    "CoHereProvider": ".CoHereProvider",
+    "OpenAIProvider": ".OpenAIProvider",
+    "GIMINIProvider": ".GiminiProvider",
+}
+
+def __getattr__(name):
+    if name not in _LAZY_PROVIDERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_PROVIDERS[name], package=__name__)
+    return getattr(module, name)